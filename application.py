@@ -1,22 +1,25 @@
 import dash
 import dash_core_components as dcc
 import dash_html_components as html
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
 import pandas as pd
 import flask
 from waitress import serve
 import plotly.graph_objects as go
-from trackerApp.make_graphs import make_timeseries, make_cluster_hist, make_time_hist
-from trackerApp.statistical_params import (
-    most_recent_seizure,
-    get_clusters,
-    get_cluster_info,
-    get_intervals,
-    likelihood_of_seizure,
-    estimate_cluster_size,
+import time
+from typing import Dict, List, Optional, Tuple
+from trackerApp.api import make_api
+from trackerApp.metrics import Metric, register_collector, render
+from trackerApp.profiling import profiled
+from trackerApp.refreshers import SubjectRefreshers
+from trackerApp.constants import GAP_DAYS_OPTIONS
+from trackerApp.snapshot import (
+    FIGURE_LABELS,
+    SnapshotRefresher,
+    make_gap_sweep_message,
 )
-from trackerApp.inout import get_data
-from trackerApp.constants import SEIZURE_SHEET
+from trackerApp.subjects import subject_ids
 import felling
 
 felling.configure()
@@ -26,132 +29,411 @@ logger = logging.getLogger(__name__)
 
 server = flask.Flask(__name__)
 app = dash.Dash(__name__, server=server)
-df = get_data(SEIZURE_SHEET)
-clusters = get_clusters(df)
-cluster_info = get_cluster_info(clusters)
-intervals = get_intervals(cluster_info)
-days_since = most_recent_seizure(df)
-likelihood, next_updates, next_likelihood = likelihood_of_seizure(days_since, intervals)
-next_cluster_size = estimate_cluster_size(cluster_info, days_since)
-
-if days_since >= 2:
-    likelihood_message = f"""Making the current likelihood of a seizure **{likelihood}%**, this will update to {next_likelihood}% in {next_updates} days."""
-    if isinstance(likelihood, str):
-        likelihood_message = f"""Making the current likelihood of a seizure **{likelihood}**, this will update to {next_likelihood}% in {next_updates} days."""
-elif days_since == 1:
-    likelihood_message = f"""As the most recent seizure was only {days_since} day ago, it is possible the cluster is still active"""
-elif days_since == 0:
-    likelihood_message = f"""As the most recent seizure was today, it is possible the cluster is still active"""
-else:
-    likelihood_message = "Failed to produce likelihood message."
+refreshers = SubjectRefreshers()
 
 
-app.title = "Seizure Tracker"
-app.layout = html.Div(
-    [
-        html.H1(
-            children="Seizure Tracker",
-            style={
-                "textAlign": "center",
-            },
-        ),
-        html.Div(
-            dcc.Markdown(f"""The last seizure was **{days_since}** days ago"""),
-            style={
-                "textAlign": "center",
-            },
-        ),
-        html.Div(
-            dcc.Markdown(likelihood_message),
-            style={
-                "textAlign": "center",
-            },
+def get_refresher(subject_id: str) -> SnapshotRefresher:
+    """
+    Get the snapshot refresher for a subject, building its first snapshot on first use
+
+    Parameters
+    ----------
+    subject_id : str
+        The subject's id
+
+    Returns
+    -------
+    SnapshotRefresher
+        The subject's refresher
+
+    Raises
+    ------
+    KeyError
+        If the subject is not registered
+    """
+    return refreshers.get(subject_id)
+
+
+def subject_from_path(pathname: str) -> str:
+    """
+    Find the subject id from the page path, / being the default subject
+
+    Parameters
+    ----------
+    pathname : str
+        The page path, e.g. /bono
+
+    Returns
+    -------
+    str
+        The subject id
+    """
+    subject_id = (pathname or "/").strip("/")
+    return subject_id or subject_ids()[0]
+
+
+def x_range_from_relayout(
+    relayout_data: Optional[dict], tz
+) -> Optional[Tuple[pd.Timestamp, pd.Timestamp]]:
+    """
+    Find the x axis range the user has zoomed to
+
+    Parameters
+    ----------
+    relayout_data : Optional[dict]
+        The graph's relayoutData
+    tz :
+        The timezone of the plotted times, which plotly shows without an offset
+
+    Returns
+    -------
+    Optional[Tuple[pd.Timestamp, pd.Timestamp]]
+        The start and end of the range, or None if the x axis wasn't zoomed
+    """
+    relayout_data = relayout_data or {}
+    if "xaxis.range[0]" in relayout_data:
+        x_range = relayout_data["xaxis.range[0]"], relayout_data["xaxis.range[1]"]
+    elif "xaxis.range" in relayout_data:
+        x_range = relayout_data["xaxis.range"]
+    else:
+        return None
+    return tuple(pd.Timestamp(value).tz_localize(tz) for value in x_range)
+
+
+def collect_metrics() -> List[Metric]:
+    """
+    Get the data age, refresh failures, figure cache counters and malformed rows of each subject's
+    refresher, and the days since a seizure and likelihood of each from the batched summary
+
+    Returns
+    -------
+    List[Metric]
+        The metrics, labelled by subject
+    """
+    subjects = refreshers.items()
+    now = time.time()
+    metrics = [
+        Metric("data_age_seconds", "gauge", "Seconds since the data was read", []),
+        Metric(
+            "snapshot_age_seconds", "gauge", "Seconds since the snapshot was built", []
         ),
-        html.Div(
-            dcc.Markdown(next_cluster_size),
-            style={
-                "textAlign": "center",
-            },
+        Metric("refresh_failures_total", "counter", "Failed snapshot rebuilds", []),
+        Metric("figure_cache_hits_total", "counter", "Figure cache hits", []),
+        Metric("figure_cache_misses_total", "counter", "Figure cache misses", []),
+        Metric(
+            "figure_cache_hit_ratio", "gauge", "Fraction of figure lookups cached", []
         ),
-        html.Div(
-            [
-                dcc.RadioItems(
-                    id="graph-type",
-                    options=[
-                        {"label": "Clusters over time", "value": "bars_timeseries"},
-                        {
-                            "label": "Time since last cluster",
-                            "value": "bars_time_comparison",
-                        },
-                        {
-                            "label": "Hour of the day seizures have occurred",
-                            "value": "seizure_hour_comparison",
-                        },
-                    ],
-                    value="bars_timeseries",
-                    labelStyle={"display": "inline-block"},
-                    persistence=False,
-                ),
-            ]
+        Metric(
+            "malformed_rows", "gauge", "Rows of the csv which couldn't be parsed", []
         ),
-        dcc.Graph(id="bono-seizures", config={"responsive": "auto"}),
     ]
+    for subject_id, refresher in subjects:
+        labels = {"subject": subject_id}
+        fetched_at = refresher.source.fetched_at
+        snapshot = refresher.snapshot
+        cache = refresher.figure_cache.stats()
+        lookups = cache["hits"] + cache["misses"]
+        values = [
+            now - fetched_at if fetched_at is not None else float("nan"),
+            now - snapshot.created if snapshot is not None else float("nan"),
+            refresher.failures,
+            cache["hits"],
+            cache["misses"],
+            cache["hits"] / lookups if lookups else float("nan"),
+            len(refresher.source.malformed),
+        ]
+        for metric, value in zip(metrics, values):
+            metric.samples.append((labels, value))
+
+    summary = refreshers.summary
+    if summary is not None:
+        days_since = Metric(
+            "days_since_seizure", "gauge", "Days since the last seizure", []
+        )
+        likelihood = Metric(
+            "seizure_likelihood_percent", "gauge", "Current likelihood of a seizure", []
+        )
+        for subject_id, row in summary.iterrows():
+            labels = {"subject": subject_id}
+            days_since.samples.append((labels, row.days_since))
+            likelihood.samples.append((labels, row.likelihood))
+        metrics += [days_since, likelihood]
+    return metrics
+
+
+register_collector(collect_metrics)
+
+
+@server.route("/metrics")
+def metrics() -> flask.Response:
+    """Serve the stage timings and other metrics in the Prometheus text format"""
+    return flask.Response(render(), mimetype="text/plain; version=0.0.4")
+
+
+server.register_blueprint(make_api(refreshers.peek, subject_ids))
+
+
+get_refresher(subject_ids()[0])
+refreshers.refresh_all()
+refreshers.start()
+
+
+app.title = "Seizure Tracker"
+
+
+def serve_layout() -> html.Div:
+    """
+    Build the page, the stats and figure are filled in by callbacks for the subject in the url
+
+    Returns
+    -------
+    html.Div
+        The page layout
+    """
+    return html.Div(
+        [
+            dcc.Location(id="url", refresh=False),
+            html.H1(
+                children="Seizure Tracker",
+                style={
+                    "textAlign": "center",
+                },
+            ),
+            html.Div(
+                dcc.Markdown(id="days-since"),
+                style={
+                    "textAlign": "center",
+                },
+            ),
+            html.Div(
+                dcc.Markdown(id="likelihood-message"),
+                style={
+                    "textAlign": "center",
+                },
+            ),
+            html.Div(
+                dcc.Markdown(id="next-cluster-size"),
+                style={
+                    "textAlign": "center",
+                },
+            ),
+            html.Div(
+                [
+                    dcc.RadioItems(
+                        id="graph-type",
+                        options=[
+                            {"label": label, "value": fig_type}
+                            for fig_type, label in FIGURE_LABELS.items()
+                        ],
+                        value="bars_timeseries",
+                        labelStyle={"display": "inline-block"},
+                        persistence=False,
+                    ),
+                ]
+            ),
+            dcc.Graph(id="bono-seizures", config={"responsive": "auto"}),
+            html.Div(
+                [
+                    dcc.Markdown(id="gap-sweep"),
+                    dcc.Slider(
+                        id="gap-days",
+                        min=GAP_DAYS_OPTIONS[0],
+                        max=GAP_DAYS_OPTIONS[-1],
+                        step=GAP_DAYS_OPTIONS[1] - GAP_DAYS_OPTIONS[0],
+                        marks={
+                            int(gap_days): str(int(gap_days))
+                            for gap_days in GAP_DAYS_OPTIONS
+                            if gap_days == int(gap_days)
+                        },
+                        value=3,
+                    ),
+                ],
+                style={
+                    "textAlign": "center",
+                },
+            ),
+            # every figure for the subject, sent once per page load
+            dcc.Store(id="figures"),
+            # the clusters over time figure redrawn for the zoomed range, if zoomed
+            dcc.Store(id="zoomed-timeseries"),
+        ]
+    )
+
+
+app.layout = serve_layout
+
+
+@app.callback(
+    [
+        Output(component_id="days-since", component_property="children"),
+        Output(component_id="likelihood-message", component_property="children"),
+        Output(component_id="next-cluster-size", component_property="children"),
+    ],
+    [Input(component_id="url", component_property="pathname")],
 )
+@profiled("update_stats")
+def update_stats(pathname: str) -> Tuple[str, str, str]:
+    """
+    Show the stats for the subject in the url
 
-import gc
+    Parameters
+    ----------
+    pathname : str
+        The page path
 
-del df
-del intervals
-del cluster_info
-gc.collect()
+    Returns
+    -------
+    Tuple[str, str, str]
+        The days since, likelihood and cluster size messages from the current snapshot
+    """
+    try:
+        snapshot = get_refresher(subject_from_path(pathname)).snapshot
+    except KeyError:
+        return f"""Unknown subject **{pathname.strip("/")}**""", "", ""
+    except Exception:
+        logger.exception(f"Failed to load the data for {pathname}")
+        return "Couldn't load the seizure data, please try again later", "", ""
+    return (
+        f"""The last seizure was **{snapshot.days_since}** days ago""",
+        snapshot.likelihood_message,
+        snapshot.next_cluster_size,
+    )
 
 
 @app.callback(
-    Output(component_id="bono-seizures", component_property="figure"),
-    [Input(component_id="graph-type", component_property="value")],
+    Output(component_id="gap-sweep", component_property="children"),
+    [
+        Input(component_id="gap-days", component_property="value"),
+        Input(component_id="url", component_property="pathname"),
+    ],
 )
-def update_fig(fig_type: str) -> go.Figure:
+@profiled("update_gap_sweep")
+def update_gap_sweep(gap_days: float, pathname: str) -> str:
     """
-    Based upon the radio buttons, present the correct fig
+    Describe the clusters for the gap_days picked on the slider, from the snapshot's sweep
 
     Parameters
     ----------
-    fig_type : str
-        The radio button selected
+    gap_days : float
+        The number of days after a seizure that a cluster is considered over
+    pathname : str
+        The page path, giving the subject
 
     Returns
     -------
-    go.Figure
-        The appropriate figure
-    """
-    df = get_data(SEIZURE_SHEET)
-    if fig_type == "seizure_hour_comparison":
-        fig = make_time_hist(df)
-    elif fig_type in ["bars_time_comparison", "bars_timeseries"]:
-        clusters = get_clusters(df)
-        cluster_info = get_cluster_info(clusters)
-
-        if fig_type == "bars_time_comparison":
-            intervals = get_intervals(cluster_info)
-            fig = make_cluster_hist(intervals)
-        elif fig_type == "bars_timeseries":
-            fig = make_timeseries(cluster_info)
+    str
+        The cluster statistics message
+    """
     try:
-        del df
-    except:
-        pass
+        snapshot = get_refresher(subject_from_path(pathname)).snapshot
+    except KeyError:
+        raise PreventUpdate
+    except Exception:
+        logger.exception(f"Failed to load the data for {pathname}")
+        raise PreventUpdate
+    return make_gap_sweep_message(gap_days, snapshot.gap_sweep)
+
+
+@app.callback(
+    Output(component_id="figures", component_property="data"),
+    [Input(component_id="url", component_property="pathname")],
+)
+@profiled("update_figures")
+def update_figures(pathname: str) -> Dict[str, dict]:
+    """
+    Send every figure for the subject in the url, so switching between them needs no requests
+
+    Parameters
+    ----------
+    pathname : str
+        The page path, giving the subject
+
+    Returns
+    -------
+    Dict[str, dict]
+        Each figure from the current snapshot, keyed by the graph-type radio button value
+    """
     try:
-        del intervals
-    except:
-        pass
+        snapshot = get_refresher(subject_from_path(pathname)).snapshot
+    except KeyError:
+        raise PreventUpdate
+    except Exception:
+        logger.exception(f"Failed to load the data for {pathname}")
+        raise PreventUpdate
+    return dict(snapshot.figures)
+
+
+@app.callback(
+    Output(component_id="zoomed-timeseries", component_property="data"),
+    [
+        Input(component_id="bono-seizures", component_property="relayoutData"),
+        Input(component_id="url", component_property="pathname"),
+    ],
+    [State(component_id="graph-type", component_property="value")],
+    prevent_initial_call=True,
+)
+@profiled("update_zoom")
+def update_zoom(
+    relayout_data: Optional[dict], pathname: str, fig_type: str
+) -> Optional[dict]:
+    """
+    Redraw the clusters over time figure in more detail when it is zoomed
+
+    Parameters
+    ----------
+    relayout_data : Optional[dict]
+        The graph's relayoutData
+    pathname : str
+        The page path, giving the subject
+    fig_type : str
+        The radio button selected
+
+    Returns
+    -------
+    Optional[dict]
+        The figure for the zoomed range, or None to show the whole figure
+    """
+    triggered = [trigger["prop_id"] for trigger in dash.callback_context.triggered]
+    if "url.pathname" in triggered:
+        return None
+    if fig_type != "bars_timeseries":
+        raise PreventUpdate
     try:
-        del cluster_info
-    except:
-        pass
+        refresher = get_refresher(subject_from_path(pathname))
+    except KeyError:
+        raise PreventUpdate
+    except Exception:
+        logger.exception(f"Failed to load the data for {pathname}")
+        raise PreventUpdate
+    x_range = x_range_from_relayout(
+        relayout_data, refresher.snapshot.cluster_info.start.dt.tz
+    )
+    if x_range is not None:
+        return refresher.timeseries(x_range)
+    if not (relayout_data or {}).get("xaxis.autorange"):
+        raise PreventUpdate
+    return None
 
-    gc.collect()
 
-    return fig
+app.clientside_callback(
+    """
+    function(figType, figures, zoomed) {
+        if (!figures) {
+            return window.dash_clientside.no_update;
+        }
+        if (figType === "bars_timeseries" && zoomed) {
+            return zoomed;
+        }
+        return figures[figType];
+    }
+    """,
+    Output(component_id="bono-seizures", component_property="figure"),
+    [
+        Input(component_id="graph-type", component_property="value"),
+        Input(component_id="figures", component_property="data"),
+        Input(component_id="zoomed-timeseries", component_property="data"),
+    ],
+)
 
 
 application = app.server
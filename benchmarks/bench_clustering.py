@@ -0,0 +1,35 @@
+"""
+Benchmark the clustering engine against the original slicing loop
+
+Run from the repository root with ``python -m benchmarks.bench_clustering``
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.generators import make_events
+from benchmarks.legacy import legacy_get_clusters
+from trackerApp.statistical_params import cluster_events, get_clusters
+
+
+def _time(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    print(f"{'events':>10} {'cluster_events':>15} {'get_clusters':>13} {'legacy':>10}")
+    for n_events in [10**2, 10**3, 10**4, 10**5, 10**6]:
+        times = make_events(n_events)
+        df = pd.DataFrame(index=pd.to_datetime(times, utc=True))
+        engine = _time(cluster_events, times)
+        adapter = _time(get_clusters, df)
+        legacy = _time(legacy_get_clusters, df) if n_events <= 10**4 else np.nan
+        print(f"{n_events:>10} {engine:>15.4f} {adapter:>13.4f} {legacy:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
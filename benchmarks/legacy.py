@@ -0,0 +1,190 @@
+"""
+The original implementations replaced by faster ones, kept as references to benchmark and test against
+"""
+
+import datetime as dt
+import io
+from typing import List
+
+import pandas as pd
+
+from trackerApp.statistical_params import _remove_outliers, format_likelihood
+
+
+def legacy_get_clusters(df: pd.DataFrame, gap_days=3) -> List[pd.DataFrame]:
+    """
+    The original slicing implementation of get_clusters
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        A seizure df with a sorted datetime index
+    gap_days : int, optional
+        The number of days after a seizure that a cluster is considered over, by default 3
+
+    Returns
+    -------
+    List[pd.DataFrame]
+        The rows of each cluster
+    """
+    gap_days = dt.timedelta(gap_days)
+    clusters = []
+    ii = 0
+    while ii < len(df):
+        a = df.index[ii]
+        start = a - gap_days
+        if ii == 0:
+            start = a
+        end = a + gap_days
+        clusters.append(df[start:end])
+        ii += len(df[start:end])
+    return clusters
+
+
+def legacy_get_likelihood(interval_list: pd.Series, days_since: int):
+    """
+    The original likelihood of a seizure, counting the intervals up to days_since with a mask
+
+    Parameters
+    ----------
+    interval_list : pd.Series
+        The interval days, without outliers
+    days_since : int
+        The number of days since a seizure
+
+    Returns
+    -------
+    The likelihood as a percentage, formatted by format_likelihood
+    """
+    intervals_lower = interval_list[interval_list <= days_since]
+    likelihood = int(len(intervals_lower) / len(interval_list) * 100)
+    return format_likelihood(likelihood)
+
+
+def legacy_likelihood_of_seizure(days_since: int, intervals: pd.DataFrame):
+    """
+    The original likelihood_of_seizure, sorting and masking the intervals on every call, before
+    LikelihoodModel answered it from a precomputed table
+
+    Parameters
+    ----------
+    days_since : int
+        Number of days since a seizure
+    intervals : pd.DataFrame
+        Interval info from get_intervals
+
+    Returns
+    -------
+    The likelihood, how many days till it will update and what it will update to, "N/A" if it won't
+    """
+    interval_list = intervals.interval_days.sort_values()
+    interval_list = _remove_outliers(interval_list, num_sd=2)
+    likelihood = legacy_get_likelihood(interval_list, days_since)
+    next_interval = interval_list[interval_list > days_since]
+    if next_interval.empty:
+        return likelihood, "N/A", "N/A"
+    next_interval = next_interval.iloc[0]
+    return (
+        likelihood,
+        next_interval - days_since,
+        legacy_get_likelihood(interval_list, next_interval),
+    )
+
+
+def legacy_parse_csv(content: bytes) -> pd.DataFrame:
+    """
+    The original parse_csv, leaving pandas to infer the format of every row
+
+    Parameters
+    ----------
+    content : bytes
+        The raw csv
+
+    Returns
+    -------
+    pd.DataFrame
+        The csv as a dataframe with a sorted utc datetime index
+    """
+    df = pd.read_csv(io.BytesIO(content), names=["Seizure"])
+    df["Seizure"] = pd.to_datetime(df["Seizure"], utc=True)
+    return df.set_index("Seizure").sort_index()
+
+
+def legacy_get_cluster_info(clusters: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    The original get_cluster_info, building a row from each cluster df in turn
+
+    Parameters
+    ----------
+    clusters : List[pd.DataFrame]
+        The clusters from legacy_get_clusters
+
+    Returns
+    -------
+    pd.DataFrame
+        The start, end, number, width and middle of each cluster
+    """
+    cluster_info = {}
+    for cluster in clusters:
+        cluster_info[len(cluster_info)] = {
+            "start": cluster.iloc[0].name,
+            "end": cluster.iloc[-1].name,
+            "number": len(cluster),
+            "width": cluster.iloc[-1].name - cluster.iloc[0].name,
+        }
+    cluster_info = pd.DataFrame.from_dict(cluster_info, orient="index")
+    cluster_info.loc[:, "middle"] = cluster_info.loc[:, "start"] + dt.timedelta(
+        days=0.5
+    )
+    return cluster_info
+
+
+def legacy_get_intervals(cluster_info: pd.DataFrame) -> pd.DataFrame:
+    """
+    The original get_intervals, iterating over the rows of cluster_info
+
+    Parameters
+    ----------
+    cluster_info : pd.DataFrame
+        Cluster info from legacy_get_cluster_info
+
+    Returns
+    -------
+    pd.DataFrame
+        The days between each cluster and the one before, with the size of the one before
+    """
+    intervals = {}
+    for index, row in cluster_info.iterrows():
+        if index == 0:
+            continue
+        intervals[index] = {
+            "interval_days": (row.start - cluster_info.loc[index - 1].end).days,
+            "prev_cluster_size": cluster_info.loc[index - 1].number,
+        }
+    return pd.DataFrame.from_dict(intervals, orient="index")
+
+
+def legacy_make_fig_text(
+    cluster_info: pd.DataFrame, tz: str = "Europe/London"
+) -> List[List[str]]:
+    """
+    The original make_fig_text, formatting the start and end of one cluster at a time
+
+    Parameters
+    ----------
+    cluster_info : pd.DataFrame
+        Cluster info from get_cluster_info
+    tz : str, optional
+        The timezone to show the times in, by default "Europe/London"
+
+    Returns
+    -------
+    List[List[str]]
+        The start and end time of each cluster
+    """
+    custom_text = []
+    for index, row in cluster_info.iterrows():
+        start_time = row.start.astimezone(tz).strftime("%H:%M %d/%m/%Y")
+        end_time = row.end.astimezone(tz).strftime("%H:%M %d/%m/%Y")
+        custom_text.append([start_time, end_time])
+    return custom_text
@@ -0,0 +1,218 @@
+"""
+Time and peak memory of each stage of the statistics and figure pipeline
+
+Run from the repository root with ``python -m benchmarks.suite``. Results are compared against
+benchmarks/baseline.json and the exit code is 1 if any stage has regressed. Use ``--save`` to write
+the results as the new baseline, which should be done on the machine the comparisons will run on.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, NamedTuple
+
+from benchmarks.generators import make_history_csv
+from benchmarks.legacy import legacy_parse_csv
+from trackerApp.inout import parse_csv
+from trackerApp.make_graphs import (
+    make_cluster_hist,
+    make_fig_text,
+    make_time_hist,
+    make_timeseries,
+    make_trends,
+    make_weekday_hour_heatmap,
+)
+from trackerApp.rolling import RollingStats
+from trackerApp.statistical_params import (
+    get_cluster_info,
+    get_clusters,
+    get_intervals,
+    likelihood_of_seizure,
+)
+from trackerApp.temporal import TemporalPatterns
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+SIZES = [10**2, 10**3, 10**4, 10**5, 10**6]
+
+
+class Stage(NamedTuple):
+    name: str
+    run: Callable[[Dict[str, Any]], Any]
+    # the context key the result is stored under, for later stages
+    output: str = ""
+
+
+STAGES = [
+    Stage("parse_csv_pandas", lambda ctx: legacy_parse_csv(ctx["csv"])),
+    Stage("parse_csv", lambda ctx: parse_csv(ctx["csv"]), "df"),
+    Stage("get_clusters", lambda ctx: get_clusters(ctx["df"]), "clusters"),
+    Stage(
+        "get_cluster_info",
+        lambda ctx: get_cluster_info(ctx["clusters"]),
+        "cluster_info",
+    ),
+    Stage("get_intervals", lambda ctx: get_intervals(ctx["cluster_info"]), "intervals"),
+    Stage(
+        "likelihood_of_seizure",
+        lambda ctx: likelihood_of_seizure(10, ctx["intervals"]),
+    ),
+    Stage("make_fig_text", lambda ctx: make_fig_text(ctx["cluster_info"])),
+    Stage("make_timeseries", lambda ctx: make_timeseries(ctx["cluster_info"])),
+    Stage("make_cluster_hist", lambda ctx: make_cluster_hist(ctx["intervals"])),
+    Stage(
+        "temporal_patterns",
+        lambda ctx: TemporalPatterns.from_df(ctx["df"]),
+        "temporal",
+    ),
+    Stage("make_time_hist", lambda ctx: make_time_hist(ctx["temporal"])),
+    Stage(
+        "make_weekday_hour_heatmap",
+        lambda ctx: make_weekday_hour_heatmap(ctx["temporal"]),
+    ),
+    Stage("rolling_stats", lambda ctx: RollingStats.from_df(ctx["df"]), "rolling"),
+    Stage("make_trends", lambda ctx: make_trends(ctx["rolling"])),
+]
+
+
+def _time(stage: Stage, ctx: Dict[str, Any], min_time: float = 0.2) -> float:
+    """The best time of repeated runs, repeating until min_time has passed"""
+    best = float("inf")
+    total = 0.0
+    runs = 0
+    while runs < 3 and (runs == 0 or total < min_time):
+        start = time.perf_counter()
+        result = stage.run(ctx)
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        total += elapsed
+        runs += 1
+    if stage.output:
+        ctx[stage.output] = result
+    return best
+
+
+def _peak_memory(stage: Stage, ctx: Dict[str, Any]) -> int:
+    """The peak memory allocated while running the stage, in bytes"""
+    tracemalloc.start()
+    try:
+        stage.run(ctx)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(sizes: List[int], stages: List[Stage] = STAGES) -> Dict[str, Dict[str, dict]]:
+    """
+    Benchmark every stage at each size
+
+    Parameters
+    ----------
+    sizes : List[int]
+        The numbers of events to benchmark
+    stages : List[Stage], optional
+        The stages to run, in order, by default STAGES
+
+    Returns
+    -------
+    Dict[str, Dict[str, dict]]
+        The seconds and peak bytes of each stage, keyed by size then stage name
+    """
+    # warm up imports and caches so the first stage timed isn't penalised
+    ctx = {"csv": make_history_csv(100)}
+    for stage in stages:
+        _time(stage, ctx, min_time=0)
+
+    results = {}
+    for size in sizes:
+        ctx = {"csv": make_history_csv(size)}
+        results[str(size)] = {}
+        for stage in stages:
+            seconds = _time(stage, ctx)
+            peak = _peak_memory(stage, ctx)
+            results[str(size)][stage.name] = {"seconds": seconds, "peak_bytes": peak}
+            print(
+                f"{size:>9} {stage.name:<26} {seconds:>10.4f}s {peak / 2**20:>10.2f}MiB"
+            )
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, dict]],
+    baseline: Dict[str, Dict[str, dict]],
+    tolerance: float = 0.5,
+    min_seconds: float = 0.005,
+) -> List[str]:
+    """
+    Find the stages which are slower or use more memory than the baseline
+
+    Parameters
+    ----------
+    results : Dict[str, Dict[str, dict]]
+        Results from run
+    baseline : Dict[str, Dict[str, dict]]
+        Stored results to compare against
+    tolerance : float, optional
+        The fraction a stage may exceed the baseline by, by default 0.5
+    min_seconds : float, optional
+        Time differences below this are noise, by default 0.005
+
+    Returns
+    -------
+    List[str]
+        A description of each regression
+    """
+    regressions = []
+    for size, stages in results.items():
+        for name, result in stages.items():
+            expected = baseline.get(size, {}).get(name)
+            if expected is None:
+                continue
+            slower = result["seconds"] - expected["seconds"]
+            if (
+                result["seconds"] > expected["seconds"] * (1 + tolerance)
+                and slower > min_seconds
+            ):
+                regressions.append(
+                    f"{name} at {size} events took {result['seconds']:.4f}s, "
+                    f"baseline {expected['seconds']:.4f}s"
+                )
+            if result["peak_bytes"] > expected["peak_bytes"] * (1 + tolerance):
+                regressions.append(
+                    f"{name} at {size} events peaked at {result['peak_bytes']} bytes, "
+                    f"baseline {expected['peak_bytes']} bytes"
+                )
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument(
+        "--save", action="store_true", help="write the results as the baseline"
+    )
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes)
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --save to create one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
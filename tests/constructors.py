@@ -2,6 +2,9 @@ import pandas as pd
 import numpy as np
 import datetime as dt
 import pytz
+import hashlib
+import http.server
+import threading
 
 
 def make_df(days_ago: int, df_len: int) -> pd.DataFrame:
@@ -33,10 +36,99 @@ def make_full_df(
     num_clusters: int = 6,
     cluster_interval: int = 14,
 ) -> pd.DataFrame:
-    df_all = pd.DataFrame()
-    for val in range(num_clusters):
-        df = make_df(days_ago_start, len_cluster)
-        df_all = df_all.append(df)
-        days_ago_start -= cluster_interval
+    dfs = [
+        make_df(days_ago_start - val * cluster_interval, len_cluster)
+        for val in range(num_clusters)
+    ]
+    return pd.concat(dfs)
 
-    return df_all
+
+def make_random_df(n_events: int = 500, days: float = 1000) -> pd.DataFrame:
+    """
+    Make a df of seizures at uniformly random times, from a fixed seed
+
+    Parameters
+    ----------
+    n_events : int, optional
+        The number of seizures, by default 500
+    days : float, optional
+        The number of days from 2020-01-01 the seizures are spread over, by default 1000
+
+    Returns
+    -------
+    pd.DataFrame
+        A df with a sorted UTC datetime index
+    """
+    rng = np.random.default_rng(0)
+    times = pd.Timestamp("2020-01-01", tz="UTC") + pd.to_timedelta(
+        np.sort(rng.uniform(0, days, size=n_events)), unit="D"
+    )
+    return pd.DataFrame(index=times)
+
+
+class CsvServer:
+    """
+    A local stand-in for the published google sheet which counts the requests it receives
+
+    Set content to change the csv, and etag to False to stop the server sending an ETag.
+    """
+
+    def __init__(self, content: bytes = b"", etag: bool = True):
+        self.content = content
+        self.etag = etag
+        self.requests = 0
+        self.not_modified = 0
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                tag = '"' + hashlib.md5(server.content).hexdigest() + '"'
+                if server.etag and self.headers.get("If-None-Match") == tag:
+                    server.not_modified += 1
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/csv")
+                self.send_header("Content-Length", str(len(server.content)))
+                if server.etag:
+                    self.send_header("ETag", tag)
+                self.end_headers()
+                self.wfile.write(server.content)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}/sheet.csv"
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, args=(0.05,), daemon=True
+        )
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def make_csv(df: pd.DataFrame) -> bytes:
+    """
+    Make csv content like the published google sheet from a df with a datetime index
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        A df with a datetime index
+
+    Returns
+    -------
+    bytes
+        The csv content, one timestamp per line
+    """
+    return "".join(
+        f"{time:%Y-%m-%d %H:%M:%S}\n" for time in df.index.tz_convert("UTC")
+    ).encode()
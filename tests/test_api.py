@@ -0,0 +1,118 @@
+import json
+
+import flask
+import pytest
+
+from constructors import make_csv, make_full_df
+
+from trackerApp.api import FIELDS, make_api
+from trackerApp.inout import DataSource
+from trackerApp.snapshot import SnapshotRefresher
+
+
+@pytest.fixture
+def api(tmp_path):
+    refreshers = {}
+    for subject_id, num_clusters in (("bono", 6), ("other", 4)):
+        path = tmp_path / f"{subject_id}.csv"
+        path.write_bytes(make_csv(make_full_df(num_clusters=num_clusters)))
+        refreshers[subject_id] = SnapshotRefresher(DataSource(str(path)))
+        refreshers[subject_id].refresh()
+
+    server = flask.Flask(__name__)
+    server.register_blueprint(
+        make_api(refreshers.__getitem__, lambda: sorted(refreshers))
+    )
+    return server.test_client(), refreshers
+
+
+def test_api_fields(api):
+    client, refreshers = api
+    assert client.get("/api/v1/subjects").get_json() == {"subjects": ["bono", "other"]}
+
+    body = client.get("/api/v1/subjects/bono").get_json()
+    snapshot = refreshers["bono"].snapshot
+    assert list(body) == list(FIELDS)
+    assert body["version"] == snapshot.version
+    assert body["days_since"] == snapshot.days_since
+    assert body["likelihood"]["percent"] == snapshot.likelihood_model.likelihood(
+        snapshot.days_since
+    )
+    assert body["cluster_size"]["message"] == snapshot.next_cluster_size
+    assert len(body["clusters"]) == 6
+    assert [cluster["number"] for cluster in body["clusters"]] == [2] * 6
+    assert len(body["intervals"]) == 5
+
+    assert client.get("/api/v1/subjects/bono/days_since").get_json() == (
+        snapshot.days_since
+    )
+    assert client.get("/api/v1/subjects/nobody").status_code == 404
+    assert client.get("/api/v1/subjects/bono/nothing").status_code == 400
+
+
+def test_api_batch(api):
+    client, refreshers = api
+    response = client.get("/api/v1/batch?fields=days_since,clusters")
+    body = response.get_json()
+    assert list(body) == ["bono", "other"]
+    assert list(body["bono"]) == ["days_since", "clusters"]
+    assert len(body["other"]["clusters"]) == 4
+
+    single = client.get("/api/v1/batch?subjects=other&fields=version").get_json()
+    assert single == {"other": {"version": refreshers["other"].snapshot.version}}
+    assert client.get("/api/v1/batch?subjects=bono,nobody").status_code == 404
+    assert client.get("/api/v1/batch?fields=days_since,nothing").status_code == 400
+
+
+def test_api_etags(api, tmp_path):
+    """
+    Unchanged responses should be revalidated with a 304, and new data should change the ETag
+    """
+    client, refreshers = api
+    response = client.get("/api/v1/subjects/bono")
+    etag = response.headers["ETag"]
+    assert not response.headers["ETag"].startswith("W/")
+    assert json.loads(response.data) == response.get_json()
+
+    cached = client.get("/api/v1/subjects/bono", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.data == b""
+
+    # a refresh without new data keeps the ETag, and the same fields of other requests differ
+    refreshers["bono"].refresh()
+    assert client.get("/api/v1/subjects/bono").headers["ETag"] == etag
+    assert client.get("/api/v1/subjects/bono?fields=version").headers["ETag"] != etag
+
+    (tmp_path / "bono.csv").write_bytes(make_csv(make_full_df(num_clusters=7)))
+    refreshers["bono"].source.ttl = 0
+    refreshers["bono"].refresh()
+    response = client.get("/api/v1/subjects/bono", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert len(response.get_json()["clusters"]) == 7
+
+
+def test_api_loading(api):
+    """
+    A subject without a snapshot is left out of a batch of every subject, and otherwise gets a 503
+    """
+    _, refreshers = api
+    server = flask.Flask(__name__)
+    ids = ["bono", "loading", "other"]
+    server.register_blueprint(
+        make_api(
+            lambda subject_id: (
+                None if subject_id == "loading" else refreshers[subject_id]
+            ),
+            lambda: ids,
+        )
+    )
+    client = server.test_client()
+    assert list(client.get("/api/v1/batch?fields=version").get_json()) == [
+        "bono",
+        "other",
+    ]
+    for url in ("/api/v1/subjects/loading", "/api/v1/batch?subjects=bono,loading"):
+        response = client.get(url)
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "5"
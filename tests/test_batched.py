@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+from constructors import make_full_df
+
+from trackerApp.batched import (
+    batched_cluster_events,
+    batched_get_intervals,
+    batched_likelihood_of_seizure,
+    batched_most_recent_seizure,
+    batched_stats,
+    concat_subjects,
+)
+from trackerApp.statistical_params import (
+    _index_to_ns,
+    cluster_events,
+    get_cluster_info,
+    get_clusters,
+    get_intervals,
+    likelihood_of_seizure,
+    most_recent_seizure,
+)
+
+
+def _make_subjects():
+    rng = np.random.default_rng(1)
+    dfs = [
+        make_full_df(len_cluster=2, num_clusters=6),
+        make_full_df(days_ago_start=300, len_cluster=3, num_clusters=15),
+        make_full_df(days_ago_start=50, len_cluster=1, num_clusters=1),
+        make_full_df(days_ago_start=400, len_cluster=2, num_clusters=25),
+    ]
+    # jitter so the subjects' intervals vary
+    for df in dfs:
+        jitter = rng.integers(0, 5, size=len(df)) * np.timedelta64(1, "D")
+        df.index = (df.index + pd.to_timedelta(np.cumsum(jitter))).sort_values()
+    return dfs
+
+
+def test_batched_matches_single_subject():
+    dfs = _make_subjects()
+    times, offsets = concat_subjects([_index_to_ns(df.index) for df in dfs])
+
+    days_since = batched_most_recent_seizure(times, offsets)
+    clusters, cluster_offsets = batched_cluster_events(times, offsets)
+    intervals = batched_get_intervals(clusters, cluster_offsets)
+    likelihood, next_updates, next_likelihood = batched_likelihood_of_seizure(
+        days_since, intervals
+    )
+
+    for subject, df in enumerate(dfs):
+        assert days_since[subject] == most_recent_seizure(df)
+
+        single = cluster_events(_index_to_ns(df.index))
+        subject_clusters = slice(*cluster_offsets[subject : subject + 2])
+        np.testing.assert_array_equal(clusters.counts[subject_clusters], single.counts)
+        np.testing.assert_array_equal(clusters.starts[subject_clusters], single.starts)
+
+        single_intervals = get_intervals(get_cluster_info(get_clusters(df)))
+        subject_intervals = slice(*intervals.offsets[subject : subject + 2])
+        if single_intervals.empty:
+            assert subject_intervals.start == subject_intervals.stop
+            assert np.isnan(likelihood[subject])
+            continue
+        np.testing.assert_array_equal(
+            intervals.interval_days[subject_intervals], single_intervals.interval_days
+        )
+        np.testing.assert_array_equal(
+            intervals.prev_cluster_size[subject_intervals],
+            single_intervals.prev_cluster_size,
+        )
+
+        for days in [0, 5, 12, int(days_since[subject]), 100]:
+            expected = likelihood_of_seizure(days, single_intervals)
+            batched = batched_likelihood_of_seizure(np.full(len(dfs), days), intervals)
+            result = [values[subject] for values in batched]
+            numeric = {"low": 0, "very high": 100, "N/A": np.nan}
+            expected = [numeric.get(value, value) for value in expected]
+            np.testing.assert_array_equal(result, expected)
+
+
+def test_batched_stats_with_empty_subject():
+    dfs = _make_subjects()
+    times = [_index_to_ns(df.index) for df in dfs]
+    times.insert(1, np.empty(0, dtype="int64"))
+    stats = batched_stats(*concat_subjects(times))
+    assert len(stats) == 5
+    assert stats.days_since[1] == -1
+    assert stats.clusters[1] == 0
+    assert stats.clusters[0] == len(cluster_events(times[0]).counts)
@@ -0,0 +1,45 @@
+import numpy as np
+
+from trackerApp.bootstrap import (
+    bootstrap_likelihood,
+    bootstrap_subjects,
+    cached_bootstrap_likelihood,
+)
+from trackerApp.statistical_params import LikelihoodModel
+
+
+def test_bootstrap_likelihood():
+    rng = np.random.default_rng(0)
+    interval_days = rng.integers(5, 30, size=40)
+    result = bootstrap_likelihood(interval_days, 15, n_boot=500)
+
+    assert result.likelihood == LikelihoodModel(interval_days).likelihood(15)
+    assert result.lower <= result.likelihood <= result.upper
+    assert result.lower < result.upper
+    assert result.confidence == 0.95
+
+    # the same seed gives the same interval, wider confidence a wider interval
+    assert bootstrap_likelihood(interval_days, 15, n_boot=500) == result
+    wider = bootstrap_likelihood(interval_days, 15, n_boot=500, confidence=0.99)
+    assert wider.lower <= result.lower and wider.upper >= result.upper
+
+
+def test_bootstrap_chunks_and_workers():
+    interval_days = np.arange(3, 30)
+    serial = bootstrap_likelihood(interval_days, 10, n_boot=4500)
+    parallel = bootstrap_likelihood(interval_days, 10, n_boot=4500, workers=2)
+    assert serial == parallel
+
+    subjects = bootstrap_subjects([interval_days, interval_days[:5]], [10, 4], 200)
+    assert subjects == bootstrap_subjects(
+        [interval_days, interval_days[:5]], [10, 4], 200, workers=2
+    )
+    assert subjects[0] == bootstrap_likelihood(interval_days, 10, 200)
+
+
+def test_cached_bootstrap_likelihood():
+    interval_days = np.arange(3, 30)
+    first = cached_bootstrap_likelihood("v1", interval_days, 10, 100)
+    # a cached result is returned for the same version, whatever the intervals
+    assert cached_bootstrap_likelihood("v1", interval_days[:3], 10, 100) is first
+    assert cached_bootstrap_likelihood("v2", interval_days[:3], 10, 100) != first
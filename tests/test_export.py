@@ -0,0 +1,75 @@
+import gzip
+import json
+
+from constructors import make_csv, make_full_df
+
+from trackerApp.export import export_site, main, read_manifest
+from trackerApp.inout import DataSource
+from trackerApp.snapshot import FIGURE_LABELS, SnapshotRefresher
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def test_export_site(tmp_path):
+    """
+    The site should have each subject's page, stats and compressed figures, and only be written again
+    when the data changes
+    """
+    sheet = tmp_path / "sheet.csv"
+    sheet.write_bytes(make_csv(make_full_df(num_clusters=6)))
+    site = tmp_path / "site"
+    refreshers = {"bono": SnapshotRefresher(DataSource(str(sheet), ttl=0))}
+
+    assert export_site(str(site), ["bono"], refreshers) == ["bono"]
+    snapshot = refreshers["bono"].snapshot
+    assert (site / "plotly.min.js").exists()
+    assert "bono/" in (site / "index.html").read_text()
+    page = (site / "bono" / "index.html").read_text()
+    assert f"<strong>{snapshot.days_since}</strong> days ago" in page
+    for fig_type in FIGURE_LABELS:
+        path = site / "bono" / "figures" / f"{fig_type}.json"
+        assert json.loads(path.read_bytes()) == snapshot.figures[fig_type]
+        assert (
+            gzip.decompress(
+                (site / "bono" / "figures" / f"{fig_type}.json.gz").read_bytes()
+            )
+            == path.read_bytes()
+        )
+        if brotli is not None:
+            compressed = (
+                site / "bono" / "figures" / f"{fig_type}.json.br"
+            ).read_bytes()
+            assert brotli.decompress(compressed) == path.read_bytes()
+    stats = json.loads((site / "bono" / "stats.json").read_text())
+    assert stats["days_since"] == snapshot.days_since
+    assert stats["messages"]["likelihood"] == snapshot.likelihood_message
+    assert read_manifest(str(site))["bono"]["version"] == snapshot.version
+
+    # unchanged data isn't exported again, even by a new process
+    assert export_site(str(site), ["bono"], refreshers) == []
+    assert (
+        export_site(
+            str(site), ["bono"], {"bono": SnapshotRefresher(DataSource(str(sheet)))}
+        )
+        == []
+    )
+    assert export_site(str(site), ["bono"], refreshers, force=True) == ["bono"]
+
+    sheet.write_bytes(make_csv(make_full_df(num_clusters=7)))
+    assert export_site(str(site), ["bono"], refreshers) == ["bono"]
+    stats = json.loads((site / "bono" / "stats.json").read_text())
+    assert len(stats["clusters"]) == 7
+
+
+def test_export_main(tmp_path, monkeypatch):
+    sheet = tmp_path / "sheet.csv"
+    sheet.write_bytes(make_csv(make_full_df()))
+    monkeypatch.setattr(
+        "trackerApp.export.get_subject_source",
+        lambda subject_id: DataSource(str(sheet)),
+    )
+    assert main([str(tmp_path / "site"), "--subject", "other"]) == 0
+    assert (tmp_path / "site" / "other" / "figures" / "bars_timeseries.json").exists()
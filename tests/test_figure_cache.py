@@ -0,0 +1,41 @@
+import plotly.graph_objects as go
+
+from trackerApp.figure_cache import FigureCache
+
+
+def _make_fig(builds: list, name: str):
+    def build():
+        builds.append(name)
+        return go.Figure(go.Bar(x=[1, 2], y=[3, 4], name=name))
+
+    return build
+
+
+def test_figure_cache_hits():
+    builds = []
+    cache = FigureCache()
+    first = cache.get("v1", "bars", _make_fig(builds, "a"))
+    assert cache.get("v1", "bars", _make_fig(builds, "a")) is first
+    assert first["data"][0]["y"] == [3, 4]
+
+    # a new data version or new parameters are a miss
+    cache.get("v2", "bars", _make_fig(builds, "b"))
+    cache.get("v2", "bars", _make_fig(builds, "c"), gap_days=4)
+    assert builds == ["a", "b", "c"]
+    assert cache.stats() == {"hits": 1, "misses": 3, "evictions": 0, "size": 3}
+
+
+def test_figure_cache_lru_eviction():
+    builds = []
+    cache = FigureCache(max_size=2)
+    cache.get("v1", "a", _make_fig(builds, "a"))
+    cache.get("v1", "b", _make_fig(builds, "b"))
+    cache.get("v1", "a", _make_fig(builds, "a"))
+    cache.get("v1", "c", _make_fig(builds, "c"))
+    assert len(cache) == 2
+    assert cache.evictions == 1
+
+    # b was least recently used, so was evicted
+    cache.get("v1", "a", _make_fig(builds, "a"))
+    cache.get("v1", "b", _make_fig(builds, "b"))
+    assert builds == ["a", "b", "c", "b"]
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+from constructors import make_full_df
+
+from trackerApp.gap_sweep import GapSweep
+from trackerApp.statistical_params import (
+    LikelihoodModel,
+    _index_to_ns,
+    cluster_events,
+    get_cluster_info,
+    get_intervals,
+)
+
+
+def test_gap_sweep_matches_clustering():
+    rng = np.random.default_rng(0)
+    gap_days = np.arange(0.5, 14.5, 0.5)
+    for _ in range(25):
+        n_events = rng.integers(1, 300)
+        times = np.sort(
+            rng.integers(0, 400 * 86_400_000_000_000, size=n_events, dtype="int64")
+        )
+        sweep = GapSweep(times, gap_days)
+        days_since = int(rng.integers(0, 30))
+        stats = sweep.stats(days_since)
+        for gap in gap_days:
+            clusters = cluster_events(times, gap)
+            intervals = get_intervals(get_cluster_info(clusters))
+            model = LikelihoodModel(intervals)
+            row = stats.loc[gap]
+            assert row.clusters == len(clusters.counts)
+            np.testing.assert_array_equal(
+                sweep.intervals(gap), np.sort(intervals.interval_days)
+            )
+            assert row.likelihood == model.likelihood(days_since)
+            next_change = model.next_change(days_since)
+            if next_change is None:
+                assert np.isnan(row.next_updates)
+            else:
+                assert row.next_updates == next_change - days_since
+                assert row.next_likelihood == model.likelihood(next_change)
+
+
+def test_gap_sweep_small():
+    times = _index_to_ns(make_full_df().index)
+    stats = GapSweep(times, [3, 30]).stats(5)
+    assert stats.clusters.tolist() == [6, 1]
+    assert stats.mean_cluster_size.tolist() == [2, 12]
+    assert stats.loc[3].median_interval == 13
+    assert np.isnan(stats.loc[30].median_interval)
+
+    stats = GapSweep(np.empty(0, dtype="int64"), [3]).stats(5)
+    assert stats.clusters.tolist() == [0]
+    assert stats.likelihood.tolist() == [0]
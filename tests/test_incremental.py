@@ -0,0 +1,103 @@
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from constructors import CsvServer, make_csv, make_full_df
+
+from trackerApp.incremental import CHECKED_TAIL, IncrementalPipeline
+from trackerApp.inout import DataSource, parse_csv
+from trackerApp.rolling import RollingStats
+from trackerApp.statistical_params import get_clusters, get_cluster_info, get_intervals
+from trackerApp.temporal import TemporalPatterns
+
+
+def _assert_matches_full_rebuild(pipeline: IncrementalPipeline, df: pd.DataFrame):
+    cluster_info = get_cluster_info(get_clusters(df))
+    pd.testing.assert_frame_equal(pipeline.cluster_info, cluster_info)
+    pd.testing.assert_frame_equal(pipeline.intervals, get_intervals(cluster_info))
+    np.testing.assert_array_equal(pipeline.clusters.counts, cluster_info.number)
+    np.testing.assert_array_equal(
+        pipeline.temporal.counts, TemporalPatterns.from_df(df).counts
+    )
+    rolling = RollingStats.from_df(df)
+    np.testing.assert_array_equal(pipeline.rolling.daily, rolling.daily)
+    pd.testing.assert_series_equal(
+        pipeline.rolling.clusters_per_month(), rolling.clusters_per_month()
+    )
+
+
+def test_incremental_matches_full_rebuild():
+    """
+    Appending rows in chunks, including ones which extend the open cluster, should match a full rebuild
+    """
+    df = make_full_df(days_ago_start=200, len_cluster=3, num_clusters=12)
+    pipeline = IncrementalPipeline()
+    for end in [4, 5, 9, 10, 11, 20, 27, 36]:
+        pipeline.update(df.iloc[:end])
+        _assert_matches_full_rebuild(pipeline, df.iloc[:end])
+    assert pipeline.full_rebuilds == 1
+    assert pipeline.watermark.count == 36
+
+
+def test_incremental_rebuilds_on_edit():
+    df = make_full_df(len_cluster=2, num_clusters=6)
+    pipeline = IncrementalPipeline()
+    pipeline.update(df.iloc[:8])
+
+    edited = df.iloc[:10].copy()
+    edited.index = edited.index.where(
+        np.arange(10) != 2, edited.index[2] + dt.timedelta(hours=1)
+    )
+    pipeline.update(edited)
+    assert pipeline.full_rebuilds == 2
+    _assert_matches_full_rebuild(pipeline, edited)
+
+    # no new rows, nothing to do
+    pipeline.update(edited)
+    assert pipeline.full_rebuilds == 2
+
+
+def test_incremental_checks_bounded_tail():
+    """
+    Edits before the checked tail are found from the parsed version, and empty data changes nothing
+    """
+    df = make_full_df(days_ago_start=400, len_cluster=3, num_clusters=40)
+    assert len(df) > CHECKED_TAIL
+    pipeline = IncrementalPipeline()
+    pipeline.update(df.iloc[:100], "first")
+    pipeline.update(df, "first")
+    assert pipeline.full_rebuilds == 1
+
+    edited = df.copy()
+    edited.index = edited.index.where(
+        np.arange(len(df)) != 2, edited.index[2] + dt.timedelta(hours=1)
+    )
+    pipeline.update(edited, "edited")
+    assert pipeline.full_rebuilds == 2
+    _assert_matches_full_rebuild(pipeline, edited)
+
+    watermark = pipeline.watermark
+    with pytest.raises(ValueError):
+        pipeline.update(df.iloc[:0], "empty")
+    assert pipeline.watermark == watermark
+    assert pipeline.parsed_version == "edited"
+
+
+def test_data_source_parses_appended_tail():
+    df = make_full_df(len_cluster=2, num_clusters=6)
+    with CsvServer(make_csv(df.iloc[:6])) as server:
+        source = DataSource(server.url, ttl=0)
+        first = source.get()
+
+        server.content = make_csv(df)
+        appended = source.get()
+        pd.testing.assert_frame_equal(appended.iloc[:6], first)
+        pd.testing.assert_frame_equal(appended, parse_csv(make_csv(df)))
+
+        # an out of order row means the whole csv is parsed and sorted
+        server.content = make_csv(df) + make_csv(df.iloc[:1])
+        reparsed = source.get()
+        assert len(reparsed) == 13
+        assert reparsed.index.is_monotonic_increasing
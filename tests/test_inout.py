@@ -0,0 +1,132 @@
+import pandas as pd
+
+from constructors import CsvServer, make_csv, make_full_df
+
+from trackerApp.inout import DataSource, parse_csv
+
+
+def test_parse_csv():
+    content = b"2021-05-09 10:33:00\n2021-05-01 08:00:00\n"
+    df = parse_csv(content)
+    assert len(df) == 2
+    assert df.index.is_monotonic_increasing
+    assert str(df.index.tz) == "UTC"
+
+
+def test_data_source_ttl():
+    """
+    Within the ttl the source should be served from memory without contacting the server
+    """
+    content = make_csv(make_full_df())
+    with CsvServer(content) as server:
+        source = DataSource(server.url, ttl=3600)
+        df = source.get()
+        assert source.get() is df
+        assert server.requests == 1
+        pd.testing.assert_index_equal(df.index, parse_csv(content).index)
+
+
+def test_data_source_revalidation():
+    """
+    Once the ttl expires the source should revalidate, and only re-parse when the content changes
+    """
+    with CsvServer(make_csv(make_full_df())) as server:
+        source = DataSource(server.url, ttl=0)
+        df = source.get()
+        version = source.version
+
+        assert source.get() is df
+        assert server.requests == 2
+        assert server.not_modified == 1
+
+        server.content = make_csv(make_full_df(num_clusters=7))
+        new_df = source.get()
+        assert new_df is not df
+        assert len(new_df) == 14
+        assert source.version != version
+
+
+def test_data_source_content_hash():
+    """
+    Without an ETag the content is downloaded again, but unchanged content is not re-parsed
+    """
+    with CsvServer(make_csv(make_full_df()), etag=False) as server:
+        source = DataSource(server.url, ttl=0)
+        df = source.get()
+        assert source.get() is df
+        assert server.requests == 2
+        assert server.not_modified == 0
+
+
+def test_data_source_serves_stale_on_failure():
+    with CsvServer(make_csv(make_full_df())) as server:
+        source = DataSource(server.url, ttl=0)
+        df = source.get()
+    assert source.get() is df
+
+
+def test_data_source_malformed_rows():
+    """
+    Malformed rows should be left out and kept on the source, including those in appended rows
+    """
+    content = make_csv(make_full_df()) + b"not a time\n"
+    with CsvServer(content) as server:
+        source = DataSource(server.url, ttl=0)
+        df = source.get()
+        assert len(df) == 12
+        assert source.malformed == [(13, "not a time")]
+
+        server.content = content + b"2099-01-01 00:00:00\n2099-01-02 25:00:00\n"
+        df = source.get()
+        assert len(df) == 13
+        assert source.malformed == [(13, "not a time"), (15, "2099-01-02 25:00:00")]
+
+
+def test_data_source_appended_without_trailing_newline():
+    """
+    Rows appended to a csv published with CRLF line breaks and no trailing one should be parsed alone
+    """
+    df = make_full_df(num_clusters=6)
+
+    def published(rows: pd.DataFrame) -> bytes:
+        return make_csv(rows).rstrip(b"\n").replace(b"\n", b"\r\n")
+
+    with CsvServer(published(df.iloc[:6])) as server:
+        source = DataSource(server.url, ttl=0)
+        first = source.get()
+        parsed_version = source.parsed_version
+        assert parsed_version == source.version
+
+        server.content = published(df)
+        appended = source.get()
+        assert source.parsed_version == parsed_version
+        pd.testing.assert_frame_equal(appended, parse_csv(make_csv(df)))
+        pd.testing.assert_frame_equal(appended.iloc[:6], first)
+
+        # a change to the last row means the whole csv is parsed again
+        server.content = published(df) + b"5"
+        assert len(source.get()) == 11
+        assert source.parsed_version == source.version
+        assert [line for line, _ in source.malformed] == [12]
+
+
+def test_data_source_serves_stale_on_unparseable_content(caplog):
+    """
+    Content without any parseable rows, such as an error page, should be logged and not revalidated
+    against, so the source serves its cached data until the csv is back
+    """
+    with CsvServer(make_csv(make_full_df())) as server:
+        source = DataSource(server.url, ttl=0)
+        df = source.get()
+        version = source.version
+
+        server.content = b"<!DOCTYPE html>\n<html><body>Error</body></html>\n"
+        assert source.get() is df
+        assert source.version == version
+        assert "Failed to parse" in caplog.text
+        # the error page's ETag wasn't kept, so it is fetched again rather than taken as unchanged
+        assert source.get() is df
+        assert server.not_modified == 0
+
+        server.content = make_csv(make_full_df(num_clusters=7))
+        assert len(source.get()) == 14
@@ -0,0 +1,90 @@
+import pandas as pd
+import numpy as np
+
+from constructors import make_full_df
+
+from benchmarks.legacy import legacy_make_fig_text
+
+from trackerApp.make_graphs import aggregate_clusters, make_fig_text, make_timeseries
+from trackerApp.statistical_params import get_cluster_info, get_clusters
+
+
+def test_make_fig_text():
+    cluster_info = get_cluster_info(get_clusters(make_full_df()))
+    assert make_fig_text(cluster_info) == legacy_make_fig_text(cluster_info)
+    assert make_fig_text(cluster_info, "Asia/Tokyo") == legacy_make_fig_text(
+        cluster_info, "Asia/Tokyo"
+    )
+    assert make_fig_text(cluster_info.iloc[:0]) == []
+
+    # times either side of the clocks changing
+    times = pd.DatetimeIndex(
+        [
+            "2021-03-28 00:30",
+            "2021-03-28 01:30",
+            "2021-10-31 00:30",
+            "2021-10-31 01:30",
+        ],
+        tz="UTC",
+    )
+    df = pd.DataFrame(np.zeros(len(times)), index=times)
+    cluster_info = get_cluster_info(get_clusters(df, gap_days=0))
+    assert make_fig_text(cluster_info) == legacy_make_fig_text(cluster_info)
+
+
+def test_make_timeseries_tz():
+    cluster_info = get_cluster_info(get_clusters(make_full_df()))
+    fig = make_timeseries(cluster_info, tz="UTC")
+    expected = cluster_info.start.dt.strftime("%H:%M %d/%m/%Y").tolist()
+    assert [text[0] for text in fig.data[0].customdata] == expected
+    assert fig.layout.title.text == "Seizure clusters over time"
+    fig = make_timeseries(cluster_info, subject="rex")
+    assert fig.layout.title.text == "Rex seizure clusters over time"
+
+
+def _daily_cluster_info(n_clusters: int) -> pd.DataFrame:
+    """
+    Cluster info for a cluster of three seizures every five days
+    """
+    times = pd.Timestamp("2015-01-01", tz="UTC") + pd.to_timedelta(
+        np.repeat(np.arange(n_clusters) * 5, 3) + np.tile([0, 0.1, 0.2], n_clusters),
+        unit="D",
+    )
+    return get_cluster_info(get_clusters(pd.DataFrame(index=times)))
+
+
+def test_aggregate_clusters():
+    cluster_info = _daily_cluster_info(2000)
+    assert aggregate_clusters(cluster_info, max_bars=2000).equals(
+        cluster_info.assign(clusters=1)
+    )
+
+    bars = aggregate_clusters(cluster_info, max_bars=100)
+    assert len(bars) <= 100
+    assert bars.clusters.sum() == len(cluster_info)
+    assert bars.number.sum() == cluster_info.number.sum()
+    assert bars.start.iloc[0] == cluster_info.start.iloc[0]
+    assert bars.end.iloc[-1] == cluster_info.end.iloc[-1]
+    assert (bars.start <= bars.middle + bars.width / 2).all()
+    assert (bars.end >= bars.middle - bars.width / 2).all()
+
+    # zooming in draws the clusters in range in more detail
+    x_range = cluster_info.start.iloc[500], cluster_info.start.iloc[1499]
+    bars = aggregate_clusters(cluster_info, max_bars=100, x_range=x_range)
+    assert len(bars) <= 100
+    assert bars.clusters.sum() == 1000
+    bars = aggregate_clusters(cluster_info, max_bars=1000, x_range=x_range)
+    assert bars.clusters.max() == 1
+    assert bars.start.tolist() == cluster_info.start.iloc[500:1500].tolist()
+
+
+def test_make_timeseries_bounded():
+    cluster_info = _daily_cluster_info(2000)
+    fig = make_timeseries(cluster_info, max_bars=100)
+    assert len(fig.data[0].x) <= 100
+    assert len(fig.data[1].x) <= 100
+    assert fig.data[0].customdata[0][2] == "20"
+
+    fig = make_timeseries(cluster_info, max_bars=2000)
+    assert len(fig.data[0].x) == 2000
+    assert fig.data[0].width == 86400000
@@ -0,0 +1,67 @@
+import time
+
+from trackerApp import metrics
+from trackerApp.metrics import Metric, register_collector, render, timed, timings
+
+
+def test_timed():
+    metrics.reset()
+
+    @timed("decorated")
+    def decorated(seconds):
+        time.sleep(seconds)
+        return seconds
+
+    assert decorated(0.002) == 0.002
+    assert decorated.__name__ == "decorated"
+    decorated(0)
+    with timed("block"):
+        pass
+    try:
+        with timed("block"):
+            raise ValueError
+    except ValueError:
+        pass
+
+    histograms = timings()
+    assert histograms["decorated"].count == 2
+    assert histograms["decorated"].sum >= 0.002
+    # the quick call is in the first bucket, the sleep isn't
+    assert histograms["decorated"].counts[0] == 1
+    assert histograms["block"].count == 2
+
+
+def test_render():
+    metrics.reset()
+    metrics.observe("parse_csv", 0.003)
+    metrics.observe("parse_csv", 20)
+    register_collector(
+        lambda: [
+            Metric(
+                "test_gauge",
+                "gauge",
+                "A test",
+                [({"subject": 'a "quoted" id'}, 1.5), ({"subject": "b"}, float("nan"))],
+            )
+        ]
+    )
+    text = render()
+    lines = text.splitlines()
+    assert "# TYPE seizure_tracker_stage_seconds histogram" in lines
+    assert (
+        'seizure_tracker_stage_seconds_bucket{stage="parse_csv",le="0.001"} 0' in lines
+    )
+    assert (
+        'seizure_tracker_stage_seconds_bucket{stage="parse_csv",le="0.005"} 1' in lines
+    )
+    assert (
+        'seizure_tracker_stage_seconds_bucket{stage="parse_csv",le="10.0"} 1' in lines
+    )
+    assert (
+        'seizure_tracker_stage_seconds_bucket{stage="parse_csv",le="+Inf"} 2' in lines
+    )
+    assert 'seizure_tracker_stage_seconds_count{stage="parse_csv"} 2' in lines
+    assert "# TYPE seizure_tracker_test_gauge gauge" in lines
+    assert 'seizure_tracker_test_gauge{subject="a \\"quoted\\" id"} 1.5' in lines
+    assert 'seizure_tracker_test_gauge{subject="b"} NaN' in lines
+    metrics._collectors.pop()
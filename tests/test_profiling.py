@@ -0,0 +1,109 @@
+import cProfile
+import io
+import os
+import threading
+import time
+import tracemalloc
+
+from trackerApp import profiling
+from trackerApp.profiling import (
+    ProfileSettings,
+    main,
+    profiled,
+    recent_profiles,
+    summarise,
+)
+
+
+def _slow(seconds):
+    time.sleep(seconds)
+    return sum(range(1000))
+
+
+def test_profiled_disabled(tmp_path):
+    settings = ProfileSettings(enabled=False, directory=str(tmp_path))
+    assert profiled("slow", settings)(_slow) is _slow
+
+
+def test_profiled_keeps_slow_calls(tmp_path):
+    settings = ProfileSettings(
+        enabled=True, threshold_ms=20, memory=True, directory=str(tmp_path), keep=3
+    )
+    slow = profiled("slow", settings)(_slow)
+    outer = profiled("outer", settings)(lambda: slow(0.03))
+
+    assert slow(0) == sum(range(1000))
+    assert recent_profiles(str(tmp_path)) == []
+
+    for _ in range(5):
+        slow(0.03)
+    paths = recent_profiles(str(tmp_path))
+    assert len(paths) == 3
+    assert len(os.listdir(tmp_path)) == 6
+
+    # a nested call is part of the outer call's profile
+    outer()
+    newest = os.path.basename(recent_profiles(str(tmp_path))[-1])
+    assert "_outer_" in newest
+
+    stream = io.StringIO()
+    stats = summarise(recent_profiles(str(tmp_path)), top=5, stream=stream)
+    assert "peak" in stream.getvalue()
+    assert any(func[2] == "_slow" for func in stats.stats)
+
+    assert main(["--dir", str(tmp_path), "--name", "slow", "--top", "3"]) == 0
+    assert main(["--dir", str(tmp_path / "missing")]) == 1
+
+
+def test_profiled_one_call_at_a_time(tmp_path):
+    """
+    Calls made while another thread's call is profiled run unprofiled, rather than failing
+    """
+    settings = ProfileSettings(
+        enabled=True, threshold_ms=0, memory=True, directory=str(tmp_path)
+    )
+    started, release = threading.Event(), threading.Event()
+
+    @profiled("first", settings)
+    def first():
+        started.set()
+        release.wait(5)
+
+    @profiled("second", settings)
+    def second():
+        return 2
+
+    thread = threading.Thread(target=first)
+    thread.start()
+    started.wait(5)
+    assert second() == 2
+    release.set()
+    thread.join()
+    names = [os.path.basename(path) for path in recent_profiles(str(tmp_path))]
+    assert len(names) == 1 and "_first_" in names[0]
+    assert not tracemalloc.is_tracing()
+
+    # once it is done the next call is profiled
+    assert second() == 2
+    assert len(recent_profiles(str(tmp_path))) == 2
+
+
+def test_profiled_other_profiler_active(tmp_path, monkeypatch):
+    """
+    A call is still made, and the profiler freed, when another profiling tool is active
+    """
+
+    class ActiveProfile(cProfile.Profile):
+        def enable(self, *args, **kwargs):
+            raise ValueError("Another profiling tool is already active")
+
+    monkeypatch.setattr(profiling.cProfile, "Profile", ActiveProfile)
+    settings = ProfileSettings(
+        enabled=True, threshold_ms=0, memory=True, directory=str(tmp_path)
+    )
+    slow = profiled("slow", settings)(_slow)
+    assert slow(0) == sum(range(1000))
+    assert recent_profiles(str(tmp_path)) == []
+    assert not tracemalloc.is_tracing()
+    assert profiling._profiling.acquire(blocking=False)
+    profiling._profiling.release()
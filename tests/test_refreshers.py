@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+
+from constructors import make_csv, make_full_df
+
+from trackerApp.inout import DataSource
+from trackerApp.refreshers import SubjectRefreshers
+
+
+class SlowSource(DataSource):
+    """A source which waits for release before its first read"""
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.release = threading.Event()
+
+    def get(self):
+        self.release.wait(5)
+        return super().get()
+
+
+@pytest.fixture
+def sources(tmp_path):
+    sources = {}
+    for subject_id, num_clusters in (("bono", 6), ("other", 4)):
+        path = tmp_path / f"{subject_id}.csv"
+        path.write_bytes(make_csv(make_full_df(num_clusters=num_clusters)))
+        sources[subject_id] = DataSource(str(path))
+    slow = tmp_path / "slow.csv"
+    slow.write_bytes(make_csv(make_full_df(num_clusters=3)))
+    sources["slow"] = SlowSource(str(slow))
+    return sources
+
+
+def test_subject_refreshers(sources):
+    """
+    Subjects start on first use, and a subject's first refresh doesn't hold up the others
+    """
+    refreshers = SubjectRefreshers(sources.__getitem__)
+    for path in ("nobody", "favicon.ico", "wp-admin"):
+        with pytest.raises(KeyError):
+            refreshers.get(path)
+    assert refreshers._starting == {}
+
+    thread = threading.Thread(target=refreshers.get, args=("slow",))
+    thread.start()
+    time.sleep(0.05)
+    bono = refreshers.get("bono")
+    assert bono.snapshot is not None
+    title = bono.snapshot.figures["bars_timeseries"]["layout"]["title"]["text"]
+    assert title == "Bono seizure clusters over time"
+    assert refreshers.get("bono") is bono
+    assert [subject_id for subject_id, _ in refreshers.items()] == ["bono"]
+    sources["slow"].release.set()
+    thread.join()
+    assert [subject_id for subject_id, _ in refreshers.items()] == ["bono", "slow"]
+
+
+def test_subject_refreshers_peek(sources):
+    """
+    Peeking at a subject without a snapshot builds one in the background rather than waiting for it
+    """
+    refreshers = SubjectRefreshers(sources.__getitem__)
+    with pytest.raises(KeyError):
+        refreshers.peek("nobody")
+    assert refreshers.peek("slow") is None
+    assert refreshers.peek("slow") is None
+    sources["slow"].release.set()
+    for _ in range(100):
+        if refreshers.peek("slow") is not None:
+            break
+        time.sleep(0.05)
+    assert refreshers.peek("slow").snapshot is not None
+
+
+def test_subject_refreshers_refresh_all(sources):
+    """
+    Every started subject is refreshed together, and summarised in one batched pass
+    """
+    sources["slow"].release.set()
+    refreshers = SubjectRefreshers(sources.__getitem__)
+    for subject_id in sources:
+        refreshers.get(subject_id)
+    summary = refreshers.refresh_all()
+    assert list(summary.index) == ["bono", "other", "slow"]
+    for subject_id, refresher in refreshers.items():
+        assert summary.days_since[subject_id] == refresher.snapshot.days_since
+        assert summary.clusters[subject_id] == len(refresher.snapshot.cluster_info)
+
+    # a failed refresh keeps the subject's snapshot and is counted
+    other = refreshers.get("other")
+    snapshot = other.snapshot
+    other.source.get = lambda: 1 / 0
+    refreshers.refresh_all()
+    assert other.failures == 1
+    assert other.snapshot is snapshot
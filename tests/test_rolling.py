@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from constructors import make_random_df
+
+from trackerApp.make_graphs import make_trends
+from trackerApp.rolling import RollingStats
+from trackerApp.statistical_params import get_cluster_info, get_clusters
+
+
+def test_rolling_seizures():
+    df = make_random_df(days=400)
+    rolling = RollingStats.from_df(df)
+    seizures = rolling.seizures(until="2021-03-01")
+    assert seizures.index[0] == df.index[0].floor("D")
+    assert seizures.index[-1] == pd.Timestamp("2021-03-01", tz="UTC")
+    for day in seizures.index[[0, 5, 100, 200, -1]]:
+        for window in [7, 30, 90]:
+            start = day + pd.Timedelta(days=1) - pd.Timedelta(days=window)
+            expected = len(df[start : day + pd.Timedelta(days=1, microseconds=-1)])
+            assert seizures.loc[day, f"{window} days"] == expected
+
+    # counting in chunks matches counting everything at once
+    chunked = RollingStats()
+    times = df.index.asi8
+    for chunk in np.array_split(np.arange(len(times)), 5):
+        chunked.add(times[chunk], [])
+    np.testing.assert_array_equal(chunked.daily, rolling.daily)
+
+
+def test_clusters_per_month():
+    df = make_random_df(50, days=400)
+    clusters = RollingStats.from_df(df).clusters_per_month()
+    starts = get_cluster_info(get_clusters(df)).start
+    expected = starts.dt.tz_localize(None).dt.to_period("M").value_counts()
+    assert clusters.sum() == len(starts)
+    for month, count in expected.items():
+        assert clusters[month.to_timestamp().tz_localize("UTC")] == count
+    assert list(make_trends(df).data[0].y) == clusters.tolist()
+
+    fig = make_trends(df, until="2021-06-01", max_points=50)
+    assert len(fig.data[1].x) <= 50
+    assert pd.Timestamp(fig.data[1].x[-1]) == pd.Timestamp("2021-06-01")
+
+    assert RollingStats().seizures().empty
@@ -0,0 +1,103 @@
+import time
+
+import pandas as pd
+
+from constructors import make_csv, make_full_df
+
+from trackerApp.inout import DataSource
+from trackerApp.snapshot import (
+    SnapshotRefresher,
+    make_gap_sweep_message,
+    make_likelihood_message,
+)
+
+
+def test_make_likelihood_message(tmp_path):
+    refresher = SnapshotRefresher(DataSource(_write_sheet(tmp_path, make_full_df())))
+    refresher.refresh()
+    model = refresher.snapshot.likelihood_model
+    assert "cluster is still active" in make_likelihood_message(0, model)
+    assert "only 1 day ago" in make_likelihood_message(1, model)
+    assert "very high" in make_likelihood_message(30, model)
+
+
+def test_snapshot_bootstrap_interval(tmp_path):
+    path = _write_sheet(tmp_path, make_full_df(days_ago_start=120, num_clusters=6))
+    snapshot = SnapshotRefresher(DataSource(path), bootstrap_samples=200).refresh()
+    assert snapshot.days_since >= 2
+    assert snapshot.likelihood_interval is not None
+    assert "95% interval" in snapshot.likelihood_message
+
+
+def _write_sheet(tmp_path, df) -> str:
+    path = tmp_path / "sheet.csv"
+    path.write_bytes(make_csv(df))
+    return str(path)
+
+
+def test_snapshot_refresher(tmp_path):
+    """
+    The refresher should swap in a new snapshot when the data changes, leaving old snapshots untouched
+    """
+    path = _write_sheet(tmp_path, make_full_df(num_clusters=6))
+    refresher = SnapshotRefresher(DataSource(path, ttl=0), interval=0.05)
+    first = refresher.refresh()
+    assert set(first.figures) == {
+        "bars_timeseries",
+        "bars_time_comparison",
+        "seizure_hour_comparison",
+        "seizure_weekday_hour",
+        "seizure_trends",
+    }
+    assert first.figures["bars_timeseries"]["data"][0]["y"] == [2] * 6
+
+    # unchanged data reuses the figures
+    assert (
+        refresher.refresh().figures["bars_timeseries"]
+        is first.figures["bars_timeseries"]
+    )
+    assert refresher.figure_cache.misses == 5
+
+    refresher.start()
+    try:
+        _write_sheet(tmp_path, make_full_df(num_clusters=7))
+        deadline = time.monotonic() + 5
+        while refresher.snapshot.version == first.version:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    finally:
+        refresher.stop()
+
+    assert refresher.snapshot.figures["bars_timeseries"]["data"][0]["y"] == [2] * 7
+    assert refresher.snapshot.gap_sweep.loc[3].clusters == 7
+    assert first.figures["bars_timeseries"]["data"][0]["y"] == [2] * 6
+    assert refresher.failures == 0
+
+
+def test_make_gap_sweep_message(tmp_path):
+    snapshot = SnapshotRefresher(
+        DataSource(_write_sheet(tmp_path, make_full_df()))
+    ).refresh()
+    assert snapshot.gap_sweep.loc[3].clusters == len(snapshot.cluster_info)
+    message = make_gap_sweep_message(3.2, snapshot.gap_sweep)
+    assert "**3** days" in message and "**6** clusters" in message
+    assert "median of 13 days" in message
+    assert make_gap_sweep_message(14, snapshot.gap_sweep).endswith("on average.")
+
+
+def test_zoomed_timeseries_keeps_snapshot_figures(tmp_path):
+    """
+    Zooming, however often, shouldn't evict the snapshot's figures from the figure cache
+    """
+    refresher = SnapshotRefresher(DataSource(_write_sheet(tmp_path, make_full_df())))
+    snapshot = refresher.refresh()
+    start = snapshot.cluster_info.start.iloc[0]
+    for days in range(1, 50):
+        zoomed = refresher.timeseries((start, start + pd.Timedelta(days=days)))
+        assert zoomed["data"]
+    assert len(refresher.zoom_cache) == refresher.zoom_cache.max_size
+    assert refresher.figure_cache.evictions == 0
+
+    misses = refresher.figure_cache.misses
+    refresher.refresh()
+    assert refresher.figure_cache.misses == misses
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from constructors import CsvServer, make_csv, make_full_df
+
+from trackerApp.inout import DataSource, parse_csv
+from trackerApp.sources import MergedSource, merge_events
+
+MINUTE = 60 * 10**9
+
+
+def test_merge_events():
+    """
+    Events close to one from another stream are dropped, but close events within a stream are kept
+    """
+    phone = np.array([0, 2, 100, 200]) * MINUTE
+    sheet = np.array([1, 3, 4, 150, 201]) * MINUTE
+    vet = np.array([1, 300]) * MINUTE
+    merged = list(merge_events([phone, sheet, vet], tolerance_ns=5 * MINUTE))
+    # 1 matches 0 and is dropped from the sheet and the vet, 3 matches 2, and 4 has nothing left to match
+    assert merged == [t * MINUTE for t in (0, 2, 4, 100, 150, 200, 300)]
+
+    assert list(merge_events([phone, sheet])) == sorted(
+        np.concatenate([phone, sheet]).tolist()
+    )
+    assert list(merge_events([phone])) == phone.tolist()
+    assert list(merge_events([])) == []
+
+
+def test_merged_source(tmp_path):
+    """
+    A merged source reads local and remote csvs, and merges again only when one of them changes
+    """
+    df = make_full_df(num_clusters=6)
+    # the phone logged the first three clusters a minute late, and a seizure missing from the sheet
+    missing = df.index[:1] - pd.Timedelta(days=10)
+    late = df.index[:6] + pd.Timedelta(minutes=1)
+    phone = tmp_path / "phone.csv"
+    phone.write_bytes(make_csv(pd.DataFrame(index=missing.append(late))))
+    with CsvServer(make_csv(df)) as server:
+        merged = MergedSource(
+            [DataSource(str(phone), ttl=0), DataSource(server.url, ttl=0)],
+            tolerance=300,
+        )
+        merged_df = merged.get()
+        # the earlier of each duplicate is kept
+        expected = parse_csv(make_csv(pd.DataFrame(index=missing.append(df.index))))
+        pd.testing.assert_index_equal(merged_df.index, expected.index)
+        version = merged.version
+        assert merged.get() is merged_df
+        assert server.not_modified == 1
+
+        server.content = make_csv(make_full_df(num_clusters=7))
+        assert len(merged.get()) == 15
+        assert merged.version != version
+        assert merged.fetched_at is not None
+
+    # a source which fails after it was read keeps serving its cached data
+    assert len(merged.get()) == 15
@@ -5,14 +5,40 @@ import pytz
 
 from constructors import make_df, make_full_df
 
+from benchmarks.legacy import (
+    legacy_get_cluster_info,
+    legacy_get_clusters,
+    legacy_get_intervals,
+    legacy_likelihood_of_seizure,
+)
+
 from trackerApp.statistical_params import (
     _remove_outliers,
     most_recent_seizure,
     get_clusters,
     get_cluster_info,
+    cluster_events,
+    get_intervals,
+    _index_to_ns,
+    LikelihoodModel,
+    likelihood_of_seizure,
 )
 
 
+def _random_history(rng: np.random.Generator) -> pd.DataFrame:
+    """
+    A history of random clusters, with random gaps either side of gap_days
+    """
+    n_events = rng.integers(2, 300)
+    gaps = rng.choice(
+        [rng.uniform(0, 3), rng.uniform(2.5, 60)], size=n_events
+    ) * rng.uniform(0, 1.5, size=n_events)
+    times = pd.Timestamp("2019-01-01", tz="UTC") + pd.to_timedelta(
+        np.cumsum(gaps), unit="D"
+    )
+    return pd.DataFrame(index=times)
+
+
 def test_remove_outliers():
     """
     Test the method _remove_outliers. Test against np arrays as the series index can change.
@@ -61,3 +87,92 @@ def test_get_cluster_info():
         assert cluster_info.iloc[cluster].end == clusters[cluster].index[1]
         assert cluster_info.iloc[cluster].number == len_cluster
         assert cluster_info.iloc[cluster].width == dt.timedelta(days=len_cluster - 1)
+
+
+def test_get_clusters_matches_legacy():
+    """
+    The vectorised clustering should give the same clusters as the original loop
+    """
+    for len_cluster, num_clusters, cluster_interval in [
+        (2, 6, 14),
+        (3, 10, 7),
+        (1, 4, 5),
+        (4, 20, 30),
+    ]:
+        df = make_full_df(
+            days_ago_start=num_clusters * cluster_interval + 10,
+            len_cluster=len_cluster,
+            num_clusters=num_clusters,
+            cluster_interval=cluster_interval,
+        )
+        clusters = get_clusters(df)
+        legacy = legacy_get_clusters(df)
+        assert len(clusters) == len(legacy)
+        for cluster, legacy_cluster in zip(clusters, legacy):
+            pd.testing.assert_frame_equal(cluster, legacy_cluster)
+
+
+def test_cluster_events():
+    df = make_full_df(len_cluster=3, num_clusters=4)
+    times = _index_to_ns(df.index)
+    clusters = cluster_events(times)
+
+    np.testing.assert_array_equal(clusters.labels, np.repeat(np.arange(4), 3))
+    np.testing.assert_array_equal(clusters.counts, [3, 3, 3, 3])
+    np.testing.assert_array_equal(clusters.starts, times[::3])
+    np.testing.assert_array_equal(clusters.ends, times[2::3])
+
+    # a gap of exactly gap_days keeps the events in the same cluster
+    day = 86_400_000_000_000
+    clusters = cluster_events(np.array([0, 3 * day, 6 * day + 1]), gap_days=3)
+    np.testing.assert_array_equal(clusters.counts, [2, 1])
+
+    assert len(cluster_events(np.array([], dtype="int64")).counts) == 0
+
+
+def test_likelihood_model_matches_legacy():
+    rng = np.random.default_rng(0)
+    for n_intervals in [1, 2, 5, 20, 100]:
+        intervals = pd.DataFrame(
+            {"interval_days": rng.integers(3, 40, size=n_intervals)}
+        )
+        intervals.loc[0, "interval_days"] = 120
+        model = LikelihoodModel(intervals)
+        for days_since in range(0, 60):
+            expected = legacy_likelihood_of_seizure(days_since, intervals)
+            assert model.predict(days_since) == expected
+            assert likelihood_of_seizure(days_since, intervals) == expected
+
+
+def test_likelihood_model_curve():
+    intervals = pd.DataFrame({"interval_days": [10, 5, 20, 10]})
+    model = LikelihoodModel(intervals)
+    days = np.arange(25)
+    curve = model.curve(days)
+    assert list(curve) == [model.likelihood(day) for day in days]
+    assert curve[4] == 0 and curve[5] == 25 and curve[10] == 75 and curve[20] == 100
+    assert model.next_change(5) == 10
+    assert model.next_change(20) is None
+
+
+def test_cluster_info_and_intervals_match_legacy():
+    """
+    Property test the vectorised get_cluster_info and get_intervals on random histories
+    """
+    rng = np.random.default_rng(42)
+    for _ in range(25):
+        df = _random_history(rng)
+        clusters = get_clusters(df)
+        cluster_info = get_cluster_info(clusters)
+        legacy_info = legacy_get_cluster_info(clusters)
+        pd.testing.assert_frame_equal(cluster_info, legacy_info)
+        pd.testing.assert_frame_equal(
+            get_cluster_info(cluster_events(_index_to_ns(df.index))), legacy_info
+        )
+
+        if len(cluster_info) > 1:
+            pd.testing.assert_frame_equal(
+                get_intervals(cluster_info), legacy_get_intervals(legacy_info)
+            )
+        else:
+            assert get_intervals(cluster_info).empty
@@ -0,0 +1,152 @@
+import multiprocessing
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from constructors import CsvServer, make_csv, make_full_df
+
+from trackerApp.inout import DataSource, parse_csv
+from trackerApp.store import open_store, read_header, times_to_df, write_store
+
+
+def test_store_round_trip(tmp_path):
+    path = str(tmp_path / "store.i8")
+    times = np.arange(0, 10**6, 1000, dtype="int64")
+    write_store(path, times, version="abc")
+
+    stored, metadata = open_store(path)
+    assert isinstance(stored, np.memmap)
+    np.testing.assert_array_equal(stored, times)
+    assert metadata == {"version": "abc", "count": len(times)}
+
+    write_store(path, times[:0], version="empty")
+    assert len(open_store(path)[0]) == 0
+
+    (tmp_path / "bad.i8").write_bytes(b"not a store")
+    with pytest.raises(ValueError):
+        read_header(str(tmp_path / "bad.i8"))
+
+
+def test_times_to_df():
+    df = parse_csv(make_csv(make_full_df()))
+    times = df.index.values.view("int64")
+    pd.testing.assert_frame_equal(times_to_df(times), df)
+
+
+def test_data_source_store(tmp_path):
+    """
+    A new source should start from the store, and fall back to it when the server is down
+    """
+    path = str(tmp_path / "store.i8")
+    content = make_csv(make_full_df())
+    with CsvServer(content) as server:
+        df = DataSource(server.url, store_path=path).get()
+        assert read_header(path)["count"] == len(df)
+
+        cold = DataSource(server.url, store_path=path)
+        pd.testing.assert_frame_equal(cold.get(), df)
+        assert server.requests == 1
+
+        # once the store is stale the server is revalidated with the stored ETag
+        stale = DataSource(server.url, ttl=0, store_path=path)
+        pd.testing.assert_frame_equal(stale.get(), df)
+        assert server.not_modified == 1
+
+    offline = DataSource(server.url, ttl=0, store_path=path)
+    pd.testing.assert_frame_equal(offline.get(), df)
+    assert offline.version == stale.version
+
+
+def _poll_source(url, path, ttl, seconds, start, results):
+    """Get the data repeatedly from another process, like a server worker handling callbacks"""
+    source = DataSource(url, ttl=ttl, store_path=path)
+    start.wait()
+    end = time.monotonic() + seconds
+    lengths = [len(source.get())]
+    while time.monotonic() < end:
+        lengths.append(len(source.get()))
+        time.sleep(0.01)
+    results.put((lengths, source.version))
+
+
+def _run_workers(url, path, ttl, seconds, n_workers=4, during=None):
+    """Poll a source from several processes at once, calling during while they run"""
+    context = multiprocessing.get_context("fork")
+    start = context.Event()
+    results = context.Queue()
+    workers = [
+        context.Process(
+            target=_poll_source, args=(url, path, ttl, seconds, start, results)
+        )
+        for _ in range(n_workers)
+    ]
+    for worker in workers:
+        worker.start()
+    start.set()
+    if during is not None:
+        during()
+    outcomes = [results.get(timeout=30) for _ in workers]
+    for worker in workers:
+        worker.join(timeout=30)
+        assert worker.exitcode == 0
+    return outcomes
+
+
+def test_data_source_shared_between_processes(tmp_path):
+    """
+    Processes sharing a store should fetch once between them on a cold start
+    """
+    path = str(tmp_path / "store.i8")
+    df = make_full_df()
+    with CsvServer(make_csv(df)) as server:
+        outcomes = _run_workers(server.url, path, ttl=60, seconds=0.2, n_workers=6)
+    assert server.requests == 1
+    assert all(set(lengths) == {len(df)} for lengths, _ in outcomes)
+    assert len({version for _, version in outcomes}) == 1
+
+
+def test_data_source_shared_refresh(tmp_path):
+    """
+    Processes sharing a store should check the source once per ttl between them, and all pick up new
+    content from the one that fetched it
+    """
+    path = str(tmp_path / "store.i8")
+    df = make_full_df()
+    ttl, seconds = 0.5, 2.0
+    with CsvServer(make_csv(df.iloc[:-10])) as server:
+
+        def append_rows():
+            time.sleep(seconds / 2)
+            server.content = make_csv(df)
+
+        outcomes = _run_workers(server.url, path, ttl, seconds, during=append_rows)
+    # one fetch on start up then about one per ttl, rather than one per ttl per worker
+    assert server.requests <= seconds / ttl + 3
+    assert len({version for _, version in outcomes}) == 1
+    for lengths, _ in outcomes:
+        assert lengths[0] == len(df) - 10
+        assert lengths[-1] == len(df)
+
+
+def test_data_source_long_validators(tmp_path):
+    """
+    Validators too long for the store's header are left out of it rather than failing the refresh
+    """
+    path = str(tmp_path / "sheet.store")
+    with CsvServer(make_csv(make_full_df())) as server:
+        source = DataSource(server.url, store_path=path)
+        fetch = source._fetch
+
+        def long_etag_fetch():
+            response = fetch()
+            return response and (response[0], '"' + "e" * 600 + '"', response[2])
+
+        source._fetch = long_etag_fetch
+        df = source.get()
+        assert len(df) == 12
+    times, metadata = open_store(path)
+    assert len(times) == 12
+    assert metadata["version"] == source.version
+    assert metadata["etag"] is None
@@ -0,0 +1,113 @@
+import io
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from constructors import make_csv, make_full_df
+
+from trackerApp.statistical_params import (
+    LikelihoodModel,
+    cluster_events,
+    get_cluster_info,
+    get_intervals,
+)
+from trackerApp.streaming import read_chunks, run, stream_clusters
+
+MINUTE = 60 * 10**9
+
+
+def _write_history(path, n_events: int, seed: int = 0) -> np.ndarray:
+    """Write a csv of clustered events, returning their times"""
+    rng = np.random.default_rng(seed)
+    # mostly minutes apart, with a gap of days every so often
+    gaps = np.where(
+        rng.random(n_events) < 0.02,
+        rng.integers(1, 20, n_events) * 24 * 60,
+        rng.integers(1, 120, n_events),
+    )
+    times = 10**18 + np.cumsum(gaps) * MINUTE
+    times = pd.DatetimeIndex(times.view("datetime64[ns]")).floor("s")
+    path.write_bytes(make_csv(pd.DataFrame(index=times.tz_localize("UTC"))))
+    return times.asi8
+
+
+def test_streaming_matches_in_memory(tmp_path):
+    """
+    Streaming in small blocks should give the same clusters, intervals and likelihood as the in-memory
+    pipeline
+    """
+    path = tmp_path / "history.csv"
+    times = _write_history(path, 20_000)
+    clusters_out, intervals_out = io.StringIO(), io.StringIO()
+    summary = run(str(path), 1, 4096, clusters_out, intervals_out)
+
+    cluster_info = get_cluster_info(cluster_events(times, 1))
+    intervals = get_intervals(cluster_info)
+    streamed_info = pd.read_csv(
+        io.StringIO(clusters_out.getvalue()), index_col=0, parse_dates=["start", "end"]
+    )
+    np.testing.assert_array_equal(
+        streamed_info["start"].values, cluster_info["start"].values
+    )
+    np.testing.assert_array_equal(
+        streamed_info["number"].values, cluster_info["number"].values
+    )
+    streamed_intervals = pd.read_csv(io.StringIO(intervals_out.getvalue()), index_col=0)
+    pd.testing.assert_frame_equal(streamed_intervals, intervals, check_dtype=False)
+
+    assert summary.seizures == len(times)
+    assert summary.clusters == len(cluster_info)
+    model = LikelihoodModel(intervals)
+    for days in range(-1, 45):
+        assert summary.likelihood(days) == model.likelihood(days)
+
+
+def test_stream_clusters_boundaries():
+    """
+    A cluster split across blocks is carried over, however the blocks fall
+    """
+    df = make_full_df(num_clusters=5)
+    times = df.index.values.view("int64")
+    expected = cluster_events(times)
+    for size in (1, 2, 3, 7):
+        blocks = [times[i : i + size] for i in range(0, len(times), size)]
+        streamed = list(stream_clusters(blocks))
+        np.testing.assert_array_equal(
+            np.concatenate([clusters.starts for clusters in streamed]), expected.starts
+        )
+        np.testing.assert_array_equal(
+            np.concatenate([clusters.counts for clusters in streamed]), expected.counts
+        )
+
+
+def test_read_chunks(tmp_path):
+    path = tmp_path / "history.csv"
+    content = make_csv(make_full_df()) + b"oops\n"
+    path.write_bytes(content)
+    chunks = list(read_chunks(str(path), chunk_bytes=30))
+    assert len(chunks) > 1
+    assert sum(len(chunk.times) for chunk in chunks) == 12
+    assert [row for chunk in chunks for row in chunk.malformed] == [(13, "oops")]
+
+    # out of order rows are rejected whether or not they are read in the same block
+    path.write_bytes(content[20:40] + content[:20])
+    for chunk_bytes in (20, 1000):
+        with pytest.raises(ValueError):
+            list(read_chunks(str(path), chunk_bytes=chunk_bytes))
+
+
+def test_streaming_memory_is_flat(tmp_path):
+    """
+    Peak memory shouldn't grow with the length of the history
+    """
+    peaks = []
+    for n_events in (20_000, 200_000):
+        path = tmp_path / f"history_{n_events}.csv"
+        _write_history(path, n_events)
+        tracemalloc.start()
+        run(str(path), 1, 2**16)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    assert peaks[1] < 1.5 * peaks[0]
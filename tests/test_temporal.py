@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+from constructors import make_random_df
+
+from trackerApp.make_graphs import make_time_hist, make_weekday_hour_heatmap
+from trackerApp.temporal import TemporalPatterns
+
+
+def test_temporal_patterns():
+    df = make_random_df()
+    patterns = TemporalPatterns.from_df(df, tz="America/New_York", cut_off="2020-06-01")
+    local = df["2020-06-01":].index.tz_convert("America/New_York")
+    expected = (
+        pd.crosstab(local.dayofweek, local.hour)
+        .reindex(index=range(7), columns=range(24), fill_value=0)
+        .to_numpy()
+    )
+    np.testing.assert_array_equal(patterns.weekday_hour, expected)
+    np.testing.assert_array_equal(patterns.hours, np.bincount(local.hour, minlength=24))
+
+    # counting in chunks matches counting everything at once
+    chunked = TemporalPatterns(tz="America/New_York", cut_off="2020-06-01")
+    for chunk in np.array_split(df.index.asi8, 7):
+        chunked.add(chunk)
+    np.testing.assert_array_equal(chunked.counts, patterns.counts)
+
+
+def test_temporal_figures_are_binned():
+    df = make_random_df(5000)
+    assert len(make_time_hist(df).data[0].y) == 24
+    assert sum(make_time_hist(df).data[0].y) == len(df["2020-06-01":])
+    assert np.shape(make_weekday_hour_heatmap(df).data[0].z) == (7, 24)
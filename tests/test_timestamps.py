@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from trackerApp.timestamps import FORMATS, detect_format, parse_timestamps
+
+
+def _pandas_times(lines, **kwargs) -> np.ndarray:
+    return (
+        pd.to_datetime(pd.Series(lines), utc=True, **kwargs)
+        .sort_values()
+        .values.view("int64")
+    )
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_parse_timestamps_formats(fmt):
+    """
+    Every format should be detected and parse to the same times as pandas
+    """
+    rng = np.random.default_rng(0)
+    times = pd.to_datetime(rng.integers(0, 2 * 10**9, 200), unit="s", utc=True).floor(
+        "min" if ":%S" not in fmt else "s"
+    )
+    # make sure the sample isn't ambiguous between day and month first
+    times = times.append(pd.DatetimeIndex(["2021-01-13 10:00"], tz="UTC"))
+    lines = times.strftime(fmt)
+    parsed = parse_timestamps(("\n".join(lines) + "\n").encode())
+    assert parsed.format == fmt
+    assert parsed.malformed == []
+    np.testing.assert_array_equal(parsed.times, np.sort(times.values.view("int64")))
+
+
+def test_parse_timestamps_malformed():
+    """
+    Malformed rows should be reported by line number and left out, on both the fast and slow paths
+    """
+    content = b"2021-05-09 10:33:00\r\n2021-02-29 08:00:00\r\nSeizure time       \r\n2021-05-01 08:00:00\r\n"
+    parsed = parse_timestamps(content)
+    assert parsed.malformed == [(2, "2021-02-29 08:00:00"), (3, "Seizure time       ")]
+    np.testing.assert_array_equal(
+        parsed.times, _pandas_times(["2021-05-01 08:00:00", "2021-05-09 10:33:00"])
+    )
+
+    content = b"9/5/2021 10:33\n\n13/5/2021 08:00\nbad\n1/6/2021 9:00,extra\n"
+    parsed = parse_timestamps(content, first_line=11)
+    assert parsed.format == "%d/%m/%Y %H:%M"
+    assert parsed.malformed == [(14, "bad")]
+    np.testing.assert_array_equal(
+        parsed.times,
+        _pandas_times(["2021-05-09 10:33", "2021-05-13 08:00", "2021-06-01 09:00"]),
+    )
+
+    with pytest.raises(ValueError):
+        parse_timestamps(b"not\na\ntimestamp\n")
+    assert len(parse_timestamps(b"").times) == 0
+
+
+def test_parse_timestamps_inferred():
+    """
+    Timestamps without a known format, such as those with offsets, should be inferred by pandas
+    """
+    lines = ["2021-05-09T10:33:00+01:00", "2021-05-09T12:33:00Z"]
+    parsed = parse_timestamps(("\n".join(lines)).encode())
+    assert parsed.format is None
+    np.testing.assert_array_equal(parsed.times, _pandas_times(lines))
+
+
+def test_detect_format():
+    assert detect_format(["05/09/2021 10:33:00"]) == "%m/%d/%Y %H:%M:%S"
+    assert detect_format(["05/09/2021 10:33:00", "13/09/2021 10:33:00"]) == (
+        "%d/%m/%Y %H:%M:%S"
+    )
+    assert detect_format(["2021-05-09 10:33:00", "oops"]) == "%Y-%m-%d %H:%M:%S"
+    assert detect_format(["oops", "oops", "2021-05-09 10:33:00"]) is None
@@ -0,0 +1,273 @@
+"""
+A read-only JSON API of each subject's stats, served from the dashboard snapshots
+
+Each field is serialised once per snapshot with a hash of its json, so a request only joins the cached
+json of the fields it asks for, and a client revalidating with If-None-Match gets a 304 without any
+json being built. Routes, under /api/v1:
+
+- ``/subjects``, the subject ids
+- ``/subjects/<subject_id>``, every field of a subject, or those in ``?fields=a,b``
+- ``/subjects/<subject_id>/<field>``, a single field
+- ``/batch?subjects=a,b&fields=c,d``, fields of several subjects, by default all of those with a snapshot
+
+Nothing is computed for a request: a subject without a snapshot yet gets a 503 with a Retry-After
+while its first snapshot is built in the background.
+"""
+
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import flask
+import pandas as pd
+
+from trackerApp.snapshot import DashboardSnapshot
+
+API_PREFIX = "/api/v1"
+# seconds a client is asked to wait for a subject's first snapshot
+RETRY_AFTER_SECONDS = 5
+FIELDS = (
+    "version",
+    "days_since",
+    "likelihood",
+    "cluster_size",
+    "clusters",
+    "intervals",
+)
+
+
+def _iso(times: pd.Series) -> List[str]:
+    """Format times as ISO 8601 UTC strings"""
+    return list(
+        pd.DatetimeIndex(times).tz_convert("UTC").strftime("%Y-%m-%dT%H:%M:%SZ")
+    )
+
+
+def snapshot_fields(snapshot: DashboardSnapshot) -> Dict[str, Any]:
+    """
+    Get the values the API serves from a snapshot
+
+    Parameters
+    ----------
+    snapshot : DashboardSnapshot
+        A subject's current snapshot
+
+    Returns
+    -------
+    Dict[str, Any]
+        The json-able value of each field, keyed by field name
+    """
+    model = snapshot.likelihood_model
+    days_since = snapshot.days_since
+    next_day = model.next_change(days_since)
+    interval = snapshot.likelihood_interval
+    cluster_info = snapshot.cluster_info
+    intervals = snapshot.intervals
+    return {
+        "version": snapshot.version,
+        "days_since": int(days_since),
+        "likelihood": {
+            "percent": model.likelihood(days_since),
+            "interval": (
+                None
+                if interval is None
+                else {
+                    "lower": float(interval.lower),
+                    "upper": float(interval.upper),
+                    "confidence": float(interval.confidence),
+                }
+            ),
+            "next": (
+                None
+                if next_day is None
+                else {
+                    "in_days": int(next_day - days_since),
+                    "percent": model.likelihood(next_day),
+                }
+            ),
+        },
+        "cluster_size": {"message": snapshot.next_cluster_size},
+        "clusters": [
+            {"start": start, "end": end, "number": int(number)}
+            for start, end, number in zip(
+                _iso(cluster_info["start"]),
+                _iso(cluster_info["end"]),
+                cluster_info["number"],
+            )
+        ],
+        "intervals": [
+            {"start": start, "days": int(days), "prev_cluster_size": int(size)}
+            for start, days, size in zip(
+                _iso(cluster_info["start"].iloc[1:]),
+                intervals["interval_days"],
+                intervals["prev_cluster_size"],
+            )
+        ],
+    }
+
+
+class SerialisedFields(NamedTuple):
+    """The json of each field of one snapshot, with a hash of each to build ETags from"""
+
+    snapshot: DashboardSnapshot
+    json: Dict[str, str]
+    hashes: Dict[str, str]
+
+
+class ApiError(Exception):
+    """A request the API can't answer, with the status to respond with"""
+
+    def __init__(self, message: str, status: int):
+        super().__init__(message)
+        self.status = status
+
+
+def _split(values: Optional[str]) -> Optional[List[str]]:
+    """Split a comma separated query parameter, None if it isn't given"""
+    if values is None:
+        return None
+    return [value for value in values.split(",") if value]
+
+
+def make_api(
+    get_refresher: Callable[[str], Any], subject_ids: Callable[[], List[str]]
+) -> flask.Blueprint:
+    """
+    Make the API's routes
+
+    Parameters
+    ----------
+    get_refresher : Callable[[str], Any]
+        Gets a subject's refresher, whose snapshot attribute is served, without waiting for it to be
+        built. It gives None if the subject has no snapshot yet, and raises KeyError for an unknown
+        subject
+    subject_ids : Callable[[], List[str]]
+        Gets the ids of every subject
+
+    Returns
+    -------
+    flask.Blueprint
+        The routes, to register on the server
+    """
+    api = flask.Blueprint("api", __name__, url_prefix=API_PREFIX)
+    serialised: Dict[str, SerialisedFields] = {}
+    lock = threading.Lock()
+
+    def fields_of(subject_id: str) -> SerialisedFields:
+        """Get a subject's serialised fields, serialising them once per snapshot"""
+        try:
+            refresher = get_refresher(subject_id)
+        except KeyError:
+            raise ApiError(f"Unknown subject {subject_id}", 404)
+        snapshot = refresher.snapshot if refresher is not None else None
+        if snapshot is None:
+            raise ApiError(f"{subject_id} is still loading", 503)
+        with lock:
+            cached = serialised.get(subject_id)
+            if cached is not None and cached.snapshot is snapshot:
+                return cached
+        values = snapshot_fields(snapshot)
+        encoded = {
+            field: json.dumps(value, separators=(",", ":"))
+            for field, value in values.items()
+        }
+        cached = SerialisedFields(
+            snapshot,
+            encoded,
+            {
+                field: hashlib.sha256(text.encode()).hexdigest()[:16]
+                for field, text in encoded.items()
+            },
+        )
+        with lock:
+            serialised[subject_id] = cached
+        return cached
+
+    def check_fields(fields: Optional[List[str]]) -> List[str]:
+        if not fields:
+            return list(FIELDS)
+        unknown = [field for field in fields if field not in FIELDS]
+        if unknown:
+            raise ApiError(f"Unknown fields {', '.join(unknown)}", 400)
+        return fields
+
+    def respond(parts: List[str], make_body: Callable[[], str]) -> flask.Response:
+        """
+        Respond with a strong ETag built from the hashes of the parts of the body
+
+        The body is only built when the client doesn't already have it.
+        """
+        etag = hashlib.sha256("|".join(parts).encode()).hexdigest()[:32]
+        if etag in flask.request.if_none_match:
+            response = flask.Response(status=304)
+        else:
+            response = flask.Response(make_body(), mimetype="application/json")
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    def object_of(subject: SerialisedFields, fields: List[str]) -> str:
+        return (
+            "{" + ",".join(f'"{field}":{subject.json[field]}' for field in fields) + "}"
+        )
+
+    @api.errorhandler(ApiError)
+    def api_error(err: ApiError):
+        response = flask.jsonify(error=str(err))
+        response.status_code = err.status
+        if err.status == 503:
+            response.headers["Retry-After"] = str(RETRY_AFTER_SECONDS)
+        return response
+
+    @api.route("/subjects")
+    def subjects():
+        ids = subject_ids()
+        return respond(ids, lambda: json.dumps({"subjects": ids}))
+
+    @api.route("/subjects/<subject_id>")
+    def subject(subject_id: str):
+        fields = check_fields(_split(flask.request.args.get("fields")))
+        cached = fields_of(subject_id)
+        return respond(
+            [f"{field}:{cached.hashes[field]}" for field in fields],
+            lambda: object_of(cached, fields),
+        )
+
+    @api.route("/subjects/<subject_id>/<field>")
+    def subject_field(subject_id: str, field: str):
+        check_fields([field])
+        cached = fields_of(subject_id)
+        return respond([cached.hashes[field]], lambda: cached.json[field])
+
+    @api.route("/batch")
+    def batch():
+        ids = _split(flask.request.args.get("subjects"))
+        fields = check_fields(_split(flask.request.args.get("fields")))
+        if ids:
+            subjects = {subject_id: fields_of(subject_id) for subject_id in ids}
+        else:
+            # only the subjects which are ready, rather than waiting for the rest
+            subjects = {}
+            for subject_id in subject_ids():
+                try:
+                    subjects[subject_id] = fields_of(subject_id)
+                except ApiError as err:
+                    if err.status != 503:
+                        raise
+        parts = [
+            f"{subject_id}.{field}:{cached.hashes[field]}"
+            for subject_id, cached in subjects.items()
+            for field in fields
+        ]
+        return respond(
+            parts,
+            lambda: "{"
+            + ",".join(
+                f"{json.dumps(subject_id)}:{object_of(cached, fields)}"
+                for subject_id, cached in subjects.items()
+            )
+            + "}",
+        )
+
+    return api
@@ -0,0 +1,269 @@
+"""
+Statistics for many subjects at once
+
+Every subject's sorted seizure times are concatenated into one array, with offsets marking where each
+subject starts, so subject s has times[offsets[s]:offsets[s + 1]]. Per-cluster and per-interval results
+use the same layout. Each function is a fixed number of numpy passes however many subjects there are.
+"""
+
+from typing import NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from trackerApp.constants import NS_IN_DAY
+from trackerApp.statistical_params import Clusters, cluster_events
+
+
+class BatchedIntervals(NamedTuple):
+    """The days between consecutive clusters of each subject, and the size of the earlier cluster"""
+
+    interval_days: np.ndarray
+    prev_cluster_size: np.ndarray
+    offsets: np.ndarray
+
+
+def concat_subjects(times: Sequence[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Concatenate each subject's seizure times
+
+    Parameters
+    ----------
+    times : Sequence[np.ndarray]
+        Sorted epoch nanoseconds for each subject
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        The concatenated times and the offset of each subject
+    """
+    offsets = np.zeros(len(times) + 1, dtype="int64")
+    np.cumsum([len(subject) for subject in times], out=offsets[1:])
+    if len(times) == 0:
+        return np.empty(0, dtype="int64"), offsets
+    return np.concatenate(times).astype("int64", copy=False), offsets
+
+
+def _segment_ids(offsets: np.ndarray) -> np.ndarray:
+    """The index of the segment each element belongs to"""
+    return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+
+def batched_most_recent_seizure(
+    times: np.ndarray, offsets: np.ndarray, now: Optional[int] = None
+) -> np.ndarray:
+    """
+    Find the number of days since each subject's last seizure
+
+    Parameters
+    ----------
+    times : np.ndarray
+        Concatenated epoch nanoseconds of every subject's seizures
+    offsets : np.ndarray
+        The offset of each subject in times
+    now : Optional[int], optional
+        The current time as epoch nanoseconds, by default the current time
+
+    Returns
+    -------
+    np.ndarray
+        Days since the last seizure, 0 for future seizures and -1 for subjects with no seizures
+    """
+    if now is None:
+        now = pd.Timestamp.now(tz="UTC").value
+    counts = np.diff(offsets)
+    last = (
+        times[np.maximum(offsets[1:] - 1, 0)] if len(times) else np.zeros(len(counts))
+    )
+    days = np.maximum((now - last) // NS_IN_DAY, 0)
+    return np.where(counts > 0, days, -1).astype("int64")
+
+
+def batched_cluster_events(
+    times: np.ndarray, offsets: np.ndarray, gap_days: float = 3
+) -> Tuple[Clusters, np.ndarray]:
+    """
+    Group every subject's seizures into clusters in a single pass
+
+    Parameters
+    ----------
+    times : np.ndarray
+        Concatenated epoch nanoseconds of every subject's seizures
+    offsets : np.ndarray
+        The offset of each subject in times
+    gap_days : float, optional
+        The number of days after a seizure that a cluster is considered over, by default 3
+
+    Returns
+    -------
+    Tuple[Clusters, np.ndarray]
+        The clusters of all subjects, numbered consecutively, and the offset of each subject's clusters
+    """
+    clusters = cluster_events(times, gap_days)
+    if len(times) == 0:
+        return clusters, np.zeros(len(offsets), dtype="int64")
+
+    # a subject's first seizure always starts a new cluster
+    subject_starts = offsets[:-1][np.diff(offsets) > 0]
+    new_cluster = np.zeros(len(times), dtype=bool)
+    new_cluster[np.flatnonzero(np.diff(clusters.labels)) + 1] = True
+    new_cluster[subject_starts] = True
+
+    labels = np.cumsum(new_cluster, dtype="int64") - 1
+    first = np.flatnonzero(new_cluster)
+    last = np.append(first[1:], len(times)) - 1
+    clusters = Clusters(labels, times[first], times[last], last - first + 1)
+    return clusters, np.searchsorted(first, offsets).astype("int64")
+
+
+def batched_get_intervals(
+    clusters: Clusters, cluster_offsets: np.ndarray
+) -> BatchedIntervals:
+    """
+    Find the time between consecutive clusters of each subject
+
+    Parameters
+    ----------
+    clusters : Clusters
+        Clusters from batched_cluster_events
+    cluster_offsets : np.ndarray
+        The offset of each subject's clusters
+
+    Returns
+    -------
+    BatchedIntervals
+        The interval in whole days and the size of the previous cluster, with the offset of each subject
+    """
+    # the first cluster of each subject has no interval
+    keep = np.ones(len(clusters.counts), dtype=bool)
+    keep[cluster_offsets[:-1][np.diff(cluster_offsets) > 0]] = False
+    after = np.flatnonzero(keep)
+
+    interval_days = (clusters.starts[after] - clusters.ends[after - 1]) // NS_IN_DAY
+    prev_cluster_size = clusters.counts[after - 1]
+    offsets = np.zeros(len(cluster_offsets), dtype="int64")
+    np.cumsum(np.maximum(np.diff(cluster_offsets) - 1, 0), out=offsets[1:])
+    return BatchedIntervals(
+        interval_days.astype("int64"), prev_cluster_size.astype("int64"), offsets
+    )
+
+
+def _segment_sorted(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Sort values within each segment"""
+    segments = _segment_ids(offsets)
+    return values[np.lexsort((values, segments))]
+
+
+def batched_likelihood_of_seizure(
+    days_since: np.ndarray, intervals: BatchedIntervals, num_sd: int = 2
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Find each subject's likelihood of a seizure and when this will next change
+
+    This matches likelihood_of_seizure, including removing outliers, but gives the likelihood as a number.
+
+    Parameters
+    ----------
+    days_since : np.ndarray
+        Number of days since each subject's last seizure
+    intervals : BatchedIntervals
+        Intervals from batched_get_intervals
+    num_sd : int, optional
+        The number of standard deviations from the median to keep, by default 2
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray, np.ndarray]
+        Likelihood of seizure as a %, how many days till it will update, and what it will update to.
+        Values which can't be found are nan.
+    """
+    offsets = intervals.offsets
+    n_subjects = len(offsets) - 1
+    counts = np.diff(offsets)
+    values = _segment_sorted(intervals.interval_days, offsets).astype("float64")
+    segments = _segment_ids(offsets)
+
+    # outlier bounds from the median and population standard deviation of each subject
+    with np.errstate(invalid="ignore", divide="ignore"):
+        lower_middle = offsets[:-1] + np.maximum(counts - 1, 0) // 2
+        upper_middle = offsets[:-1] + counts // 2
+        if len(values):
+            median = (
+                values[np.minimum(lower_middle, len(values) - 1)]
+                + values[np.minimum(upper_middle, len(values) - 1)]
+            ) / 2
+        else:
+            median = np.full(n_subjects, np.nan)
+        mean = np.bincount(segments, weights=values, minlength=n_subjects) / counts
+        squares = (values - mean[segments]) ** 2
+        sd = np.sqrt(
+            np.bincount(segments, weights=squares, minlength=n_subjects) / counts
+        )
+    lower_bound = np.maximum(median - num_sd * sd, 0)
+    upper_bound = median + num_sd * sd
+    kept = (values >= lower_bound[segments]) & (values <= upper_bound[segments])
+    n_kept = np.bincount(segments[kept], minlength=n_subjects)
+
+    days = np.asarray(days_since, dtype="float64")
+    below = kept & (values <= days[segments])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        likelihood = np.floor(
+            np.bincount(segments[below], minlength=n_subjects) / n_kept * 100
+        )
+
+    # the first kept interval above days_since is when the likelihood next changes
+    above = np.flatnonzero(kept & (values > days[segments]))
+    has_next, first_above = np.unique(segments[above], return_index=True)
+    next_interval = np.full(n_subjects, np.nan)
+    next_interval[has_next] = values[above[first_above]]
+    next_updates = next_interval - days
+
+    below_next = kept & (values <= next_interval[segments])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        next_likelihood = np.floor(
+            np.bincount(segments[below_next], minlength=n_subjects) / n_kept * 100
+        )
+    next_likelihood[np.isnan(next_interval)] = np.nan
+    return likelihood, next_updates, next_likelihood
+
+
+def batched_stats(
+    times: np.ndarray,
+    offsets: np.ndarray,
+    gap_days: float = 3,
+    now: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Find the dashboard statistics for every subject
+
+    Parameters
+    ----------
+    times : np.ndarray
+        Concatenated epoch nanoseconds of every subject's seizures
+    offsets : np.ndarray
+        The offset of each subject in times
+    gap_days : float, optional
+        The number of days after a seizure that a cluster is considered over, by default 3
+    now : Optional[int], optional
+        The current time as epoch nanoseconds, by default the current time
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per subject with the days since a seizure, number of clusters and likelihoods
+    """
+    days_since = batched_most_recent_seizure(times, offsets, now)
+    clusters, cluster_offsets = batched_cluster_events(times, offsets, gap_days)
+    intervals = batched_get_intervals(clusters, cluster_offsets)
+    likelihood, next_updates, next_likelihood = batched_likelihood_of_seizure(
+        days_since, intervals
+    )
+    return pd.DataFrame(
+        {
+            "days_since": days_since,
+            "clusters": np.diff(cluster_offsets),
+            "likelihood": likelihood,
+            "next_updates": next_updates,
+            "next_likelihood": next_likelihood,
+        }
+    )
@@ -0,0 +1,204 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from trackerApp.statistical_params import LikelihoodModel
+
+
+class LikelihoodInterval(NamedTuple):
+    """A likelihood of a seizure, as a percentage, with a bootstrap confidence interval"""
+
+    likelihood: int
+    lower: float
+    upper: float
+    confidence: float
+
+
+# resamples per chunk, bounding the memory of each resample matrix
+CHUNK_SIZE = 2000
+
+
+def _bootstrap_chunk(
+    interval_days: np.ndarray,
+    days_since: float,
+    n_boot: int,
+    num_sd: int,
+    seed: np.random.SeedSequence,
+) -> np.ndarray:
+    """
+    Resample the intervals n_boot times and find the likelihood for each resample
+
+    Each row of the resample matrix has its outliers removed as in LikelihoodModel.
+    """
+    rng = np.random.default_rng(seed)
+    n_intervals = len(interval_days)
+    samples = interval_days[rng.integers(0, n_intervals, size=(n_boot, n_intervals))]
+
+    median = np.median(samples, axis=1, keepdims=True)
+    sd = np.std(samples, axis=1, keepdims=True)
+    lower_bound = np.maximum(median - num_sd * sd, 0)
+    upper_bound = median + num_sd * sd
+    kept = (samples >= lower_bound) & (samples <= upper_bound)
+
+    below = np.count_nonzero(kept & (samples <= days_since), axis=1)
+    return (below / np.count_nonzero(kept, axis=1) * 100).astype("int64")
+
+
+def bootstrap_likelihood(
+    interval_days: np.ndarray,
+    days_since: float,
+    n_boot: int = 1000,
+    confidence: float = 0.95,
+    num_sd: int = 2,
+    seed: int = 0,
+    workers: Optional[int] = None,
+) -> LikelihoodInterval:
+    """
+    Find the likelihood of a seizure with a bootstrap confidence interval
+
+    Parameters
+    ----------
+    interval_days : np.ndarray
+        The days between clusters, before removing outliers
+    days_since : float
+        Number of days since a seizure
+    n_boot : int, optional
+        The number of resamples, by default 1000
+    confidence : float, optional
+        The width of the confidence interval, by default 0.95
+    num_sd : int, optional
+        The number of standard deviations from the median to keep, by default 2
+    seed : int, optional
+        Seed for the resampling, by default 0
+    workers : Optional[int], optional
+        Split the resamples between this many processes, by default all in this process
+
+    Returns
+    -------
+    LikelihoodInterval
+        The likelihood from all the intervals, and the bounds of the confidence interval
+    """
+    interval_days = np.asarray(interval_days, dtype="int64")
+    likelihood = LikelihoodModel(interval_days, num_sd).likelihood(days_since)
+    if len(interval_days) == 0:
+        return LikelihoodInterval(likelihood, np.nan, np.nan, confidence)
+
+    chunks = [CHUNK_SIZE] * (n_boot // CHUNK_SIZE)
+    if n_boot % CHUNK_SIZE:
+        chunks.append(n_boot % CHUNK_SIZE)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    args = (
+        [interval_days] * len(chunks),
+        [days_since] * len(chunks),
+        chunks,
+        [num_sd] * len(chunks),
+        seeds,
+    )
+    if workers is not None and len(chunks) > 1:
+        with ProcessPoolExecutor(workers) as executor:
+            likelihoods = list(executor.map(_bootstrap_chunk, *args))
+    else:
+        likelihoods = list(map(_bootstrap_chunk, *args))
+
+    alpha = (1 - confidence) / 2 * 100
+    lower, upper = np.percentile(np.concatenate(likelihoods), [alpha, 100 - alpha])
+    return LikelihoodInterval(likelihood, float(lower), float(upper), confidence)
+
+
+def _bootstrap_subject(args) -> LikelihoodInterval:
+    return bootstrap_likelihood(*args)
+
+
+def bootstrap_subjects(
+    interval_days: Sequence[np.ndarray],
+    days_since: Sequence[float],
+    n_boot: int = 1000,
+    confidence: float = 0.95,
+    seed: int = 0,
+    workers: Optional[int] = None,
+) -> List[LikelihoodInterval]:
+    """
+    Find the likelihood of a seizure with a bootstrap confidence interval for many subjects
+
+    Parameters
+    ----------
+    interval_days : Sequence[np.ndarray]
+        The days between clusters of each subject
+    days_since : Sequence[float]
+        Number of days since each subject's last seizure
+    n_boot : int, optional
+        The number of resamples, by default 1000
+    confidence : float, optional
+        The width of the confidence interval, by default 0.95
+    seed : int, optional
+        Seed for the resampling, by default 0
+    workers : Optional[int], optional
+        Split the subjects between this many processes, by default all in this process
+
+    Returns
+    -------
+    List[LikelihoodInterval]
+        The likelihood and confidence interval of each subject
+    """
+    args = [
+        (subject_intervals, subject_days, n_boot, confidence, 2, seed)
+        for subject_intervals, subject_days in zip(interval_days, days_since)
+    ]
+    if workers is None:
+        return [_bootstrap_subject(subject_args) for subject_args in args]
+    with ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(_bootstrap_subject, args))
+
+
+_cache: "OrderedDict[tuple, LikelihoodInterval]" = OrderedDict()
+_cache_lock = threading.Lock()
+CACHE_SIZE = 64
+
+
+def cached_bootstrap_likelihood(
+    version: str,
+    interval_days: np.ndarray,
+    days_since: float,
+    n_boot: int = 1000,
+    confidence: float = 0.95,
+    workers: Optional[int] = None,
+) -> LikelihoodInterval:
+    """
+    bootstrap_likelihood, reusing the result for the same version of the data
+
+    Parameters
+    ----------
+    version : str
+        The version of the data the intervals are from
+    interval_days : np.ndarray
+        The days between clusters, before removing outliers
+    days_since : float
+        Number of days since a seizure
+    n_boot : int, optional
+        The number of resamples, by default 1000
+    confidence : float, optional
+        The width of the confidence interval, by default 0.95
+    workers : Optional[int], optional
+        Split the resamples between this many processes, by default all in this process
+
+    Returns
+    -------
+    LikelihoodInterval
+        The likelihood and its confidence interval
+    """
+    key = (version, days_since, n_boot, confidence)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    result = bootstrap_likelihood(
+        interval_days, days_since, n_boot, confidence, workers=workers
+    )
+    with _cache_lock:
+        _cache[key] = result
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
@@ -1 +1,40 @@
-SEIZURE_SHEET = 'https://docs.google.com/spreadsheets/d/e/2PACX-1vT1E1Y9IohHUf_WI6bOaJ162ZnRIv39tJbVF8C7Ow0-wqN-DDxslgTfhsUwvQUqoXn-grW89r_BRIyw/pub?gid=0&single=true&output=csv'
\ No newline at end of file
+import json
+import os
+import tempfile
+
+SEIZURE_SHEET = 'https://docs.google.com/spreadsheets/d/e/2PACX-1vT1E1Y9IohHUf_WI6bOaJ162ZnRIv39tJbVF8C7Ow0-wqN-DDxslgTfhsUwvQUqoXn-grW89r_BRIyw/pub?gid=0&single=true&output=csv'
+NS_IN_DAY = 86_400_000_000_000
+DATA_TTL_SECONDS = 300
+FIGURE_CACHE_SIZE = 32
+# zoomed clusters over time figures are kept apart, so zooming doesn't evict the snapshots' figures
+ZOOM_CACHE_SIZE = 8
+STORE_DIR = os.environ.get(
+    "SEIZURE_STORE_DIR", os.path.join(tempfile.gettempdir(), "seizure_tracker")
+)
+# subject id to seizure sheet, or a list of sheets to merge, e.g. SEIZURE_SUBJECTS='{"bono": "https://..."}'
+SUBJECTS = json.loads(os.environ.get("SEIZURE_SUBJECTS", "{}")) or {
+    "bono": SEIZURE_SHEET
+}
+# events in different sheets of one subject this close together are the same seizure
+MERGE_TOLERANCE_SECONDS = float(os.environ.get("SEIZURE_MERGE_TOLERANCE_SECONDS", 300))
+# threads fetching the sheets of merged subjects at once
+FETCH_WORKERS = int(os.environ.get("SEIZURE_FETCH_WORKERS", 8))
+# resamples for the likelihood confidence interval, 0 to not show one
+BOOTSTRAP_SAMPLES = int(os.environ.get("SEIZURE_BOOTSTRAP_SAMPLES", 0))
+DISPLAY_TZ = os.environ.get("SEIZURE_DISPLAY_TZ", "Europe/London")
+# the most bars the clusters over time figure draws before grouping clusters into time buckets
+TIMESERIES_MAX_BARS = int(os.environ.get("SEIZURE_TIMESERIES_MAX_BARS", 500))
+# the gap_days values the dashboard's slider can pick from
+GAP_DAYS_OPTIONS = [step / 2 for step in range(1, 29)]
+# seizures before this UTC date aren't included in the time of day figures
+TEMPORAL_CUT_OFF = os.environ.get("SEIZURE_TEMPORAL_CUT_OFF", "2020-06-01")
+# profile callbacks and refreshes slower than PROFILE_THRESHOLD_MS, writing the profiles to PROFILE_DIR
+PROFILE = os.environ.get("SEIZURE_PROFILE", "0") == "1"
+PROFILE_THRESHOLD_MS = float(os.environ.get("SEIZURE_PROFILE_THRESHOLD_MS", 500))
+# the fraction of calls to profile
+PROFILE_SAMPLE_RATE = float(os.environ.get("SEIZURE_PROFILE_SAMPLE_RATE", 1))
+# also record the peak memory with tracemalloc, which slows the profiled calls further
+PROFILE_MEMORY = os.environ.get("SEIZURE_PROFILE_MEMORY", "0") == "1"
+PROFILE_DIR = os.environ.get("SEIZURE_PROFILE_DIR", os.path.join("logs", "profiles"))
+# the number of profiles kept, older ones are deleted
+PROFILE_KEEP = int(os.environ.get("SEIZURE_PROFILE_KEEP", 50))
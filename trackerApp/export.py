@@ -0,0 +1,304 @@
+"""
+Export the dashboard as a static site, for serving without python in the request path
+
+Each subject gets a page with its stats pre-rendered and every figure as plotly json, with gzip and,
+if the brotli package is installed, brotli copies for static servers which serve precompressed files
+(e.g. nginx's gzip_static and brotli_static). plotly.js is copied into the site, so it needs nothing
+else. A manifest records the data version and day of each subject's export, so a subject is only
+written again when its data, or the day, changes. Files are replaced atomically, the manifest last.
+
+Run ``python -m trackerApp.export site`` to export every subject once, or with ``--watch 300`` to keep
+exporting as the data changes.
+"""
+
+import argparse
+import datetime as dt
+import gzip
+import html
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Sequence
+
+import plotly
+
+from trackerApp.api import snapshot_fields
+from trackerApp.snapshot import FIGURE_LABELS, DashboardSnapshot, SnapshotRefresher
+from trackerApp.subjects import get_subject_source, subject_ids
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+PLOTLY_JS = os.path.join(
+    os.path.dirname(plotly.__file__), "package_data", "plotly.min.js"
+)
+
+_PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>Seizure Tracker</title>
+<script src="../plotly.min.js"></script>
+<style>body {{ font-family: sans-serif; }} .stats {{ text-align: center; }}</style>
+</head>
+<body>
+<h1 class="stats">Seizure Tracker</h1>
+<div class="stats">
+<p>{days_since}</p>
+<p>{likelihood}</p>
+<p>{cluster_size}</p>
+</div>
+<div>{options}</div>
+<div id="figure"></div>
+<p class="stats"><small>Updated {generated}</small></p>
+<script>
+function show(figType) {{
+  fetch("figures/" + figType + ".json")
+    .then(function (response) {{ return response.json(); }})
+    .then(function (fig) {{
+      Plotly.react("figure", fig.data, fig.layout, {{ responsive: true }});
+    }});
+}}
+document.querySelectorAll("input[name=fig-type]").forEach(function (input) {{
+  input.addEventListener("change", function () {{ show(input.value); }});
+}});
+show("{first}");
+</script>
+</body>
+</html>
+"""
+
+
+def _markdown(text: str) -> str:
+    """Render the bold text of the dashboard's markdown messages as html"""
+    return re.sub(r"\*\*(.+?)\*\*", r"<strong>\1</strong>", html.escape(text))
+
+
+def _write(path: str, content: bytes, compress: bool = False):
+    """Replace a file atomically, alongside its gzip and brotli copies if compress"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    files = {path: content}
+    if compress:
+        # a fixed mtime, so unchanged content compresses to unchanged files
+        files[path + ".gz"] = gzip.compress(content, compresslevel=9, mtime=0)
+        if brotli is not None:
+            files[path + ".br"] = brotli.compress(content)
+    for name, data in files.items():
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, name)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+def _days_since_message(snapshot: DashboardSnapshot) -> str:
+    return f"The last seizure was **{snapshot.days_since}** days ago"
+
+
+def _json(value) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+def render_page(snapshot: DashboardSnapshot) -> str:
+    """
+    Render a subject's page, with the stats in place and the figures fetched from its figures folder
+
+    Parameters
+    ----------
+    snapshot : DashboardSnapshot
+        The subject's snapshot
+
+    Returns
+    -------
+    str
+        The page's html
+    """
+    fig_types = [fig_type for fig_type in FIGURE_LABELS if fig_type in snapshot.figures]
+    options = "".join(
+        f'<label><input type="radio" name="fig-type" value="{fig_type}"'
+        f'{" checked" if i == 0 else ""}> {html.escape(FIGURE_LABELS[fig_type])}</label> '
+        for i, fig_type in enumerate(fig_types)
+    )
+    return _PAGE.format(
+        days_since=_markdown(_days_since_message(snapshot)),
+        likelihood=_markdown(snapshot.likelihood_message),
+        cluster_size=_markdown(snapshot.next_cluster_size),
+        options=options,
+        generated=time.strftime("%Y-%m-%d %H:%M %Z", time.localtime(snapshot.created)),
+        first=fig_types[0],
+    )
+
+
+def export_subject(out_dir: str, subject_id: str, snapshot: DashboardSnapshot):
+    """
+    Write a subject's page, stats and figures
+
+    Parameters
+    ----------
+    out_dir : str
+        The site's folder
+    subject_id : str
+        The subject's id, the folder their files are written to
+    snapshot : DashboardSnapshot
+        The subject's snapshot
+    """
+    subject_dir = os.path.join(out_dir, subject_id)
+    for fig_type, fig in snapshot.figures.items():
+        _write(
+            os.path.join(subject_dir, "figures", f"{fig_type}.json"), _json(fig), True
+        )
+    stats = dict(
+        snapshot_fields(snapshot),
+        messages={
+            "days_since": _days_since_message(snapshot),
+            "likelihood": snapshot.likelihood_message,
+            "cluster_size": snapshot.next_cluster_size,
+        },
+    )
+    _write(os.path.join(subject_dir, "stats.json"), _json(stats), True)
+    _write(
+        os.path.join(subject_dir, "index.html"),
+        render_page(snapshot).encode(),
+        True,
+    )
+
+
+def read_manifest(out_dir: str) -> Dict[str, dict]:
+    """
+    Read what was last exported for each subject
+
+    Parameters
+    ----------
+    out_dir : str
+        The site's folder
+
+    Returns
+    -------
+    Dict[str, dict]
+        The version and day of each subject's export, empty if nothing was exported
+    """
+    try:
+        with open(os.path.join(out_dir, MANIFEST)) as f:
+            return json.load(f)["subjects"]
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def export_site(
+    out_dir: str,
+    ids: Optional[Sequence[str]] = None,
+    refreshers: Optional[Dict[str, SnapshotRefresher]] = None,
+    force: bool = False,
+) -> List[str]:
+    """
+    Export the subjects whose data or day has changed since the last export
+
+    Parameters
+    ----------
+    out_dir : str
+        The site's folder
+    ids : Optional[Sequence[str]], optional
+        The subjects to export, by default every registered subject
+    refreshers : Optional[Dict[str, SnapshotRefresher]], optional
+        Refreshers to reuse between exports, keyed by subject, missing subjects are added to it
+    force : bool, optional
+        Export every subject even if unchanged, by default False
+
+    Returns
+    -------
+    List[str]
+        The subjects which were exported
+    """
+    ids = list(ids if ids is not None else subject_ids())
+    refreshers = refreshers if refreshers is not None else {}
+    manifest = read_manifest(out_dir)
+    today = dt.date.today().isoformat()
+    exported = []
+    for subject_id in ids:
+        if subject_id not in refreshers:
+            refreshers[subject_id] = SnapshotRefresher(
+                get_subject_source(subject_id), subject_id=subject_id
+            )
+        refresher = refreshers[subject_id]
+        # checking the data first, so nothing is built for an unchanged subject
+        refresher.source.get()
+        entry = {"version": refresher.source.version, "date": today}
+        if not force and manifest.get(subject_id) == entry:
+            continue
+        snapshot = refresher.refresh()
+        export_subject(out_dir, subject_id, snapshot)
+        manifest[subject_id] = entry
+        exported.append(subject_id)
+
+    if not os.path.exists(os.path.join(out_dir, "plotly.min.js")):
+        with open(PLOTLY_JS, "rb") as f:
+            _write(os.path.join(out_dir, "plotly.min.js"), f.read(), True)
+    if exported or not os.path.exists(os.path.join(out_dir, "index.html")):
+        links = "".join(
+            f'<li><a href="{html.escape(subject_id)}/">{html.escape(subject_id)}</a></li>'
+            for subject_id in manifest
+        )
+        _write(
+            os.path.join(out_dir, "index.html"),
+            f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>Seizure Tracker</title>"
+            f"</head><body><h1>Seizure Tracker</h1><ul>{links}</ul></body></html>".encode(),
+        )
+        _write(
+            os.path.join(out_dir, MANIFEST),
+            json.dumps({"generated": time.time(), "subjects": manifest}).encode(),
+        )
+    if exported:
+        logger.info(f"Exported {', '.join(exported)} to {out_dir}")
+    return exported
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Export the dashboard as a static site"
+    )
+    parser.add_argument("out_dir", help="the folder to write the site to")
+    parser.add_argument(
+        "--subject", action="append", help="a subject to export, by default all"
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="export subjects even if unchanged"
+    )
+    parser.add_argument(
+        "--watch",
+        type=float,
+        metavar="SECONDS",
+        help="keep checking for new data, exporting when it changes",
+    )
+    args = parser.parse_args(argv)
+
+    refreshers: Dict[str, SnapshotRefresher] = {}
+    exported = export_site(args.out_dir, args.subject, refreshers, args.force)
+    print(f"Exported {exported or 'nothing, the data is unchanged'}")
+    while args.watch:
+        time.sleep(args.watch)
+        try:
+            exported = export_site(args.out_dir, args.subject, refreshers)
+        except Exception:
+            logger.exception("Export failed, trying again later")
+            continue
+        if exported:
+            print(f"Exported {exported}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Tuple
+
+import plotly.graph_objects as go
+
+from trackerApp.constants import FIGURE_CACHE_SIZE
+from trackerApp.metrics import timed
+
+
+@timed("figure_to_json")
+def figure_to_json(fig: go.Figure) -> dict:
+    """
+    Serialize a figure to plain json types, ready to be returned from a callback
+
+    Parameters
+    ----------
+    fig : go.Figure
+        A plotly figure
+
+    Returns
+    -------
+    dict
+        The figure as json
+    """
+    return json.loads(fig.to_json())
+
+
+class FigureCache:
+    """
+    Least recently used cache of figure json keyed by data version, figure type and parameters
+
+    hits, misses and evictions count lookups for monitoring.
+    """
+
+    def __init__(self, max_size: int = FIGURE_CACHE_SIZE):
+        """
+        Parameters
+        ----------
+        max_size : int, optional
+            The most figures to keep, by default FIGURE_CACHE_SIZE
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._figures: "OrderedDict[Tuple, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._figures)
+
+    def get(
+        self,
+        version: str,
+        fig_type: str,
+        build: Callable[[], go.Figure],
+        **params: Hashable,
+    ) -> dict:
+        """
+        Get a figure from the cache, building and storing it if it is missing
+
+        Parameters
+        ----------
+        version : str
+            The version of the data the figure is made from
+        fig_type : str
+            The type of figure, e.g. bars_timeseries
+        build : Callable[[], go.Figure]
+            Makes the figure on a miss
+        **params : Hashable
+            Any other values the figure depends on
+
+        Returns
+        -------
+        dict
+            The figure as json
+        """
+        key = (version, fig_type, tuple(sorted(params.items())))
+        with self._lock:
+            if key in self._figures:
+                self.hits += 1
+                self._figures.move_to_end(key)
+                return self._figures[key]
+            self.misses += 1
+
+        figure = figure_to_json(build())
+        with self._lock:
+            self._figures[key] = figure
+            self._figures.move_to_end(key)
+            while len(self._figures) > self.max_size:
+                self._figures.popitem(last=False)
+                self.evictions += 1
+        return figure
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the cache counters
+
+        Returns
+        -------
+        Dict[str, int]
+            The number of hits, misses and evictions, and the current size
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._figures),
+            }
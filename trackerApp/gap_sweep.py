@@ -0,0 +1,146 @@
+"""
+Cluster statistics for many values of gap_days at once
+
+Clusters split wherever the gap between seizures is more than gap_days, and the interval between two
+clusters is the gap that split them. So with the gaps sorted, the intervals for any gap_days are the
+gaps above it, a suffix of the sorted gaps, and every statistic is a searchsorted into that suffix.
+"""
+
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+from trackerApp.constants import NS_IN_DAY
+
+
+class GapSweep:
+    """
+    The clusters and intervals between them for each of a range of gap_days values
+
+    Build once per version of the data, each gap_days value then costs a few searchsorted calls rather
+    than re-clustering. The likelihoods match LikelihoodModel on the intervals from get_intervals.
+    """
+
+    def __init__(self, times: np.ndarray, gap_days: Sequence[float], num_sd: int = 2):
+        """
+        Parameters
+        ----------
+        times : np.ndarray
+            Sorted epoch nanoseconds of each seizure
+        gap_days : Sequence[float]
+            The gap_days values to find statistics for
+        num_sd : int, optional
+            The number of standard deviations from the median to keep, by default 2
+        """
+        times = np.asarray(times, dtype="int64")
+        gaps = np.sort(np.diff(times))
+        self.n_seizures = len(times)
+        self.gap_days = np.asarray(gap_days, dtype="float64")
+        # the intervals for the i'th gap_days are interval_days[first[i]:]
+        self.interval_days = gaps // NS_IN_DAY
+        gap_ns = np.round(self.gap_days * NS_IN_DAY).astype("int64")
+        self.first = np.searchsorted(gaps, gap_ns, "right")
+        n_intervals = len(gaps) - self.first
+        self.clusters = np.where(self.n_seizures > 0, n_intervals + 1, 0)
+
+        # outlier bounds from the median and population standard deviation of each suffix
+        values = self.interval_days.astype("float64")
+        sums = np.concatenate([[0], np.cumsum(values)])
+        squares = np.concatenate([[0], np.cumsum(values**2)])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = (sums[-1] - sums[self.first]) / n_intervals
+            variance = (squares[-1] - squares[self.first]) / n_intervals - mean**2
+            sd = np.sqrt(np.maximum(variance, 0))
+        lower_middle = np.minimum(self.first + (n_intervals - 1) // 2, len(gaps) - 1)
+        upper_middle = np.minimum(self.first + n_intervals // 2, len(gaps) - 1)
+        if len(gaps):
+            median = (values[lower_middle] + values[upper_middle]) / 2
+        else:
+            median = np.full(len(self.gap_days), np.nan)
+        lower_bound = np.maximum(median - num_sd * sd, 0)
+        upper_bound = median + num_sd * sd
+        # the kept intervals are interval_days[kept_start[i]:kept_end[i]]
+        self.kept_start = np.maximum(
+            np.searchsorted(values, lower_bound, "left"), self.first
+        )
+        self.kept_end = np.where(
+            n_intervals > 0, np.searchsorted(values, upper_bound, "right"), self.first
+        )
+        self.kept_end = np.maximum(self.kept_end, self.kept_start)
+
+    def intervals(self, gap_days: float) -> np.ndarray:
+        """
+        Get the sorted interval days between clusters for one of the gap_days values
+
+        Parameters
+        ----------
+        gap_days : float
+            One of the gap_days values, the nearest is used
+
+        Returns
+        -------
+        np.ndarray
+            The days between clusters, before removing outliers
+        """
+        return self.interval_days[self.first[self._index(gap_days)] :]
+
+    def _index(self, gap_days: float) -> int:
+        """The index of the nearest of the gap_days values"""
+        return int(np.argmin(np.abs(self.gap_days - gap_days)))
+
+    def _likelihood(self, days: np.ndarray) -> np.ndarray:
+        """The percentage of kept intervals no longer than days, for each gap_days"""
+        n_kept = self.kept_end - self.kept_start
+        below = np.searchsorted(self.interval_days, days, "right") - self.kept_start
+        below = np.clip(below, 0, n_kept)
+        return (below / np.maximum(n_kept, 1) * 100).astype("int64")
+
+    def stats(self, days_since: float) -> pd.DataFrame:
+        """
+        Find the cluster statistics and likelihood of a seizure for every gap_days value
+
+        Parameters
+        ----------
+        days_since : float
+            Number of days since a seizure
+
+        Returns
+        -------
+        pd.DataFrame
+            Indexed by gap_days, the number of clusters, their mean size, the median interval between
+            them, the likelihood as a %, and when and to what it will next change. Values which can't
+            be found are nan.
+        """
+        n_intervals = len(self.interval_days) - self.first
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_cluster_size = self.n_seizures / self.clusters
+        lower_middle = self.first + (n_intervals - 1) // 2
+        upper_middle = self.first + n_intervals // 2
+        median_interval = np.full(len(self.gap_days), np.nan)
+        has_intervals = n_intervals > 0
+        median_interval[has_intervals] = (
+            self.interval_days[lower_middle[has_intervals]]
+            + self.interval_days[upper_middle[has_intervals]]
+        ) / 2
+
+        # the first kept interval above days_since is when the likelihood next changes
+        above = np.maximum(
+            np.searchsorted(self.interval_days, days_since, "right"), self.kept_start
+        )
+        has_next = above < self.kept_end
+        next_interval = np.full(len(self.gap_days), np.nan)
+        next_interval[has_next] = self.interval_days[above[has_next]]
+        next_likelihood = np.full(len(self.gap_days), np.nan)
+        next_likelihood[has_next] = self._likelihood(next_interval)[has_next]
+        return pd.DataFrame(
+            {
+                "clusters": self.clusters,
+                "mean_cluster_size": mean_cluster_size,
+                "median_interval": median_interval,
+                "likelihood": self._likelihood(np.full(len(self.gap_days), days_since)),
+                "next_updates": next_interval - days_since,
+                "next_likelihood": next_likelihood,
+            },
+            index=pd.Index(self.gap_days, name="gap_days"),
+        )
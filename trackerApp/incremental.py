@@ -0,0 +1,153 @@
+import hashlib
+import logging
+import threading
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from trackerApp.rolling import RollingStats
+from trackerApp.statistical_params import (
+    Clusters,
+    _index_to_ns,
+    cluster_events,
+    get_cluster_info,
+    get_intervals,
+)
+from trackerApp.temporal import TemporalPatterns
+
+logger = logging.getLogger(__name__)
+
+
+# the number of seizures before the watermark checked for edits on each update
+CHECKED_TAIL = 64
+
+
+class Watermark(NamedTuple):
+    """
+    The number of seizures processed so far, the epoch nanoseconds of the last one and a hash of the
+    last CHECKED_TAIL of them
+    """
+
+    count: int
+    last_time: Optional[int]
+    tail_hash: Optional[str] = None
+
+
+def _tail_hash(times: np.ndarray, count: int) -> str:
+    """Hash the CHECKED_TAIL times before count"""
+    return hashlib.blake2b(
+        times[max(count - CHECKED_TAIL, 0) : count].tobytes(), digest_size=16
+    ).hexdigest()
+
+
+class IncrementalPipeline:
+    """
+    Keep the clusters, cluster info and intervals up to date as seizures are appended
+
+    Only the last cluster can change when rows are appended, so an update re-clusters from the start of
+    that cluster onwards, appends to the interval table and counts the new rows in the temporal patterns
+    and rolling stats.
+    If the rows before the watermark have changed the whole history is rebuilt. Only the last
+    CHECKED_TAIL rows before the watermark are checked for edits, and earlier edits are found from the
+    parsed_version of the source, which changes whenever the csv is parsed in full rather than appended
+    to. An update still copies the cluster arrays and tables to append to them, so its cost grows with
+    the history, but only as a copy: the clustering, intervals and counts are only found for new rows.
+    """
+
+    def __init__(self, gap_days: float = 3):
+        """
+        Parameters
+        ----------
+        gap_days : float, optional
+            The number of days after a seizure that a cluster is considered over, by default 3
+        """
+        self.gap_days = gap_days
+        self.times = np.empty(0, dtype="int64")
+        self.clusters = cluster_events(self.times, gap_days)
+        self.cluster_info: Optional[pd.DataFrame] = None
+        self.intervals: Optional[pd.DataFrame] = None
+        self.temporal = TemporalPatterns()
+        self.rolling = RollingStats()
+        self.watermark = Watermark(0, None)
+        self.full_rebuilds = 0
+        self.parsed_version: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def update(self, df: pd.DataFrame, parsed_version: Optional[str] = None):
+        """
+        Bring the pipeline up to date with df
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            The seizure df from get_data, sorted by time
+        parsed_version : Optional[str], optional
+            The parsed_version of the source of df, by default None to only check the watermark
+
+        Raises
+        ------
+        ValueError
+            If df has no seizures, leaving the pipeline unchanged
+        """
+        times = _index_to_ns(df.index)
+        if len(times) == 0:
+            raise ValueError("No seizures to cluster")
+        with self._lock:
+            count, last_time, tail_hash = self.watermark
+            unchanged = (
+                parsed_version == self.parsed_version
+                and count <= len(times)
+                and count > 0
+                and times[count - 1] == last_time
+                and _tail_hash(times, count) == tail_hash
+            )
+            if unchanged and count == len(times):
+                return
+            if unchanged:
+                self._extend(df, times)
+            else:
+                self._rebuild(df, times)
+            self.times = times
+            self.parsed_version = parsed_version
+            self.watermark = Watermark(
+                len(times), int(times[-1]), _tail_hash(times, len(times))
+            )
+
+    def _rebuild(self, df: pd.DataFrame, times: np.ndarray):
+        if self.watermark.count:
+            logger.info("Seizure history changed, rebuilding all clusters")
+        self.full_rebuilds += 1
+        self.clusters = cluster_events(times, self.gap_days)
+        self.cluster_info = get_cluster_info(self.clusters, tz=df.index.tz)
+        self.intervals = get_intervals(self.cluster_info)
+        self.temporal = TemporalPatterns()
+        self.temporal.add(times)
+        self.rolling = RollingStats()
+        self.rolling.add(times, self.clusters.starts)
+
+    def _extend(self, df: pd.DataFrame, times: np.ndarray):
+        clusters = self.clusters
+        last_cluster = len(clusters.counts) - 1
+        last_start = self.watermark.count - clusters.counts[-1]
+        tail = cluster_events(times[last_start:], self.gap_days)
+        self.clusters = Clusters(
+            np.concatenate([clusters.labels[:last_start], tail.labels + last_cluster]),
+            np.concatenate([clusters.starts[:-1], tail.starts]),
+            np.concatenate([clusters.ends[:-1], tail.ends]),
+            np.concatenate([clusters.counts[:-1], tail.counts]),
+        )
+
+        tail_info = get_cluster_info(tail, tz=df.index.tz)
+        tail_info.index += last_cluster
+        self.cluster_info = pd.concat([self.cluster_info.iloc[:-1], tail_info])
+
+        # the interval before the last cluster is unchanged, as its start is unchanged
+        if len(tail_info) > 1:
+            tail_intervals = get_intervals(tail_info.reset_index(drop=True))
+            tail_intervals.index += last_cluster
+            self.intervals = pd.concat([self.intervals, tail_intervals])
+        self.temporal.add(times[self.watermark.count :])
+        # the first cluster of the tail is the previous last cluster, which was already counted
+        self.rolling.add(times[self.watermark.count :], tail.starts[1:])
+        logger.debug(f"Appended {len(times) - self.watermark.count} seizures")
@@ -1,12 +1,383 @@
 import pandas as pd
+import hashlib
 import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List, Optional, Tuple
+
+from trackerApp.constants import DATA_TTL_SECONDS
+from trackerApp.metrics import timed
+from trackerApp.statistical_params import _index_to_ns
+from trackerApp.store import (
+    default_store_path,
+    open_store,
+    read_header,
+    store_age,
+    store_lock,
+    times_to_df,
+    touch_store,
+    write_store,
+)
+from trackerApp.timestamps import ParsedTimes, parse_timestamps
 
 logger = logging.getLogger(__name__)
 
 
+def parse_csv(content: bytes, fmt: Optional[str] = None) -> pd.DataFrame:
+    """Parse the raw seizure csv into a df with a sorted utc datetime index
+
+    Malformed rows are logged and left out, see parse_timestamps.
+
+    Parameters
+    ----------
+    content : bytes
+        The raw csv
+    fmt : Optional[str], optional
+        The format of the timestamps, by default it is detected
+
+    Returns
+    -------
+    pd.DataFrame
+        The csv as a dataframe with a datetime index
+    """
+    parsed = parse_timestamps(content, fmt)
+    _report_malformed(parsed, "the csv")
+    return times_to_df(parsed.times)
+
+
+def _report_malformed(parsed: ParsedTimes, url: str):
+    """Log the rows which couldn't be parsed"""
+    if parsed.malformed:
+        shown = ", ".join(
+            f"line {line}: {text!r}" for line, text in parsed.malformed[:5]
+        )
+        logger.warning(
+            f"Skipped {len(parsed.malformed)} malformed rows in {url}, {shown}"
+            + (", ..." if len(parsed.malformed) > 5 else "")
+        )
+
+
+class DataSource:
+    """
+    Keep the parsed seizure csv in memory, revalidating it once the ttl has expired
+
+    Revalidation sends the ETag and Last-Modified headers from the previous response, and the csv is only
+    parsed again when the content hash changes. When the new content only appends rows to the previous
+    content just the new tail is parsed. The df returned by get is shared, so must not be modified. The
+    timestamp format is detected on each full parse and reused for appended rows, and rows which don't
+    match it are logged and kept in malformed rather than failing the parse.
+
+    With a store_path, each newly parsed csv is also written to a local store. On a cold start the store
+    is read instead of waiting for the network, and it is served if the source can't be reached. Processes
+    sharing a store, such as the workers of one server, take turns under its lock: once the ttl expires the
+    first to take the lock checks the source, and the others map the store it wrote rather than fetching
+    again, so the source is checked once per ttl however many processes there are.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        ttl: float = DATA_TTL_SECONDS,
+        timeout: float = 30,
+        store_path: Optional[str] = None,
+    ):
+        """
+        Parameters
+        ----------
+        url : str
+            url (or local path) for the seizure csv
+        ttl : float, optional
+            Seconds the df is served without checking the source, by default DATA_TTL_SECONDS
+        timeout : float, optional
+            Seconds to wait for the server, by default 30
+        store_path : Optional[str], optional
+            Where to keep a local store of the data, by default None
+        """
+        self.url = url
+        self.ttl = ttl
+        self.timeout = timeout
+        self.store_path = store_path
+        self.version: Optional[str] = None
+        # the version the csv was last parsed in full from, later versions have only appended rows
+        self.parsed_version: Optional[str] = None
+        # the unix time the source was last checked, by this or another process sharing the store
+        self.fetched_at: Optional[float] = None
+        self._df: Optional[pd.DataFrame] = None
+        # the line number and text of each row of the current content which couldn't be parsed
+        self.malformed: List[Tuple[int, str]] = []
+        self._format: Optional[str] = None
+        self._content_len = 0
+        self._etag: Optional[str] = None
+        self._last_modified: Optional[str] = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def get(self) -> pd.DataFrame:
+        """
+        Get the seizure df, refreshing it from the source if the ttl has expired
+
+        Returns
+        -------
+        pd.DataFrame
+            The csv as a dataframe with a datetime index
+        """
+        with self._lock:
+            if self._df is None and self.store_path is not None:
+                self._load_store()
+            if self._df is None or time.monotonic() - self._checked_at >= self.ttl:
+                if self.store_path is None:
+                    self._refresh()
+                else:
+                    self._refresh_shared()
+            return self._df
+
+    def _refresh_shared(self):
+        """
+        Refresh through the store, so only one of the processes sharing it checks the source per ttl
+
+        Without any data this waits for another process's refresh, otherwise the current data is served
+        while another process refreshes and the store is checked again on the next call.
+        """
+        with store_lock(self.store_path, blocking=self._df is None) as locked:
+            if not locked:
+                return
+            if self._sync_store():
+                return
+            if self._refresh():
+                try:
+                    # a fetch which found the content unchanged doesn't rewrite the store
+                    touch_store(self.store_path)
+                except OSError:
+                    pass
+
+    def _sync_store(self) -> bool:
+        """Take the data from the store if another process has refreshed it within the ttl"""
+        try:
+            age = store_age(self.store_path)
+            if age >= self.ttl:
+                return False
+            if read_header(self.store_path)["version"] != self.version:
+                return self._load_store()
+        except (OSError, ValueError, KeyError):
+            return False
+        self._mark_checked(age)
+        return True
+
+    def _mark_checked(self, age: float):
+        """Count the source as checked age seconds ago"""
+        self._checked_at = time.monotonic() - age
+        self.fetched_at = time.time() - age
+
+    def _load_store(self) -> bool:
+        try:
+            times, metadata = open_store(self.store_path)
+            age = store_age(self.store_path)
+        except (OSError, ValueError):
+            logger.debug(f"No usable store at {self.store_path}")
+            return False
+        self._df = times_to_df(times)
+        self.version = metadata["version"]
+        self.parsed_version = metadata.get("parsed_version", self.version)
+        self._content_len = metadata["content_len"]
+        self._etag = metadata["etag"]
+        self._last_modified = metadata["last_modified"]
+        self._format = metadata.get("format")
+        # the store counts as checked when it was last written or touched, so a fresh store isn't
+        # fetched again
+        self._mark_checked(age)
+        logger.info(f"Loaded {len(self._df)} seizures from {self.store_path}")
+        return True
+
+    def _write_store(self):
+        metadata = dict(
+            version=self.version,
+            parsed_version=self.parsed_version,
+            content_len=self._content_len,
+            etag=self._etag,
+            last_modified=self._last_modified,
+            format=self._format,
+            written=time.time(),
+        )
+        try:
+            try:
+                write_store(self.store_path, _index_to_ns(self._df.index), **metadata)
+            except ValueError:
+                # a long ETag or Last-Modified can overflow the header, the store is still worth
+                # having without them, a process loading it just can't revalidate
+                logger.warning(
+                    f"Validators of {self.url} don't fit in {self.store_path}, leaving them out"
+                )
+                metadata.update(etag=None, last_modified=None)
+                write_store(self.store_path, _index_to_ns(self._df.index), **metadata)
+        except (OSError, ValueError):
+            logger.warning(f"Failed to write {self.store_path}", exc_info=True)
+
+    def _refresh(self) -> bool:
+        """Check the source for new content, returning whether it could be reached and parsed"""
+        try:
+            response = self._fetch()
+        except (OSError, urllib.error.URLError):
+            if self._df is None:
+                raise
+            logger.warning(
+                f"Failed to refresh {self.url}, serving the cached data", exc_info=True
+            )
+            self._checked_at = time.monotonic()
+            return False
+        if response is None:
+            logger.debug(f"{self.url} not modified")
+            self._mark_checked(0)
+            return True
+        content, etag, last_modified = response
+        version = hashlib.sha256(content).hexdigest()
+        if version == self.version:
+            logger.debug(f"{self.url} content unchanged")
+        else:
+            try:
+                self._parse(content, version)
+            except ValueError:
+                if self._df is None:
+                    raise
+                # e.g. an error page, which mustn't be revalidated against as if it were the csv
+                logger.warning(
+                    f"Failed to parse {self.url}, serving the cached data",
+                    exc_info=True,
+                )
+                self._checked_at = time.monotonic()
+                return False
+        self._etag = etag
+        self._last_modified = last_modified
+        self._mark_checked(0)
+        if version != self.version:
+            self.version = version
+            self._content_len = len(content)
+            if self.store_path is not None:
+                self._write_store()
+        return True
+
+    def _parse(self, content: bytes, version: str):
+        """Parse new content, just its appended rows if it only appends to the previous content"""
+        appended = self._parse_appended(content)
+        if appended is None:
+            parsed = parse_timestamps(content)
+            _report_malformed(parsed, self.url)
+            self._df = times_to_df(parsed.times)
+            self._format = parsed.format
+            self.malformed = parsed.malformed
+            self.parsed_version = version
+            logger.info(f"Loaded {len(self._df)} seizures from {self.url}")
+        else:
+            logger.info(
+                f"Appended {len(appended) - len(self._df)} seizures from {self.url}"
+            )
+            self._df = appended
+
+    def _parse_appended(self, content: bytes) -> Optional[pd.DataFrame]:
+        """
+        If content only appends rows to the previous content, parse just the new rows
+
+        Returns None when the previous rows were edited, the new rows are out of order or don't match
+        the format of the previous rows, meaning the whole csv needs parsing again.
+        """
+        old_len = self._content_len
+        if (
+            self._df is None
+            or len(content) < old_len
+            # the previous last row must have been complete, ended by a line break or followed by one
+            # in content, as csvs published without a trailing line break
+            or (
+                content[old_len - 1 : old_len] != b"\n"
+                and content[old_len : old_len + 1] not in (b"\r", b"\n")
+            )
+            or hashlib.sha256(content[:old_len]).hexdigest() != self.version
+        ):
+            return None
+        tail = content[old_len:]
+        if not tail.strip():
+            return self._df
+        try:
+            parsed = parse_timestamps(
+                tail, self._format, first_line=content.count(b"\n", 0, old_len) + 1
+            )
+        except ValueError:
+            return None
+        if parsed.malformed and self._format is not None:
+            logger.info(
+                f"Rows in {self.url} don't match {self._format}, parsing all rows"
+            )
+            return None
+        times = parsed.times
+        if len(self._df) and len(times) and times[0] < _index_to_ns(self._df.index)[-1]:
+            logger.info(f"Out of order rows in {self.url}, parsing all rows")
+            return None
+        _report_malformed(parsed, self.url)
+        self.malformed = self.malformed + parsed.malformed
+        # a copy of the whole df, but much cheaper than parsing every row again
+        return pd.concat([self._df, times_to_df(times)])
+
+    @timed("fetch_csv")
+    def _fetch(self) -> Optional[Tuple[bytes, Optional[str], Optional[str]]]:
+        """
+        Read the raw csv with its ETag and Last-Modified, returning None if the server reports it is
+        unchanged
+        """
+        if not self.url.startswith(("http://", "https://")):
+            with open(self.url, "rb") as f:
+                return f.read(), None, None
+
+        request = urllib.request.Request(self.url)
+        if self._etag is not None:
+            request.add_header("If-None-Match", self._etag)
+        if self._last_modified is not None:
+            request.add_header("If-Modified-Since", self._last_modified)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                content = response.read()
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+        except urllib.error.HTTPError as err:
+            if err.code == 304:
+                return None
+            raise
+        return content, etag, last_modified
+
+
+_sources: Dict[str, DataSource] = {}
+_sources_lock = threading.Lock()
+
+
+def get_source(df_url: str, ttl: float = DATA_TTL_SECONDS) -> DataSource:
+    """
+    Get the shared DataSource for a url, creating it if needed
+
+    Parameters
+    ----------
+    df_url : str
+        url for the seizure csv
+    ttl : float, optional
+        Seconds the df is served without checking the source, by default DATA_TTL_SECONDS
+
+    Returns
+    -------
+    DataSource
+        The data source for this url
+    """
+    with _sources_lock:
+        if df_url not in _sources:
+            _sources[df_url] = DataSource(
+                df_url, ttl=ttl, store_path=default_store_path(df_url)
+            )
+        return _sources[df_url]
+
+
 def get_data(df_url: str, print_tail: bool = False) -> pd.DataFrame:
     """Read the seizure csv, return as df with utc datetime index
 
+    The parsed csv is cached in memory by get_source, so repeated calls only revalidate it once the ttl expires.
+    Each new version is also written to a local store, which is read on a cold start or if the network is down.
+
     Parameters
     ----------
     df_url : str
@@ -19,11 +390,7 @@ def get_data(df_url: str, print_tail: bool = False) -> pd.DataFrame:
     pd.DataFrame
         The csv as a dataframe with a datetime index
     """
-
-    df = pd.read_csv(df_url, names=["Seizure"])
-    df["Seizure"] = pd.to_datetime(df["Seizure"], utc=True)
-    df = df.set_index("Seizure")
+    df = get_source(df_url).get()
     if print_tail:
         print(df.tail())
-    df = df.sort_index()
     return df
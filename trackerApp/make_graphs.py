@@ -1,15 +1,24 @@
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
-from typing import Dict, Union, List
+from typing import Dict, Union, List, Optional, Tuple
 from datetime import datetime as dt
 from datetime import timedelta
-import pytz
 
-from trackerApp.statistical_params import get_cluster_info, get_clusters, get_intervals
+from trackerApp.constants import DISPLAY_TZ, NS_IN_DAY, TIMESERIES_MAX_BARS
+from trackerApp.metrics import timed
+from trackerApp.rolling import RollingStats
+from trackerApp.statistical_params import (
+    _index_to_ns,
+    get_cluster_info,
+    get_clusters,
+    get_intervals,
+)
+from trackerApp.temporal import HOURS_IN_DAY, TemporalPatterns
 
 
 def make_fig_text(
-    cluster_info: Dict[int, Dict[str, Union[pd.Timestamp, int]]]
+    cluster_info: Dict[int, Dict[str, Union[pd.Timestamp, int]]], tz: str = DISPLAY_TZ
 ) -> List[List[str]]:
     """
     Create a list of the start and end times of each cluster
@@ -18,30 +27,107 @@ def make_fig_text(
     ----------
     cluster_info : Dict[int, Dict[str, Union[pd.Timestamp, int]]]
         Dictionary containing info on each cluster
+    tz : str, optional
+        The timezone to show times in, by default DISPLAY_TZ
 
     Returns
     -------
     List[List[str]]
         A list of start and end times for each cluster
     """
-    custom_text = []
-    for index, row in cluster_info.iterrows():
-        start_time = row.start.astimezone("Europe/London").strftime("%H:%M %d/%m/%Y")
-        end_time = row.end.astimezone("Europe/London").strftime("%H:%M %d/%m/%Y")
-        custom_text.append([start_time, end_time])
-    return custom_text
+    time_format = "%H:%M %d/%m/%Y"
+    start_times = cluster_info.start.dt.tz_convert(tz).dt.strftime(time_format)
+    end_times = cluster_info.end.dt.tz_convert(tz).dt.strftime(time_format)
+    return np.column_stack([start_times, end_times]).tolist()
 
 
+def aggregate_clusters(
+    cluster_info: Dict[int, Dict[str, Union[pd.Timestamp, int]]],
+    max_bars: int = TIMESERIES_MAX_BARS,
+    x_range: Optional[Tuple[pd.Timestamp, pd.Timestamp]] = None,
+) -> pd.DataFrame:
+    """
+    Group clusters into equal time buckets so that at most max_bars are drawn
+
+    Parameters
+    ----------
+    cluster_info : Dict[int, Dict[str, Union[pd.Timestamp, int]]]
+        Info on each cluster
+    max_bars : int, optional
+        The most bars to draw, by default TIMESERIES_MAX_BARS
+    x_range : Optional[Tuple[pd.Timestamp, pd.Timestamp]], optional
+        Only include clusters overlapping this time range, by default all clusters
+
+    Returns
+    -------
+    pd.DataFrame
+        The start of the first cluster and end of the last cluster in each bucket, the number of
+        seizures and clusters, the bucket width and middle. When no more than max_bars clusters are in
+        range they are returned unchanged, with one cluster each.
+    """
+    if x_range is not None:
+        in_range = (cluster_info.end >= x_range[0]) & (cluster_info.start <= x_range[1])
+        cluster_info = cluster_info[in_range.to_numpy()]
+    if len(cluster_info) <= max_bars:
+        return cluster_info.assign(clusters=1)
+
+    starts = _index_to_ns(pd.DatetimeIndex(cluster_info.start))
+    ends = _index_to_ns(pd.DatetimeIndex(cluster_info.end))
+    first = starts[0] if x_range is None else pd.Timestamp(x_range[0]).value
+    last = ends[-1] if x_range is None else pd.Timestamp(x_range[1]).value
+    # whole days, so that a bucket is never narrower than a single cluster's bar
+    bucket_days = max(-(-(last - first + 1) // (max_bars * NS_IN_DAY)), 1)
+    bucket_ns = bucket_days * NS_IN_DAY
+    buckets = np.maximum(starts - first, 0) // bucket_ns
+    # clusters are sorted, so each bucket is a consecutive run of them
+    bucket_starts = np.flatnonzero(np.diff(buckets, prepend=-1))
+    bucket_ends = np.append(bucket_starts[1:], len(buckets)) - 1
+
+    tz = cluster_info.start.dt.tz
+    start = pd.DatetimeIndex(starts[bucket_starts].view("datetime64[ns]"))
+    end = pd.DatetimeIndex(ends[bucket_ends].view("datetime64[ns]"))
+    middle = pd.DatetimeIndex(
+        (first + buckets[bucket_starts] * bucket_ns + bucket_ns // 2).view(
+            "datetime64[ns]"
+        )
+    )
+    return pd.DataFrame(
+        {
+            "start": start.tz_localize("UTC").tz_convert(tz),
+            "end": end.tz_localize("UTC").tz_convert(tz),
+            "number": np.add.reduceat(cluster_info.number.to_numpy(), bucket_starts),
+            "width": pd.Timedelta(days=int(bucket_days)),
+            "middle": middle.tz_localize("UTC").tz_convert(tz),
+            "clusters": np.diff(np.append(bucket_starts, len(buckets))),
+        }
+    )
+
+
+@timed("make_timeseries")
 def make_timeseries(
-    cluster_info: Dict[int, Dict[str, Union[pd.Timestamp, int]]]
+    cluster_info: Dict[int, Dict[str, Union[pd.Timestamp, int]]],
+    tz: str = DISPLAY_TZ,
+    max_bars: int = TIMESERIES_MAX_BARS,
+    x_range: Optional[Tuple[pd.Timestamp, pd.Timestamp]] = None,
+    subject: Optional[str] = None,
 ) -> go.Figure:
     """
     Make bar chart showing all clusters against time
 
+    Above max_bars clusters, neighbouring clusters are combined into time buckets by aggregate_clusters.
+
     Parameters
     ----------
     cluster_info : Dict[int, Dict[str, Union[pd.Timestamp, int]]]
         Info on each cluster
+    tz : str, optional
+        The timezone to show cluster start and end times in, by default DISPLAY_TZ
+    max_bars : int, optional
+        The most bars to draw, by default TIMESERIES_MAX_BARS
+    x_range : Optional[Tuple[pd.Timestamp, pd.Timestamp]], optional
+        The time range to show, by default from the first cluster until tomorrow
+    subject : Optional[str], optional
+        The subject's id, to name in the title, by default None
 
     Returns
     -------
@@ -49,36 +135,57 @@ def make_timeseries(
         A bar chart showing all clusters against time
     """
     ms_in_day = 86400000
+    if x_range is None:
+        xaxis_range = [cluster_info.loc[0]["start"], dt.now() + timedelta(days=1)]
+    else:
+        xaxis_range = list(x_range)
+    bars = aggregate_clusters(cluster_info, max_bars, x_range)
+    aggregated = bool(len(bars)) and bool(bars.clusters.max() > 1)
+    hovertemplate = (
+        "Cluster started: %{customdata[0]}"
+        + "<br>Cluster finished: %{customdata[1]}</br>"
+    )
+    customdata = make_fig_text(bars, tz)
+    if aggregated:
+        hovertemplate = (
+            "%{customdata[2]} clusters"
+            + "<br>First started: %{customdata[0]}</br>"
+            + "Last finished: %{customdata[1]}"
+        )
+        customdata = np.column_stack([customdata, bars.clusters]).tolist()
     fig = go.Figure()
 
     fig.add_trace(
         go.Bar(
-            x=cluster_info.middle,
-            y=cluster_info.number,
-            width=[ms_in_day] * len(cluster_info),
-            text=cluster_info.number,
-            customdata=make_fig_text(cluster_info),
+            x=bars.middle,
+            y=bars.number,
+            width=bars.width.iloc[0].days * ms_in_day if aggregated else ms_in_day,
+            text=bars.number,
+            customdata=customdata,
             textposition="auto",
-            hovertemplate="Cluster started: %{customdata[0]}"
-            + "<br>Cluster finished: %{customdata[1]}</br>",
+            hovertemplate=hovertemplate,
             name="Seizures",
             marker_color="Red",
         )
     )
     fig.add_trace(
         go.Scatter(
-            x=cluster_info.middle,
-            y=cluster_info.number,
+            x=bars.middle,
+            y=bars.number,
             mode="lines",
             line=dict(color="red", width=1, dash="dot"),
             line_shape="spline",
         )
     )
     fig.update_layout(
-        title_text="Bono seizure clusters over time",
+        title_text=(f"{subject.capitalize()} s" if subject else "S")
+        + "eizure clusters over time",
         xaxis_title="Time",
-        yaxis_title="Number of seizures in the cluster",
-        xaxis_range=[cluster_info.loc[0]["start"], dt.now() + timedelta(days=1)],
+        yaxis_title="Number of seizures in the "
+        + ("clusters" if aggregated else "cluster"),
+        xaxis_range=xaxis_range,
+        # keep the user's zoom when the figure is replaced
+        uirevision="bars_timeseries",
     )
 
     fig = sort_font(fig)
@@ -108,6 +215,7 @@ def sort_font(fig: go.Figure) -> go.Figure:
     return fig
 
 
+@timed("make_cluster_hist")
 def make_cluster_hist(interval_df: pd.DataFrame) -> go.Figure:
     """
     Make histogram for the time between clusters
@@ -145,26 +253,29 @@ def make_cluster_hist(interval_df: pd.DataFrame) -> go.Figure:
     return fig
 
 
-def make_time_hist(df: pd.DataFrame) -> go.Figure:
+@timed("make_time_hist")
+def make_time_hist(patterns: Union[pd.DataFrame, TemporalPatterns]) -> go.Figure:
     """
     Make a histogram showing the number of times a seizure has occurred at each hour of the day
 
     Parameters
     ----------
-    df : pd.DataFrame
-        The google sheet data
+    patterns : Union[pd.DataFrame, TemporalPatterns]
+        The counts of seizures by hour, or the google sheet data to count
 
     Returns
     -------
     go.Figure
         The figure to show
     """
-    cut_off = dt(year=2020, month=6, day=1)
-    cut_off = pytz.utc.localize(cut_off)
-    vals = df[cut_off:].index.hour
+    if isinstance(patterns, pd.DataFrame):
+        patterns = TemporalPatterns.from_df(patterns)
     fig = go.Figure(
-        go.Histogram(
-            x=vals, marker=dict(color="red"), opacity=0.5, xbins=dict(size="H")
+        go.Bar(
+            x=np.arange(HOURS_IN_DAY),
+            y=patterns.hours,
+            marker=dict(color="red"),
+            opacity=0.5,
         )
     )
     fig.update_layout(
@@ -176,3 +287,109 @@ def make_time_hist(df: pd.DataFrame) -> go.Figure:
     )
     fig = sort_font(fig)
     return fig
+
+
+@timed("make_weekday_hour_heatmap")
+def make_weekday_hour_heatmap(
+    patterns: Union[pd.DataFrame, TemporalPatterns]
+) -> go.Figure:
+    """
+    Make a heatmap showing the number of times a seizure has occurred at each hour of each weekday
+
+    Parameters
+    ----------
+    patterns : Union[pd.DataFrame, TemporalPatterns]
+        The counts of seizures by weekday and hour, or the google sheet data to count
+
+    Returns
+    -------
+    go.Figure
+        The figure to show
+    """
+    if isinstance(patterns, pd.DataFrame):
+        patterns = TemporalPatterns.from_df(patterns)
+    fig = go.Figure(
+        go.Heatmap(
+            x=np.arange(HOURS_IN_DAY),
+            y=["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"],
+            z=patterns.weekday_hour,
+            colorscale="Reds",
+            hovertemplate="%{y} %{x}:00<br>%{z} seizures<extra></extra>",
+        )
+    )
+    fig.update_layout(
+        xaxis=dict(tickmode="linear", tick0=0),
+        yaxis=dict(autorange="reversed"),
+        title_text="The number of times a seizure has occurred at each hour of each day",
+        xaxis_title="Hour of the day",
+        yaxis_title="Day of the week",
+    )
+    fig = sort_font(fig)
+    return fig
+
+
+@timed("make_trends")
+def make_trends(
+    rolling: Union[pd.DataFrame, RollingStats],
+    until: Optional[pd.Timestamp] = None,
+    max_points: int = 2000,
+) -> go.Figure:
+    """
+    Make a line chart of seizures in rolling windows, with bars of the clusters started each month
+
+    Over long histories the lines show every n'th day, so that each has at most max_points.
+
+    Parameters
+    ----------
+    rolling : Union[pd.DataFrame, RollingStats]
+        The rolling stats, or the google sheet data to count
+    until : Optional[pd.Timestamp], optional
+        The last day to show, by default the day of the last seizure
+    max_points : int, optional
+        The most points to draw in each line, by default 2000
+
+    Returns
+    -------
+    go.Figure
+        The figure to show
+    """
+    if isinstance(rolling, pd.DataFrame):
+        rolling = RollingStats.from_df(rolling)
+    seizures = rolling.seizures(until)
+    step = max(-(-len(seizures) // max_points), 1)
+    # step back from the last day, so it is always shown
+    seizures = seizures.iloc[::-step].iloc[::-1]
+    clusters = rolling.clusters_per_month()
+    fig = go.Figure()
+    fig.add_trace(
+        go.Bar(
+            x=(clusters.index + timedelta(days=15)).tz_localize(None),
+            y=clusters,
+            name="Clusters in the month",
+            marker_color="grey",
+            opacity=0.3,
+            yaxis="y2",
+        )
+    )
+    dashes = ["dot", "dash", "solid"]
+    for ii, column in enumerate(seizures.columns):
+        fig.add_trace(
+            go.Scatter(
+                x=seizures.index.tz_localize(None),
+                y=seizures[column],
+                mode="lines",
+                name=f"Seizures in {column}",
+                line=dict(color="red", width=1, dash=dashes[ii % len(dashes)]),
+            )
+        )
+    fig.update_layout(
+        title_text="Seizures in the last "
+        + ", ".join(column.split()[0] for column in seizures.columns)
+        + " days, and clusters per month",
+        xaxis_title="Time",
+        yaxis_title="Number of seizures",
+        yaxis2=dict(title="Clusters per month", overlaying="y", side="right"),
+    )
+    fig = sort_font(fig)
+    fig.update_layout(showlegend=True, legend=dict(orientation="h"))
+    return fig
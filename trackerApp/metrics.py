@@ -0,0 +1,192 @@
+"""
+Timings of each stage of the pipeline, and other metrics, in the Prometheus text format
+
+Wrap a stage with timed, as a decorator or a context manager, to add its durations to a histogram.
+Other metrics, such as the age of the data, are read when the metrics are rendered from collectors
+added with register_collector.
+"""
+
+import bisect
+import contextlib
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, NamedTuple, Tuple
+
+PREFIX = "seizure_tracker"
+# upper bounds of the histogram buckets, in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Metric(NamedTuple):
+    """
+    A gauge or counter, with a value for each set of labels
+
+    samples is a list of the labels and value of each sample, e.g. [({"subject": "bono"}, 1.0)]
+    """
+
+    name: str
+    kind: str
+    help: str
+    samples: List[Tuple[Dict[str, str], float]]
+
+
+class Histogram:
+    """The number of observations below each bucket's upper bound, with their count and sum"""
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        # the last count is for observations above every bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+_timings: Dict[str, Histogram] = {}
+_lock = threading.Lock()
+_collectors: List[Callable[[], Iterable[Metric]]] = []
+
+
+def observe(stage: str, seconds: float):
+    """
+    Add a duration to a stage's histogram
+
+    Parameters
+    ----------
+    stage : str
+        The name of the stage, e.g. parse_csv
+    seconds : float
+        How long the stage took
+    """
+    with _lock:
+        if stage not in _timings:
+            _timings[stage] = Histogram()
+        _timings[stage].observe(seconds)
+
+
+class timed(contextlib.ContextDecorator):
+    """
+    Time a stage, as a decorator or a context manager
+
+    Examples
+    --------
+    >>> @timed("parse_csv")
+    ... def parse_csv(content): ...
+
+    >>> with timed("fetch_csv"):
+    ...     content = fetch()
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.stage, time.perf_counter() - self._start)
+        return False
+
+    def _recreate_cm(self):
+        # a new instance per call, so concurrent calls don't share a start time
+        return type(self)(self.stage)
+
+
+def register_collector(collect: Callable[[], Iterable[Metric]]):
+    """
+    Add a function which gives metrics each time they are rendered
+
+    Parameters
+    ----------
+    collect : Callable[[], Iterable[Metric]]
+        Returns the current value of some metrics
+    """
+    _collectors.append(collect)
+
+
+def timings() -> Dict[str, Histogram]:
+    """
+    Get a copy of the histogram of each stage
+
+    Returns
+    -------
+    Dict[str, Histogram]
+        The histograms keyed by stage
+    """
+    with _lock:
+        copies = {}
+        for stage, histogram in _timings.items():
+            copy = Histogram(histogram.buckets)
+            copy.counts = list(histogram.counts)
+            copy.count, copy.sum = histogram.count, histogram.sum
+            copies[stage] = copy
+        return copies
+
+
+def reset():
+    """Clear the stage timings"""
+    with _lock:
+        _timings.clear()
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    """Format labels as {key="value",...}, escaping the values"""
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels.items():
+        value = (
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        )
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _value(value: float) -> str:
+    """Format a value, with Prometheus' spelling of nan and infinity"""
+    value = float(value)
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+def render() -> str:
+    """
+    Render the stage timings and collected metrics in the Prometheus text format
+
+    Returns
+    -------
+    str
+        The metrics
+    """
+    name = f"{PREFIX}_stage_seconds"
+    lines = [
+        f"# HELP {name} Time spent in each stage of the pipeline",
+        f"# TYPE {name} histogram",
+    ]
+    for stage, histogram in sorted(timings().items()):
+        cumulative = 0
+        for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+            cumulative += count
+            le = _value(bound)
+            lines.append(
+                f"{name}_bucket{_labels({'stage': stage, 'le': le})} {cumulative}"
+            )
+        lines.append(f"{name}_sum{_labels({'stage': stage})} {_value(histogram.sum)}")
+        lines.append(f"{name}_count{_labels({'stage': stage})} {histogram.count}")
+
+    for collect in list(_collectors):
+        for metric in collect():
+            name = f"{PREFIX}_{metric.name}"
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for labels, value in metric.samples:
+                lines.append(f"{name}{_labels(labels)} {_value(value)}")
+    return "\n".join(lines) + "\n"
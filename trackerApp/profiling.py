@@ -0,0 +1,237 @@
+"""
+Profile slow callbacks and refreshes, and summarise the profiles
+
+Enable with SEIZURE_PROFILE=1. A sample of calls to functions wrapped with profiled are run under
+cProfile, and those slower than SEIZURE_PROFILE_THRESHOLD_MS are written to SEIZURE_PROFILE_DIR,
+keeping the newest SEIZURE_PROFILE_KEEP. Summarise the hottest functions across recent profiles with
+``python -m trackerApp.profiling``.
+"""
+
+import argparse
+import cProfile
+import functools
+import glob
+import itertools
+import json
+import logging
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Callable, List, NamedTuple, Optional
+
+from trackerApp.constants import (
+    PROFILE,
+    PROFILE_DIR,
+    PROFILE_KEEP,
+    PROFILE_MEMORY,
+    PROFILE_SAMPLE_RATE,
+    PROFILE_THRESHOLD_MS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ProfileSettings(NamedTuple):
+    """When to profile a call and where to keep the profiles"""
+
+    enabled: bool = PROFILE
+    threshold_ms: float = PROFILE_THRESHOLD_MS
+    sample_rate: float = PROFILE_SAMPLE_RATE
+    memory: bool = PROFILE_MEMORY
+    directory: str = PROFILE_DIR
+    keep: int = PROFILE_KEEP
+
+
+# held while a call is being profiled, as only one profiler can be active in a process from python 3.12
+_profiling = threading.Lock()
+# keeps the names of profiles written in the same second unique
+_dump_ids = itertools.count()
+
+
+def profiled(name: str, settings: Optional[ProfileSettings] = None) -> Callable:
+    """
+    Profile calls to a function, keeping the profiles of slow calls
+
+    When profiling isn't enabled the function is returned unwrapped, so costs nothing. Calls made while
+    another call is being profiled are run unprofiled, so calls nested within it are part of its profile.
+
+    Parameters
+    ----------
+    name : str
+        The name to file the profiles under, e.g. update_stats
+    settings : Optional[ProfileSettings], optional
+        When to profile and where to keep the profiles, by default from the environment
+
+    Returns
+    -------
+    Callable
+        A decorator
+    """
+    if settings is None:
+        settings = ProfileSettings()
+
+    def decorator(func: Callable) -> Callable:
+        if not settings.enabled:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if random.random() >= settings.sample_rate:
+                return func(*args, **kwargs)
+            if not _profiling.acquire(blocking=False):
+                # another call is being profiled, on this thread or another
+                return func(*args, **kwargs)
+            profile = cProfile.Profile()
+            # tracemalloc may have been started outside this module
+            trace_memory = settings.memory and not tracemalloc.is_tracing()
+            start = time.perf_counter()
+            try:
+                if trace_memory:
+                    tracemalloc.start()
+                try:
+                    profile.enable()
+                except ValueError:
+                    # a profiler outside this module is active
+                    logger.debug(f"Not profiling {name}", exc_info=True)
+                    profile = None
+                return func(*args, **kwargs)
+            finally:
+                if profile is not None:
+                    profile.disable()
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                peak_bytes = None
+                if trace_memory:
+                    peak_bytes = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                _profiling.release()
+                if profile is not None and elapsed_ms >= settings.threshold_ms:
+                    _dump(profile, name, elapsed_ms, peak_bytes, settings)
+
+        return wrapper
+
+    return decorator
+
+
+def _dump(
+    profile: cProfile.Profile,
+    name: str,
+    elapsed_ms: float,
+    peak_bytes: Optional[int],
+    settings: ProfileSettings,
+):
+    """Write a profile and its summary, then delete the oldest beyond settings.keep"""
+    stem = os.path.join(
+        settings.directory,
+        f"{time.strftime('%Y%m%d-%H%M%S')}-{next(_dump_ids):04d}_{name}_{elapsed_ms:.0f}ms_{os.getpid()}",
+    )
+    try:
+        os.makedirs(settings.directory, exist_ok=True)
+        profile.dump_stats(stem + ".prof")
+        with open(stem + ".json", "w") as f:
+            json.dump(
+                {
+                    "name": name,
+                    "elapsed_ms": elapsed_ms,
+                    "peak_bytes": peak_bytes,
+                    "time": time.time(),
+                },
+                f,
+            )
+        logger.info(f"{name} took {elapsed_ms:.0f}ms, profile written to {stem}.prof")
+        for old in recent_profiles(settings.directory)[: -settings.keep or None]:
+            for path in (old, old[: -len(".prof")] + ".json"):
+                if os.path.exists(path):
+                    os.remove(path)
+    except OSError:
+        logger.warning(f"Failed to write the profile of {name}", exc_info=True)
+
+
+def recent_profiles(directory: str = PROFILE_DIR) -> List[str]:
+    """
+    Find the profiles in a directory
+
+    Parameters
+    ----------
+    directory : str, optional
+        Where the profiles are kept, by default PROFILE_DIR
+
+    Returns
+    -------
+    List[str]
+        The paths of the profiles, oldest first
+    """
+    paths = glob.glob(os.path.join(directory, "*.prof"))
+    return sorted(paths, key=lambda path: (os.path.getmtime(path), path))
+
+
+def summarise(
+    paths: List[str], top: int = 20, sort: str = "cumulative", stream=None
+) -> pstats.Stats:
+    """
+    Print each profile's duration and peak memory, then the hottest functions across all of them
+
+    Parameters
+    ----------
+    paths : List[str]
+        The profiles to summarise
+    top : int, optional
+        The number of functions to show, by default 20
+    sort : str, optional
+        The pstats sort key, by default "cumulative"
+    stream : optional
+        Where to print to, by default stdout
+
+    Returns
+    -------
+    pstats.Stats
+        The combined stats
+    """
+    stream = stream or sys.stdout
+    for path in paths:
+        try:
+            with open(path[: -len(".prof")] + ".json") as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            info = {}
+        peak = info.get("peak_bytes")
+        peak = f", peak {peak / 2**20:.1f}MiB" if peak is not None else ""
+        print(
+            f"{os.path.basename(path)}: {info.get('name', '?')} "
+            f"{info.get('elapsed_ms', float('nan')):.0f}ms{peak}",
+            file=stream,
+        )
+    stats = pstats.Stats(*paths, stream=stream)
+    stats.sort_stats(sort).print_stats(top)
+    return stats
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Summarise the hottest functions in recent profiles"
+    )
+    parser.add_argument("--dir", default=PROFILE_DIR)
+    parser.add_argument(
+        "--last", type=int, default=10, help="the number of recent profiles"
+    )
+    parser.add_argument("--name", help="only profiles of this callback or stage")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--sort", default="cumulative")
+    args = parser.parse_args(argv)
+
+    paths = recent_profiles(args.dir)
+    if args.name:
+        paths = [path for path in paths if f"_{args.name}_" in os.path.basename(path)]
+    paths = paths[-args.last :]
+    if not paths:
+        print(f"No profiles in {args.dir}")
+        return 1
+    summarise(paths, args.top, args.sort)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+"""
+The snapshot refreshers of every subject, refreshed together
+
+A subject's refresher is started on first use, under a lock of its own, so a slow sheet only holds up
+requests for that subject. One background thread then refreshes every started subject each interval,
+fetching their sheets at once on a thread pool, and finds the stats of all of them in one batched pass.
+"""
+
+import concurrent.futures
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Set, Tuple, Union
+
+import pandas as pd
+
+from trackerApp.batched import batched_stats, concat_subjects
+from trackerApp.constants import DATA_TTL_SECONDS, FETCH_WORKERS
+from trackerApp.inout import DataSource
+from trackerApp.snapshot import SnapshotRefresher
+from trackerApp.sources import MergedSource
+from trackerApp.subjects import get_subject_source
+
+logger = logging.getLogger(__name__)
+
+
+class SubjectRefreshers:
+    """
+    Start each subject's SnapshotRefresher on first use, and refresh them all in one pass
+
+    summary holds the stats of every started subject from batched_stats, one row per subject, rebuilt
+    after each pass.
+    """
+
+    def __init__(
+        self,
+        get_source: Callable[
+            [str], Union[DataSource, MergedSource]
+        ] = get_subject_source,
+        interval: float = DATA_TTL_SECONDS,
+        gap_days: float = 3,
+        workers: int = FETCH_WORKERS,
+    ):
+        """
+        Parameters
+        ----------
+        get_source : Callable[[str], Union[DataSource, MergedSource]], optional
+            Gets a subject's source, raising KeyError for an unknown subject, by default
+            get_subject_source
+        interval : float, optional
+            Seconds between refreshes of every subject, by default DATA_TTL_SECONDS
+        gap_days : float, optional
+            The number of days after a seizure that a cluster is considered over, by default 3
+        workers : int, optional
+            Subjects refreshed at once, by default FETCH_WORKERS
+        """
+        self.get_source = get_source
+        self.interval = interval
+        self.gap_days = gap_days
+        self.summary: Optional[pd.DataFrame] = None
+        self._refreshers: Dict[str, SnapshotRefresher] = {}
+        self._starting: Dict[str, threading.Lock] = {}
+        self._pending: Set[str] = set()
+        self._lock = threading.Lock()
+        self._pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="refresh"
+        )
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def get(self, subject_id: str) -> SnapshotRefresher:
+        """
+        Get a subject's refresher, building its first snapshot if it hasn't been used
+
+        Parameters
+        ----------
+        subject_id : str
+            The subject's id
+
+        Returns
+        -------
+        SnapshotRefresher
+            The subject's refresher, with a snapshot
+
+        Raises
+        ------
+        KeyError
+            If the subject is not registered
+        """
+        with self._lock:
+            refresher = self._refreshers.get(subject_id)
+            if refresher is not None:
+                return refresher
+        # checked before anything is kept for the subject, so unknown ids can't grow _starting
+        source = self.get_source(subject_id)
+        with self._lock:
+            starting = self._starting.setdefault(subject_id, threading.Lock())
+        # only requests for this subject wait for its first refresh
+        with starting:
+            with self._lock:
+                refresher = self._refreshers.get(subject_id)
+            if refresher is None:
+                refresher = SnapshotRefresher(
+                    source, self.interval, self.gap_days, subject_id=subject_id
+                )
+                refresher.refresh()
+                with self._lock:
+                    self._refreshers[subject_id] = refresher
+                    self._starting.pop(subject_id, None)
+        return refresher
+
+    def peek(self, subject_id: str) -> Optional[SnapshotRefresher]:
+        """
+        Get a subject's refresher if it has a snapshot, otherwise start building one in the background
+
+        Parameters
+        ----------
+        subject_id : str
+            The subject's id
+
+        Returns
+        -------
+        Optional[SnapshotRefresher]
+            The subject's refresher, or None while its first snapshot is built
+
+        Raises
+        ------
+        KeyError
+            If the subject is not registered
+        """
+        with self._lock:
+            refresher = self._refreshers.get(subject_id)
+            if refresher is not None or subject_id in self._pending:
+                return refresher
+        self.get_source(subject_id)
+        with self._lock:
+            if subject_id in self._pending:
+                return None
+            self._pending.add(subject_id)
+        self._pool.submit(self._start_subject, subject_id)
+        return None
+
+    def _start_subject(self, subject_id: str):
+        try:
+            self.get(subject_id)
+        except Exception:
+            logger.exception(f"Failed to build the first snapshot of {subject_id}")
+        finally:
+            with self._lock:
+                self._pending.discard(subject_id)
+
+    def items(self) -> List[Tuple[str, SnapshotRefresher]]:
+        """
+        Get the started refreshers
+
+        Returns
+        -------
+        List[Tuple[str, SnapshotRefresher]]
+            Each subject id and refresher, in id order
+        """
+        with self._lock:
+            return sorted(self._refreshers.items())
+
+    def refresh_all(self) -> pd.DataFrame:
+        """
+        Refresh every started subject at once, then find all of their stats in one batched pass
+
+        A subject whose refresh fails keeps its previous snapshot and is counted in its failures.
+
+        Returns
+        -------
+        pd.DataFrame
+            The new summary, indexed by subject id
+        """
+        subjects = self.items()
+        futures = [self._pool.submit(refresher.refresh) for _, refresher in subjects]
+        for (subject_id, refresher), future in zip(subjects, futures):
+            try:
+                future.result()
+            except Exception:
+                refresher.failures += 1
+                logger.exception(f"Failed to refresh the snapshot of {subject_id}")
+        # the times each snapshot was built from, so the summary matches the snapshots
+        times = []
+        for _, refresher in subjects:
+            with refresher.refreshing():
+                times.append(refresher.pipeline.times)
+        summary = batched_stats(*concat_subjects(times), self.gap_days)
+        summary.index = pd.Index(
+            [subject_id for subject_id, _ in subjects], name="subject"
+        )
+        self.summary = summary
+        return summary
+
+    def start(self):
+        """Start refreshing every subject every interval seconds"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="subject-refreshers", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background refreshes"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh_all()
+            except Exception:
+                logger.exception("Failed to refresh the subjects")
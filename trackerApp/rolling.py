@@ -0,0 +1,148 @@
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from trackerApp.constants import NS_IN_DAY
+from trackerApp.statistical_params import _index_to_ns, cluster_events
+
+ROLLING_WINDOWS = (7, 30, 90)
+
+
+def _grow(counts: np.ndarray, length: int) -> np.ndarray:
+    """Pad counts with zeros up to length"""
+    if len(counts) >= length:
+        return counts
+    return np.concatenate([counts, np.zeros(length - len(counts), dtype="int64")])
+
+
+class RollingStats:
+    """
+    Seizures in rolling windows of days and clusters per month, over the whole history
+
+    Seizures are counted per day and cluster starts per month as they are added, so appending seizures
+    only counts the new ones. Each window is then a difference of the cumulative daily counts, a single
+    pass over the days. Days and months are in UTC.
+    """
+
+    def __init__(self, windows: Sequence[int] = ROLLING_WINDOWS):
+        """
+        Parameters
+        ----------
+        windows : Sequence[int], optional
+            The lengths of the rolling windows in days, by default ROLLING_WINDOWS
+        """
+        self.windows = tuple(windows)
+        self.first_day: Optional[int] = None
+        self.first_month: Optional[int] = None
+        # counts indexed by days since first_day, and months since first_month
+        self.daily = np.zeros(0, dtype="int64")
+        self.monthly_clusters = np.zeros(0, dtype="int64")
+
+    def add(self, times: np.ndarray, cluster_starts: np.ndarray):
+        """
+        Count more seizures and clusters, which must be after those already added
+
+        Parameters
+        ----------
+        times : np.ndarray
+            Sorted epoch nanoseconds of the new seizures
+        cluster_starts : np.ndarray
+            Epoch nanoseconds of the start of each new cluster
+        """
+        times = np.asarray(times, dtype="int64")
+        cluster_starts = np.asarray(cluster_starts, dtype="int64")
+        if len(times):
+            days = times // NS_IN_DAY
+            if self.first_day is None:
+                self.first_day = int(days[0])
+            days = days - self.first_day
+            self.daily = _grow(self.daily, int(days[-1]) + 1)
+            self.daily += np.bincount(days, minlength=len(self.daily))
+        if len(cluster_starts):
+            months = (
+                cluster_starts.view("datetime64[ns]")
+                .astype("datetime64[M]")
+                .astype("int64")
+            )
+            if self.first_month is None:
+                self.first_month = int(months[0])
+            months = months - self.first_month
+            self.monthly_clusters = _grow(self.monthly_clusters, int(months.max()) + 1)
+            self.monthly_clusters += np.bincount(
+                months, minlength=len(self.monthly_clusters)
+            )
+
+    def seizures(self, until: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        """
+        Find the number of seizures in each rolling window, ending on each day
+
+        Parameters
+        ----------
+        until : Optional[pd.Timestamp], optional
+            The last day to include, by default the day of the last seizure
+
+        Returns
+        -------
+        pd.DataFrame
+            Indexed by UTC day, a column of seizure counts for each window, e.g. "7 days"
+        """
+        if self.first_day is None:
+            return pd.DataFrame(
+                columns=[f"{window} days" for window in self.windows], dtype="int64"
+            )
+        n_days = len(self.daily)
+        if until is not None:
+            n_days = max(pd.Timestamp(until).value // NS_IN_DAY - self.first_day + 1, 0)
+        cumulative = np.concatenate([[0], np.cumsum(_grow(self.daily, n_days))])
+        end = np.arange(1, n_days + 1)
+        days = pd.DatetimeIndex(
+            ((self.first_day + end - 1) * NS_IN_DAY).view("datetime64[ns]")
+        ).tz_localize("UTC")
+        return pd.DataFrame(
+            {
+                f"{window} days": cumulative[end]
+                - cumulative[np.maximum(end - window, 0)]
+                for window in self.windows
+            },
+            index=days,
+        )
+
+    def clusters_per_month(self) -> pd.Series:
+        """
+        Find the number of clusters which started in each month
+
+        Returns
+        -------
+        pd.Series
+            Indexed by the UTC start of each month, the number of clusters
+        """
+        months = np.arange(len(self.monthly_clusters)) + (self.first_month or 0)
+        index = pd.DatetimeIndex(
+            months.astype("datetime64[M]").astype("datetime64[ns]")
+        ).tz_localize("UTC")
+        return pd.Series(self.monthly_clusters, index=index, name="clusters")
+
+    @classmethod
+    def from_df(cls, df: pd.DataFrame, gap_days: float = 3, **kwargs) -> "RollingStats":
+        """
+        Count the seizures and clusters in a df
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            The seizure df from get_data
+        gap_days : float, optional
+            The number of days after a seizure that a cluster is considered over, by default 3
+        **kwargs
+            windows, passed to RollingStats
+
+        Returns
+        -------
+        RollingStats
+            The counts for every seizure in df
+        """
+        times = _index_to_ns(df.index)
+        rolling = cls(**kwargs)
+        rolling.add(times, cluster_events(times, gap_days).starts)
+        return rolling
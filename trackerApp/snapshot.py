@@ -0,0 +1,379 @@
+import contextlib
+import datetime as dt
+import logging
+import threading
+import time
+from types import MappingProxyType
+from typing import Iterator, Mapping, NamedTuple, Optional, Tuple, Union
+
+import pandas as pd
+
+from trackerApp.bootstrap import LikelihoodInterval, cached_bootstrap_likelihood
+from trackerApp.constants import (
+    BOOTSTRAP_SAMPLES,
+    DATA_TTL_SECONDS,
+    GAP_DAYS_OPTIONS,
+    ZOOM_CACHE_SIZE,
+)
+from trackerApp.figure_cache import FigureCache
+from trackerApp.gap_sweep import GapSweep
+from trackerApp.incremental import IncrementalPipeline
+from trackerApp.inout import DataSource
+from trackerApp.make_graphs import (
+    make_cluster_hist,
+    make_time_hist,
+    make_timeseries,
+    make_trends,
+    make_weekday_hour_heatmap,
+)
+from trackerApp.metrics import timed
+from trackerApp.profiling import profiled
+from trackerApp.rolling import RollingStats
+from trackerApp.sources import MergedSource
+from trackerApp.statistical_params import (
+    _index_to_ns,
+    estimate_cluster_size,
+    LikelihoodModel,
+    most_recent_seizure,
+)
+from trackerApp.temporal import TemporalPatterns
+
+logger = logging.getLogger(__name__)
+
+
+# the label the dashboard shows for each figure type in DashboardSnapshot.figures
+FIGURE_LABELS = {
+    "bars_timeseries": "Clusters over time",
+    "bars_time_comparison": "Time since last cluster",
+    "seizure_hour_comparison": "Hour of the day seizures have occurred",
+    "seizure_weekday_hour": "Day of the week and hour seizures have occurred",
+    "seizure_trends": "Seizures and clusters over recent weeks and months",
+}
+
+
+class DashboardSnapshot(NamedTuple):
+    """
+    Everything the dashboard shows, computed together from one version of the data
+
+    figures maps each figure type to its plotly json, ready to be returned from a callback.
+    cluster_info is kept to redraw the timeseries in more detail when it is zoomed, intervals to serve
+    from the API, and gap_sweep holds the cluster statistics for each of GAP_DAYS_OPTIONS, from
+    GapSweep.stats.
+    """
+
+    version: str
+    created: float
+    days_since: int
+    likelihood_message: str
+    likelihood_model: LikelihoodModel
+    likelihood_interval: Optional[LikelihoodInterval]
+    next_cluster_size: str
+    figures: Mapping[str, dict]
+    cluster_info: pd.DataFrame
+    intervals: pd.DataFrame
+    gap_sweep: pd.DataFrame
+
+
+def make_likelihood_message(
+    days_since: int,
+    likelihood_model: LikelihoodModel,
+    likelihood_interval: Optional[LikelihoodInterval] = None,
+) -> str:
+    """
+    Describe the current likelihood of a seizure and when it will next change
+
+    Parameters
+    ----------
+    days_since : int
+        Number of days since a seizure
+    likelihood_model : LikelihoodModel
+        The likelihood model for the current data
+    likelihood_interval : Optional[LikelihoodInterval], optional
+        A confidence interval to include for the current likelihood, by default None
+
+    Returns
+    -------
+    str
+        Markdown describing the likelihood
+    """
+    if days_since >= 2:
+        likelihood, next_updates, next_likelihood = likelihood_model.predict(days_since)
+        if not isinstance(likelihood, str):
+            likelihood = f"{likelihood}%"
+        interval = ""
+        if likelihood_interval is not None:
+            lower, upper, confidence = likelihood_interval[1:]
+            interval = f" ({confidence:.0%} interval {lower:.0f}-{upper:.0f}%)"
+        return f"""Making the current likelihood of a seizure **{likelihood}**{interval}, this will update to {next_likelihood}% in {next_updates} days."""
+    elif days_since == 1:
+        return f"""As the most recent seizure was only {days_since} day ago, it is possible the cluster is still active"""
+    elif days_since == 0:
+        return f"""As the most recent seizure was today, it is possible the cluster is still active"""
+    return "Failed to produce likelihood message."
+
+
+def make_gap_sweep_message(gap_days: float, gap_sweep: pd.DataFrame) -> str:
+    """
+    Describe the clusters and likelihood of a seizure if clusters ended after gap_days
+
+    Parameters
+    ----------
+    gap_days : float
+        The number of days after a seizure that a cluster is considered over
+    gap_sweep : pd.DataFrame
+        Stats from GapSweep.stats, the nearest gap_days is used
+
+    Returns
+    -------
+    str
+        Markdown describing the clusters
+    """
+    stats = gap_sweep.iloc[abs(gap_sweep.index - gap_days).argmin()]
+    message = f"""Taking a cluster to end after **{stats.name:g}** days without a seizure gives **{stats.clusters:.0f}** clusters, of **{stats.mean_cluster_size:.1f}** seizures on average"""
+    if stats.clusters < 2:
+        return message + "."
+    return (
+        message
+        + f""", with a median of {stats.median_interval:g} days between them and a current likelihood of a seizure of **{stats.likelihood:.0f}%**."""
+    )
+
+
+@timed("build_snapshot")
+def build_snapshot(
+    df: pd.DataFrame,
+    cluster_info: pd.DataFrame,
+    intervals: pd.DataFrame,
+    version: str,
+    figure_cache: Optional[FigureCache] = None,
+    bootstrap_samples: int = 0,
+    gap_sweep: Optional[GapSweep] = None,
+    temporal: Optional[TemporalPatterns] = None,
+    rolling: Optional[RollingStats] = None,
+    subject_id: Optional[str] = None,
+) -> DashboardSnapshot:
+    """
+    Compute the stats, messages and figures for the dashboard
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The seizure df from get_data
+    cluster_info : pd.DataFrame
+        Cluster info from get_cluster_info
+    intervals : pd.DataFrame
+        Interval info from get_intervals
+    version : str
+        The version of the data, from DataSource.version
+    figure_cache : Optional[FigureCache], optional
+        Cache to reuse figures from earlier snapshots of the same data, by default None
+    bootstrap_samples : int, optional
+        Resamples for a confidence interval on the likelihood, by default 0 for no interval
+    gap_sweep : Optional[GapSweep], optional
+        The sweep over GAP_DAYS_OPTIONS for this version of the data, by default it is built from df
+    temporal : Optional[TemporalPatterns], optional
+        The counts of seizures by weekday and hour, by default they are counted from df
+    rolling : Optional[RollingStats], optional
+        The counts of seizures by day and clusters by month, by default they are counted from df
+    subject_id : Optional[str], optional
+        The subject the data is of, named in the figure titles, by default None
+
+    Returns
+    -------
+    DashboardSnapshot
+        The snapshot for this version of the data
+    """
+    days_since = most_recent_seizure(df)
+    likelihood_model = LikelihoodModel(intervals)
+    likelihood_interval = None
+    if bootstrap_samples and days_since >= 2:
+        likelihood_interval = cached_bootstrap_likelihood(
+            version, intervals.interval_days.to_numpy(), days_since, bootstrap_samples
+        )
+    if figure_cache is None:
+        figure_cache = FigureCache()
+    if gap_sweep is None:
+        gap_sweep = GapSweep(_index_to_ns(df.index), GAP_DAYS_OPTIONS)
+    if temporal is None:
+        temporal = TemporalPatterns.from_df(df)
+    if rolling is None:
+        rolling = RollingStats.from_df(df)
+    figures = {
+        # the timeseries x axis runs until tomorrow, so it changes daily
+        "bars_timeseries": figure_cache.get(
+            version,
+            "bars_timeseries",
+            lambda: make_timeseries(cluster_info, subject=subject_id),
+            today=dt.date.today().isoformat(),
+            subject=subject_id,
+        ),
+        "bars_time_comparison": figure_cache.get(
+            version, "bars_time_comparison", lambda: make_cluster_hist(intervals)
+        ),
+        "seizure_hour_comparison": figure_cache.get(
+            version, "seizure_hour_comparison", lambda: make_time_hist(temporal)
+        ),
+        "seizure_weekday_hour": figure_cache.get(
+            version,
+            "seizure_weekday_hour",
+            lambda: make_weekday_hour_heatmap(temporal),
+        ),
+        # the rolling windows run until today
+        "seizure_trends": figure_cache.get(
+            version,
+            "seizure_trends",
+            lambda: make_trends(rolling, until=pd.Timestamp.now(tz="UTC")),
+            today=dt.date.today().isoformat(),
+        ),
+    }
+    return DashboardSnapshot(
+        version=version,
+        created=time.time(),
+        days_since=days_since,
+        likelihood_message=make_likelihood_message(
+            days_since, likelihood_model, likelihood_interval
+        ),
+        likelihood_model=likelihood_model,
+        likelihood_interval=likelihood_interval,
+        next_cluster_size=estimate_cluster_size(cluster_info, days_since),
+        figures=MappingProxyType(figures),
+        cluster_info=cluster_info,
+        intervals=intervals,
+        gap_sweep=gap_sweep.stats(days_since),
+    )
+
+
+class SnapshotRefresher:
+    """
+    Rebuild the dashboard snapshot on a background thread, swapping it in once complete
+
+    Readers take snapshot, which is replaced in a single assignment, so they never see a partial update
+    and never wait for a rebuild. If a rebuild fails the previous snapshot is kept.
+    """
+
+    def __init__(
+        self,
+        source: Union[DataSource, MergedSource],
+        interval: float = DATA_TTL_SECONDS,
+        gap_days: float = 3,
+        bootstrap_samples: int = BOOTSTRAP_SAMPLES,
+        subject_id: Optional[str] = None,
+    ):
+        """
+        Parameters
+        ----------
+        source : Union[DataSource, MergedSource]
+            Where to read the seizure csv, or merged csvs, from
+        interval : float, optional
+            Seconds between rebuilds, by default DATA_TTL_SECONDS
+        gap_days : float, optional
+            The number of days after a seizure that a cluster is considered over, by default 3
+        bootstrap_samples : int, optional
+            Resamples for a confidence interval on the likelihood, by default BOOTSTRAP_SAMPLES
+        subject_id : Optional[str], optional
+            The subject the source is of, named in the figure titles, by default None
+        """
+        self.source = source
+        self.interval = interval
+        self.bootstrap_samples = bootstrap_samples
+        self.subject_id = subject_id
+        self.pipeline = IncrementalPipeline(gap_days)
+        self.figure_cache = FigureCache()
+        self.zoom_cache = FigureCache(ZOOM_CACHE_SIZE)
+        self.gap_sweep: Optional[GapSweep] = None
+        self._gap_sweep_version: Optional[str] = None
+        self.snapshot: Optional[DashboardSnapshot] = None
+        self.failures = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._refresh_lock = threading.Lock()
+
+    @timed("refresh")
+    @profiled("refresh")
+    def refresh(self) -> DashboardSnapshot:
+        """
+        Rebuild the snapshot now
+
+        Returns
+        -------
+        DashboardSnapshot
+            The new snapshot
+        """
+        with self.refreshing():
+            df = self.source.get()
+            self.pipeline.update(df, self.source.parsed_version)
+            # the sweep only changes with the data, the likelihoods are found per snapshot
+            if self._gap_sweep_version != self.source.version:
+                self.gap_sweep = GapSweep(self.pipeline.times, GAP_DAYS_OPTIONS)
+                self._gap_sweep_version = self.source.version
+            snapshot = build_snapshot(
+                df,
+                self.pipeline.cluster_info,
+                self.pipeline.intervals,
+                self.source.version,
+                self.figure_cache,
+                self.bootstrap_samples,
+                self.gap_sweep,
+                self.pipeline.temporal,
+                self.pipeline.rolling,
+                self.subject_id,
+            )
+            self.snapshot = snapshot
+        return snapshot
+
+    @contextlib.contextmanager
+    def refreshing(self) -> Iterator[None]:
+        """
+        Hold off refreshes, so the pipeline can be read in the state the current snapshot was built from
+        """
+        with self._refresh_lock:
+            yield
+
+    def timeseries(self, x_range: Tuple[pd.Timestamp, pd.Timestamp]) -> dict:
+        """
+        Get the clusters over time figure for a time range, aggregated for that range
+
+        Parameters
+        ----------
+        x_range : Tuple[pd.Timestamp, pd.Timestamp]
+            The start and end of the time range
+
+        Returns
+        -------
+        dict
+            The figure as json
+        """
+        snapshot = self.snapshot
+        return self.zoom_cache.get(
+            snapshot.version,
+            "bars_timeseries",
+            lambda: make_timeseries(
+                snapshot.cluster_info, x_range=x_range, subject=self.subject_id
+            ),
+            x_range=tuple(x_range),
+            subject=self.subject_id,
+        )
+
+    def start(self):
+        """Start rebuilding the snapshot every interval seconds"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="snapshot-refresher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background rebuilds"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception:
+                self.failures += 1
+                logger.exception("Failed to refresh the dashboard snapshot")
@@ -0,0 +1,200 @@
+"""
+Seizures logged in several places, merged into one history
+
+Each sheet is read through its own DataSource, so is cached and revalidated as usual, and the sheets are
+fetched at once on a shared thread pool. Their sorted times are then combined with a streaming k-way
+merge, dropping an event when it is within a tolerance of an event from another sheet, as both are
+records of the same seizure.
+"""
+
+import collections
+import concurrent.futures
+import hashlib
+import heapq
+import logging
+import threading
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from trackerApp.constants import FETCH_WORKERS, MERGE_TOLERANCE_SECONDS
+from trackerApp.inout import DataSource, get_source
+from trackerApp.statistical_params import _index_to_ns
+from trackerApp.store import times_to_df
+
+logger = logging.getLogger(__name__)
+
+# the times are handed to the merge in chunks, so a stream is never all converted to python ints at once
+CHUNK_SIZE = 4096
+
+_fetch_pool = concurrent.futures.ThreadPoolExecutor(
+    max_workers=FETCH_WORKERS, thread_name_prefix="fetch"
+)
+
+
+def _stream(times: np.ndarray, stream: int) -> Iterator[Tuple[int, int]]:
+    """Yield each time tagged with the index of its stream, converting a chunk at a time"""
+    for start in range(0, len(times), CHUNK_SIZE):
+        for time in times[start : start + CHUNK_SIZE].tolist():
+            yield time, stream
+
+
+def merge_events(streams: Sequence[np.ndarray], tolerance_ns: int = 0) -> Iterator[int]:
+    """
+    Merge sorted streams of events, dropping events which duplicate one from another stream
+
+    An event is a duplicate when it is within tolerance_ns of a kept event from another stream which
+    hasn't already absorbed an event from its stream, so events close together in one stream are all
+    kept. Only the kept events within tolerance_ns of the latest are held, so memory is bounded by the
+    tolerance rather than the length of the streams.
+
+    Parameters
+    ----------
+    streams : Sequence[np.ndarray]
+        Sorted epoch nanoseconds of the events in each stream
+    tolerance_ns : int, optional
+        The furthest apart two events from different streams can be and be the same, by default 0
+
+    Yields
+    ------
+    Iterator[int]
+        The epoch nanoseconds of each kept event, in order
+    """
+    # the recent kept events, with the streams each has matched
+    window: Deque[Tuple[int, Set[int]]] = collections.deque()
+    merged = heapq.merge(*(_stream(times, i) for i, times in enumerate(streams)))
+    for time, stream in merged:
+        while window and time - window[0][0] > tolerance_ns:
+            window.popleft()
+        for _, matched in window:
+            if stream not in matched:
+                matched.add(stream)
+                break
+        else:
+            window.append((time, {stream}))
+            yield time
+
+
+class MergedSource:
+    """
+    Several seizure csvs read as one, with duplicate events dropped
+
+    It has the interface of a DataSource, so can be given to a SnapshotRefresher. The merge is only
+    redone when a sheet's version changes. A sheet which can't be read is left out of the merge until it
+    can, unless none of them can be read.
+    """
+
+    def __init__(
+        self,
+        sources: Sequence[DataSource],
+        tolerance: float = MERGE_TOLERANCE_SECONDS,
+        pool: Optional[concurrent.futures.Executor] = None,
+    ):
+        """
+        Parameters
+        ----------
+        sources : Sequence[DataSource]
+            The sources to merge
+        tolerance : float, optional
+            Seconds apart events from different sources can be and be the same seizure, by default
+            MERGE_TOLERANCE_SECONDS
+        pool : Optional[concurrent.futures.Executor], optional
+            Where to fetch the sources, by default a pool shared by every MergedSource
+        """
+        self.sources = list(sources)
+        self.tolerance = tolerance
+        self.pool = pool or _fetch_pool
+        self.version: Optional[str] = None
+        # each merge builds a new history, rather than appending to the last
+        self.parsed_version: Optional[str] = None
+        self._versions: Optional[Tuple[Optional[str], ...]] = None
+        self._df: Optional[pd.DataFrame] = None
+        self._lock = threading.Lock()
+
+    @property
+    def fetched_at(self) -> Optional[float]:
+        """The unix time the least recently checked source was checked"""
+        fetched = [source.fetched_at for source in self.sources]
+        return None if None in fetched else min(fetched)
+
+    @property
+    def malformed(self) -> List[Tuple[int, str]]:
+        """The malformed rows of every source"""
+        return [row for source in self.sources for row in source.malformed]
+
+    def get(self) -> pd.DataFrame:
+        """
+        Get the merged seizure df, refreshing each source whose ttl has expired
+
+        Returns
+        -------
+        pd.DataFrame
+            The merged csvs as a dataframe with a datetime index
+        """
+        futures = [self.pool.submit(source.get) for source in self.sources]
+        dfs = []
+        for source, future in zip(self.sources, futures):
+            try:
+                dfs.append(future.result())
+            except Exception:
+                logger.warning(
+                    f"Failed to read {source.url}, leaving it out", exc_info=True
+                )
+                dfs.append(None)
+        if all(df is None for df in dfs):
+            raise OSError(
+                f"None of {[source.url for source in self.sources]} could be read"
+            )
+
+        versions = tuple(
+            source.version if df is not None else None
+            for source, df in zip(self.sources, dfs)
+        )
+        with self._lock:
+            if versions != self._versions:
+                self._df = self._merge([df for df in dfs if df is not None])
+                self._versions = versions
+                self.version = hashlib.sha256(
+                    repr((versions, self.tolerance)).encode()
+                ).hexdigest()
+                self.parsed_version = self.version
+            return self._df
+
+    def _merge(self, dfs: Iterable[pd.DataFrame]) -> pd.DataFrame:
+        streams = [_index_to_ns(df.index) for df in dfs]
+        if len(streams) == 1:
+            return times_to_df(streams[0])
+        times = np.fromiter(
+            merge_events(streams, int(self.tolerance * 10**9)), dtype="int64"
+        )
+        logger.info(
+            f"Merged {sum(map(len, streams))} seizures from {len(streams)} sources into "
+            f"{len(times)}"
+        )
+        return times_to_df(times)
+
+
+_merged: Dict[Tuple[str, ...], MergedSource] = {}
+_merged_lock = threading.Lock()
+
+
+def get_merged_source(df_urls: Sequence[str]) -> MergedSource:
+    """
+    Get the shared MergedSource for several urls, creating it if needed
+
+    Parameters
+    ----------
+    df_urls : Sequence[str]
+        urls (or local paths) for the seizure csvs
+
+    Returns
+    -------
+    MergedSource
+        The merged source, reading each url through get_source
+    """
+    key = tuple(df_urls)
+    with _merged_lock:
+        if key not in _merged:
+            _merged[key] = MergedSource([get_source(url) for url in key])
+        return _merged[key]
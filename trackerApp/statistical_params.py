@@ -4,7 +4,24 @@ import numpy as np
 from datetime import timedelta, datetime
 import pytz
 import time
-from typing import List, Dict, Union
+from typing import List, Dict, Union, NamedTuple, Optional, Tuple
+
+from trackerApp.constants import NS_IN_DAY
+from trackerApp.metrics import timed
+
+
+class Clusters(NamedTuple):
+    """
+    Compact description of the clusters in a sorted series of events
+
+    labels holds the cluster id of every event, the remaining arrays hold one value per cluster.
+    starts and ends are the first and last event of each cluster as epoch nanoseconds.
+    """
+
+    labels: np.ndarray
+    starts: np.ndarray
+    ends: np.ndarray
+    counts: np.ndarray
 
 
 def _remove_outliers(values: pd.Series, num_sd: int = 2) -> pd.Series:
@@ -54,70 +71,136 @@ def most_recent_seizure(df: pd.DataFrame) -> int:
     return time_diff.days
 
 
+def _index_to_ns(index: pd.DatetimeIndex) -> np.ndarray:
+    """
+    Convert a (tz-aware) datetime index into UTC epoch nanoseconds
+
+    Parameters
+    ----------
+    index : pd.DatetimeIndex
+        The index of a df from get_data
+
+    Returns
+    -------
+    np.ndarray
+        An int64 array of epoch nanoseconds
+    """
+    return np.asarray(index.values).astype("datetime64[ns]", copy=False).view("int64")
+
+
+@timed("cluster_events")
+def cluster_events(times: np.ndarray, gap_days: float = 3) -> Clusters:
+    """
+    Group sorted event times into clusters in a single pass
+
+    A new cluster starts wherever the gap to the previous event is more than gap_days.
+
+    Parameters
+    ----------
+    times : np.ndarray
+        Sorted epoch nanoseconds of each seizure
+    gap_days : float, optional
+        The number of days after a seizure that a cluster is considered over, by default 3
+
+    Returns
+    -------
+    Clusters
+        The cluster id of each event, and the start, end and size of each cluster
+    """
+    times = np.asarray(times, dtype="int64")
+    if len(times) == 0:
+        empty = np.empty(0, dtype="int64")
+        return Clusters(empty, empty, empty, empty)
+
+    gap_ns = int(round(gap_days * NS_IN_DAY))
+    new_cluster = np.empty(len(times), dtype=bool)
+    new_cluster[0] = True
+    np.greater(np.diff(times), gap_ns, out=new_cluster[1:])
+
+    labels = np.cumsum(new_cluster, dtype="int64") - 1
+    first = np.flatnonzero(new_cluster)
+    last = np.append(first[1:], len(times)) - 1
+    counts = last - first + 1
+    return Clusters(labels, times[first], times[last], counts)
+
+
 def get_clusters(df: pd.DataFrame, gap_days=3) -> List[pd.DataFrame]:
     """
     Take the seizures csv and group events into clusters
 
+    This wraps cluster_events for callers which want a df per cluster.
+
     Parameters
     ----------
     df : pd.DataFrame
         The google sheets csv data
-    gap : int, optional
-        The number of days after a seizure that a clustered is considered over, by default timedelta(days=2)
+    gap_days : int, optional
+        The number of days after a seizure that a cluster is considered over, by default 3
 
     Returns
     -------
     List[pd.DataFrame]
         A list containing a dataframe for each cluster
     """
-    gap_days = timedelta(gap_days)
-    clusters = []
-    cont = True
-    ii = 0
-    while cont:
-        a = df.index[ii]
-        start = a - gap_days
-        if ii == 0:
-            start = a
-        end = a + gap_days
-        clusters.append(df[start:end])
-        ii += len(df[start:end])
-        if ii >= len(df):
-            cont = False
-    return clusters
+    clusters = cluster_events(_index_to_ns(df.index), gap_days)
+    return _split_clusters(df, clusters.counts)
+
 
+def _split_clusters(df: pd.DataFrame, counts: np.ndarray) -> List[pd.DataFrame]:
+    """
+    Split a sorted df into consecutive clusters of the given sizes
+    """
+    ends = np.cumsum(counts)
+    return [df.iloc[start:end] for start, end in zip(ends - counts, ends)]
 
+
+@timed("get_cluster_info")
 def get_cluster_info(
-    clusters: List[pd.DataFrame],
+    clusters: Union[List[pd.DataFrame], Clusters], tz="UTC"
 ) -> Dict[int, Dict[str, Union[pd.Timestamp, int]]]:
     """
     Get info on each cluster (start, middle, end, size, and length)
 
     Parameters
     ----------
-    clusters : List[pd.DataFrame]
-        A list of df for each cluster event, from get_clusters
+    clusters : Union[List[pd.DataFrame], Clusters]
+        A list of df for each cluster event from get_clusters, or the clusters from cluster_events
+    tz : optional
+        The timezone of the times when clusters is from cluster_events, by default "UTC"
 
     Returns
     -------
     Dict[int, Dict[str, Union[pd.Timestamp, int]]]
         A dictionary containing the start, middle and end time of each cluster, the number of seizures in the cluster, and the length of each cluster
     """
-    cluster_info = {}
-    for cluster in clusters:
-        cluster_info[len(cluster_info)] = {
-            "start": cluster.iloc[0].name,
-            "end": cluster.iloc[-1].name,
-            "number": len(cluster),
-            "width": cluster.iloc[-1].name - cluster.iloc[0].name,
+    if not isinstance(clusters, Clusters):
+        if len(clusters):
+            tz = clusters[0].index.tz
+        # only the first and last time of each cluster is needed
+        bounds = np.array(
+            [_index_to_ns(cluster.index)[[0, -1]] for cluster in clusters],
+            dtype="int64",
+        ).reshape(-1, 2)
+        counts = np.fromiter(map(len, clusters), dtype="int64", count=len(clusters))
+        clusters = Clusters(None, bounds[:, 0].copy(), bounds[:, 1].copy(), counts)
+
+    starts = pd.DatetimeIndex(clusters.starts.view("datetime64[ns]")).tz_localize("UTC")
+    ends = pd.DatetimeIndex(clusters.ends.view("datetime64[ns]")).tz_localize("UTC")
+    if tz is not None:
+        starts, ends = starts.tz_convert(tz), ends.tz_convert(tz)
+    cluster_info = pd.DataFrame(
+        {
+            "start": starts,
+            "end": ends,
+            "number": clusters.counts.astype("int64"),
+            "width": ends - starts,
+            "middle": starts + dt.timedelta(days=0.5),
         }
-    cluster_info = pd.DataFrame.from_dict(cluster_info, orient="index")
-    cluster_info.loc[:, "middle"] = cluster_info.loc[:, "start"] + dt.timedelta(
-        days=0.5
     )
     return cluster_info
 
 
+@timed("get_intervals")
 def get_intervals(
     cluster_info: Dict[int, Dict[str, Union[pd.Timestamp, int]]]
 ) -> pd.DataFrame:
@@ -134,77 +217,166 @@ def get_intervals(
     pd.DataFrame
         The number of days between clusters, and how large the previous cluster was
     """
-    intervals = {}
-    for index, row in cluster_info.iterrows():
-        if index == 0:
-            continue
-        this_interval = (row.start - cluster_info.loc[index - 1].end).days
-        intervals[index] = {
-            "interval_days": this_interval,
-            "prev_cluster_size": cluster_info.loc[index - 1].number,
-        }
-    intervals = pd.DataFrame.from_dict(intervals, orient="index")
+    starts = _index_to_ns(pd.DatetimeIndex(cluster_info["start"]))
+    ends = _index_to_ns(pd.DatetimeIndex(cluster_info["end"]))
+    intervals = pd.DataFrame(
+        {
+            # floor division, matching Timedelta.days
+            "interval_days": (starts[1:] - ends[:-1]) // NS_IN_DAY,
+            "prev_cluster_size": cluster_info["number"].to_numpy()[:-1],
+        },
+        index=cluster_info.index[1:],
+    )
     return intervals
 
 
-def likelihood_of_seizure(days_since: int, intervals: pd.DataFrame) -> List[int]:
+class LikelihoodModel:
     """
-    Find likelihood of a seizure and when this will next change
+    The empirical distribution of intervals between clusters, for fast likelihood queries
 
-    compare days since and the histogram to find the likelihood of a seizure occuring within the next 48 hours.
+    Build once per version of the data. The intervals are outlier filtered and sorted, and the likelihood
+    for every possible number of intervals below a day is tabulated, so each query is a searchsorted.
+    Likelihoods are numeric percentages; format_likelihood gives the wording used by the dashboard.
+    """
+
+    @timed("likelihood_model")
+    def __init__(self, intervals: Union[pd.DataFrame, np.ndarray], num_sd: int = 2):
+        """
+        Parameters
+        ----------
+        intervals : Union[pd.DataFrame, np.ndarray]
+            Interval info from get_intervals, or just the interval days
+        num_sd : int, optional
+            The number of standard deviations from the median to keep, by default 2
+        """
+        if isinstance(intervals, pd.DataFrame):
+            intervals = intervals.get("interval_days", [])
+        interval_days = np.sort(np.asarray(intervals, "int64"))
+        if len(interval_days):
+            interval_days = _remove_outliers(interval_days, num_sd=num_sd)
+        self.interval_days = interval_days
+        n_intervals = max(len(interval_days), 1)
+        # the percentage of intervals at or below a day, indexed by how many intervals that is
+        self._table = (np.arange(n_intervals + 1) / n_intervals * 100).astype("int64")
+
+    def likelihood(self, days_since: float) -> int:
+        """
+        Get the likelihood of a seizure, as a percentage
+
+        Parameters
+        ----------
+        days_since : float
+            The number of days since a seizure
+
+        Returns
+        -------
+        int
+            The percentage of intervals no longer than days_since
+        """
+        return int(
+            self._table[np.searchsorted(self.interval_days, days_since, "right")]
+        )
+
+    def next_change(self, days_since: float) -> Optional[int]:
+        """
+        Find the next day after days_since on which the likelihood changes
+
+        Parameters
+        ----------
+        days_since : float
+            The number of days since a seizure
+
+        Returns
+        -------
+        Optional[int]
+            The day the likelihood next changes, or None if it won't change
+        """
+        index = np.searchsorted(self.interval_days, days_since, "right")
+        if index == len(self.interval_days):
+            return None
+        return int(self.interval_days[index])
+
+    def curve(self, days: np.ndarray) -> np.ndarray:
+        """
+        Get the likelihood for many days at once, e.g. to plot it
+
+        Parameters
+        ----------
+        days : np.ndarray
+            Numbers of days since a seizure
+
+        Returns
+        -------
+        np.ndarray
+            The likelihood as a percentage for each day
+        """
+        return self._table[np.searchsorted(self.interval_days, days, "right")]
+
+    def predict(
+        self, days_since: int
+    ) -> Tuple[Union[int, str], Union[int, str], Union[int, str]]:
+        """
+        Find the formatted likelihood of a seizure and when and how it will next change
+
+        Parameters
+        ----------
+        days_since : int
+            Number of days since a seizure
+
+        Returns
+        -------
+        Tuple[Union[int, str], Union[int, str], Union[int, str]]
+            Likelihood of seizure, how many days till it will update, and what it will update to
+        """
+        likelihood = format_likelihood(self.likelihood(days_since))
+        next_interval = self.next_change(days_since)
+        if next_interval is None:
+            return likelihood, "N/A", "N/A"
+        next_likelihood = format_likelihood(self.likelihood(next_interval))
+        return likelihood, next_interval - days_since, next_likelihood
+
+
+def format_likelihood(likelihood: int) -> Union[int, str]:
+    """
+    Describe a likelihood of 0% as low and 100% as very high
 
     Parameters
     ----------
-    days_since : int
-        Number of days since a seizure
-    intervals : pd.DataFrame
-        Interval info
+    likelihood : int
+        The likelihood as a percentage
 
     Returns
     -------
-    List[int]
-        Likelihood of seizure as a %, and how many days till it will update.
+    Union[int, str]
+        The likelihood, or a description of it
     """
-    interval_list = intervals.interval_days.sort_values()
-    interval_list = _remove_outliers(interval_list, num_sd=2)
-
-    likelihood = _get_likelihood(interval_list, days_since)
-
-    next_interval = interval_list[interval_list > days_since]
-    if next_interval.empty:
-        next_updates = "N/A"
-        next_likelihood = "N/A"
-    else:
-        next_interval = next_interval.iloc[0]
-        next_updates = next_interval - days_since
-        next_likelihood = _get_likelihood(interval_list, next_interval)
-
-    return likelihood, next_updates, next_likelihood
+    if likelihood == 0:
+        return "low"
+    elif likelihood == 100:
+        return "very high"
+    return likelihood
 
 
-def _get_likelihood(interval_list: pd.Series, days_since: int) -> int:
+def likelihood_of_seizure(days_since: int, intervals: pd.DataFrame) -> List[int]:
     """
-    Given a list of intervals and days since, get a the likelihood
+    Find likelihood of a seizure and when this will next change
+
+    compare days since and the histogram to find the likelihood of a seizure occuring within the next 48 hours.
+    When making several queries for the same data, build a LikelihoodModel once instead.
 
     Parameters
     ----------
-    interval_list : pd.Series
-        A list of intervals
     days_since : int
-        The number of days since a seizure
+        Number of days since a seizure
+    intervals : pd.DataFrame
+        Interval info
 
     Returns
     -------
-    int
-        The likelihood as a percentage
+    List[int]
+        Likelihood of seizure as a %, and how many days till it will update.
     """
-    intervals_lower = interval_list[interval_list <= days_since]
-    likelihood = int(len(intervals_lower) / len(interval_list) * 100)
-    if likelihood == 0:
-        return "low"
-    elif likelihood == 100:
-        return "very high"
-    return likelihood
+    return LikelihoodModel(intervals).predict(days_since)
 
 
 def estimate_cluster_size(cluster_info, days_since) -> str:
@@ -0,0 +1,207 @@
+"""
+A local on-disk copy of the seizure history which opens without parsing any text
+
+The file is a fixed size header followed by the sorted seizure times as little-endian int64 epoch
+nanoseconds, so it can be opened with numpy.memmap. The header is the magic bytes then a json object
+with the number of seizures and the metadata given to write_store.
+
+Processes sharing a store coordinate with store_lock, and the store's modification time is when its
+source was last checked, so a process can tell another has refreshed it recently.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, Iterator, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    # without fcntl, e.g. on Windows, processes don't coordinate and each refreshes the store
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+from trackerApp.constants import STORE_DIR
+
+MAGIC = b"SZTRACK1"
+HEADER_SIZE = 512
+
+
+def default_store_path(df_url: str) -> str:
+    """
+    Get the default store path for a url
+
+    Parameters
+    ----------
+    df_url : str
+        url for the seizure csv
+
+    Returns
+    -------
+    str
+        A path in STORE_DIR
+    """
+    name = hashlib.sha256(df_url.encode()).hexdigest()[:16]
+    return os.path.join(STORE_DIR, f"{name}.i8")
+
+
+def write_store(path: str, times: np.ndarray, **metadata: Any):
+    """
+    Write the seizure times to path, replacing any existing store atomically
+
+    Parameters
+    ----------
+    path : str
+        Where to write the store
+    times : np.ndarray
+        Sorted epoch nanoseconds of each seizure
+    **metadata : Any
+        json serialisable values to keep in the header
+    """
+    times = np.ascontiguousarray(times, dtype="<i8")
+    header = json.dumps({**metadata, "count": len(times)}).encode()
+    if len(header) > HEADER_SIZE - len(MAGIC):
+        raise ValueError(f"Store metadata is too large: {metadata}")
+    header = MAGIC + header.ljust(HEADER_SIZE - len(MAGIC), b" ")
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            f.write(times.tobytes())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def read_header(path: str) -> Dict[str, Any]:
+    """
+    Read the metadata from a store
+
+    Parameters
+    ----------
+    path : str
+        The store to read
+
+    Returns
+    -------
+    Dict[str, Any]
+        The metadata, including the number of seizures as count
+    """
+    with open(path, "rb") as f:
+        header = f.read(HEADER_SIZE)
+    if len(header) != HEADER_SIZE or not header.startswith(MAGIC):
+        raise ValueError(f"{path} is not a seizure store")
+    return json.loads(header[len(MAGIC) :])
+
+
+def open_store(path: str) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """
+    Map the seizure times in a store read-only, without reading them into memory
+
+    Parameters
+    ----------
+    path : str
+        The store to open
+
+    Returns
+    -------
+    Tuple[np.ndarray, Dict[str, Any]]
+        The epoch nanoseconds of each seizure, and the store metadata
+    """
+    metadata = read_header(path)
+    count = metadata["count"]
+    if count == 0:
+        return np.empty(0, dtype="<i8"), metadata
+    times = np.memmap(path, dtype="<i8", mode="r", offset=HEADER_SIZE, shape=(count,))
+    return times, metadata
+
+
+@contextlib.contextmanager
+def store_lock(path: str, blocking: bool = True) -> Iterator[bool]:
+    """
+    Hold an exclusive lock on a store, shared by every process using it
+
+    Parameters
+    ----------
+    path : str
+        The store to lock
+    blocking : bool, optional
+        Wait for the lock if another process holds it, by default True
+
+    Yields
+    ------
+    Iterator[bool]
+        Whether the lock was acquired, which is always True when blocking
+    """
+    if fcntl is None:
+        yield True
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".lock", "a+b") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def store_age(path: str) -> float:
+    """
+    Get the seconds since the store was written or marked as checked with touch_store
+
+    Parameters
+    ----------
+    path : str
+        The store
+
+    Returns
+    -------
+    float
+        The age of the store in seconds
+    """
+    return max(time.time() - os.path.getmtime(path), 0)
+
+
+def touch_store(path: str):
+    """
+    Mark the store as checked against its source now, without rewriting it
+
+    Parameters
+    ----------
+    path : str
+        The store
+    """
+    os.utime(path)
+
+
+def times_to_df(times: np.ndarray) -> pd.DataFrame:
+    """
+    Make a df like get_data's from seizure times
+
+    Parameters
+    ----------
+    times : np.ndarray
+        Sorted epoch nanoseconds of each seizure
+
+    Returns
+    -------
+    pd.DataFrame
+        A df with a utc datetime index
+    """
+    index = pd.DatetimeIndex(
+        np.asarray(times, dtype="int64").view("datetime64[ns]"), name="Seizure"
+    ).tz_localize("UTC")
+    return pd.DataFrame(index=index)
@@ -0,0 +1,413 @@
+"""
+A constant memory pipeline for histories too long to hold at once, such as event logs from EEG
+
+The csv is read a block at a time and each block's timestamps parsed, clusters are found in each block
+carrying only the start, end and size of the open cluster into the next, and the cluster info and
+intervals are emitted as soon as each cluster closes. The summary keeps a histogram of the interval
+days, so its likelihood matches LikelihoodModel without keeping the intervals. Only the blocks being
+worked on are held, so peak memory depends on the block size rather than the length of the history.
+The results match the in-memory pipeline for a csv sorted by time.
+
+Run ``python -m trackerApp.streaming history.csv --clusters clusters.csv --intervals intervals.csv`` to
+write the clusters and intervals of a csv and print its summary.
+"""
+
+import argparse
+import sys
+import urllib.request
+from typing import IO, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from trackerApp.constants import NS_IN_DAY
+from trackerApp.statistical_params import (
+    Clusters,
+    cluster_events,
+    estimate_cluster_size,
+    get_cluster_info,
+    most_recent_seizure,
+)
+from trackerApp.store import times_to_df
+from trackerApp.timestamps import ParsedTimes, parse_timestamps
+
+# bytes of csv read at a time, about 100,000 rows of the published sheet
+CHUNK_BYTES = 2 * 2**20
+
+
+class Chunk(NamedTuple):
+    """The sorted epoch nanoseconds parsed from a block of the csv, with its malformed rows"""
+
+    times: np.ndarray
+    malformed: List[Tuple[int, str]]
+
+
+def _open(df_url: str) -> IO[bytes]:
+    if df_url.startswith(("http://", "https://")):
+        return urllib.request.urlopen(df_url, timeout=30)
+    return open(df_url, "rb")
+
+
+def read_chunks(df_url: str, chunk_bytes: int = CHUNK_BYTES) -> Iterator[Chunk]:
+    """
+    Read and parse a csv a block of whole lines at a time
+
+    The timestamp format is detected from the first block and used for the rest.
+
+    Parameters
+    ----------
+    df_url : str
+        url (or local path) for the seizure csv
+    chunk_bytes : int, optional
+        The bytes to read at a time, by default CHUNK_BYTES
+
+    Yields
+    ------
+    Iterator[Chunk]
+        The times of each block, which run on from the previous block's
+
+    Raises
+    ------
+    ValueError
+        If the csv isn't sorted by time, as clusters can't be found a block at a time otherwise
+    """
+    fmt, first_line, last_time = None, 1, None
+    remainder = b""
+    with _open(df_url) as f:
+        while True:
+            block = f.read(chunk_bytes)
+            if block:
+                block = remainder + block
+                end = block.rfind(b"\n") + 1
+                block, remainder = block[:end], block[end:]
+            else:
+                block, remainder = remainder, b""
+            if not block:
+                if remainder:
+                    continue
+                return
+            try:
+                parsed = parse_timestamps(block, fmt, first_line=first_line, sort=False)
+            except ValueError:
+                # none of the block's rows are timestamps
+                lines = enumerate(block.splitlines(), first_line)
+                malformed = [
+                    (n, line.decode("utf-8", "replace"))
+                    for n, line in lines
+                    if line.strip()
+                ]
+                parsed = ParsedTimes(np.empty(0, dtype="int64"), fmt, malformed)
+            fmt = fmt or parsed.format
+            first_line += block.count(b"\n")
+            times = parsed.times
+            if len(times):
+                # checked against the previous block's last time and within the block, so whether a
+                # csv is accepted doesn't depend on where the blocks split
+                if (last_time is not None and times[0] < last_time) or (
+                    np.diff(times) < 0
+                ).any():
+                    raise ValueError(
+                        f"{df_url} isn't sorted by time before line {first_line}"
+                    )
+                last_time = times[-1]
+            yield Chunk(times, parsed.malformed)
+
+
+def stream_clusters(
+    chunks: Iterable[np.ndarray], gap_days: float = 3
+) -> Iterator[Clusters]:
+    """
+    Find the clusters in sorted blocks of times, emitting each cluster once it has closed
+
+    Parameters
+    ----------
+    chunks : Iterable[np.ndarray]
+        Sorted epoch nanoseconds of each seizure, a block at a time
+    gap_days : float, optional
+        The number of days after a seizure that a cluster is considered over, by default 3
+
+    Yields
+    ------
+    Iterator[Clusters]
+        The clusters closed by each block, without labels, the last being emitted once the blocks end
+    """
+    gap_ns = int(round(gap_days * NS_IN_DAY))
+    # the start, end and size of the cluster the last block ended in
+    open_cluster: Optional[Tuple[int, int, int]] = None
+    for times in chunks:
+        if not len(times):
+            continue
+        clusters = cluster_events(times, gap_days)
+        starts, ends, counts = clusters.starts, clusters.ends, clusters.counts
+        if open_cluster is not None:
+            start, end, count = open_cluster
+            if times[0] - end > gap_ns:
+                starts = np.concatenate([[start], starts])
+                ends = np.concatenate([[end], ends])
+                counts = np.concatenate([[count], counts])
+            else:
+                starts[0] = start
+                counts[0] += count
+        open_cluster = (int(starts[-1]), int(ends[-1]), int(counts[-1]))
+        if len(starts) > 1:
+            yield Clusters(None, starts[:-1], ends[:-1], counts[:-1])
+    if open_cluster is not None:
+        start, end, count = open_cluster
+        yield Clusters(
+            None,
+            np.array([start], dtype="int64"),
+            np.array([end], dtype="int64"),
+            np.array([count], dtype="int64"),
+        )
+
+
+def stream_cluster_info(
+    clusters: Iterable[Clusters], tz="UTC"
+) -> Iterator[pd.DataFrame]:
+    """
+    Get the info of each block of clusters, numbered on from the previous block
+
+    Parameters
+    ----------
+    clusters : Iterable[Clusters]
+        Blocks of clusters from stream_clusters
+    tz : optional
+        The timezone to give the times in, by default "UTC"
+
+    Yields
+    ------
+    Iterator[pd.DataFrame]
+        The cluster info of each block, as get_cluster_info gives for all the clusters
+    """
+    first = 0
+    for block in clusters:
+        info = get_cluster_info(block, tz=tz)
+        info.index += first
+        first += len(info)
+        yield info
+
+
+def stream_intervals(cluster_info: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    """
+    Get the intervals between clusters a block at a time, carrying the last cluster between blocks
+
+    Parameters
+    ----------
+    cluster_info : Iterable[pd.DataFrame]
+        Blocks of cluster info from stream_cluster_info
+
+    Yields
+    ------
+    Iterator[pd.DataFrame]
+        The intervals before each block's clusters, as get_intervals gives for all the clusters
+    """
+    previous: Optional[Tuple[int, int]] = None
+    for info in cluster_info:
+        if not len(info):
+            continue
+        starts = info["start"].dt.tz_convert("UTC").values.view("int64")
+        ends = info["end"].dt.tz_convert("UTC").values.view("int64")
+        numbers = info["number"].to_numpy()
+        index = info.index
+        if previous is not None:
+            ends = np.concatenate([[previous[0]], ends])
+            numbers = np.concatenate([[previous[1]], numbers])
+        else:
+            starts, index = starts[1:], index[1:]
+        previous = (int(ends[-1]), int(numbers[-1]))
+        yield pd.DataFrame(
+            {
+                # floor division, matching Timedelta.days
+                "interval_days": (starts - ends[:-1]) // NS_IN_DAY,
+                "prev_cluster_size": numbers[:-1],
+            },
+            index=index,
+        )
+
+
+class StreamSummary:
+    """
+    The totals of a streamed history, and the likelihood of a seizure from its intervals
+
+    Intervals are counted in a histogram of days, so memory depends on the longest interval rather than
+    the number of them, and the likelihood matches a LikelihoodModel of every interval.
+    """
+
+    def __init__(self, num_sd: int = 2):
+        """
+        Parameters
+        ----------
+        num_sd : int, optional
+            The number of standard deviations from the median to keep, by default 2
+        """
+        self.num_sd = num_sd
+        self.seizures = 0
+        self.clusters = 0
+        self.first: Optional[int] = None
+        self.last: Optional[int] = None
+        # the sizes of the last two clusters, for estimate_cluster_size
+        self.last_sizes: List[int] = []
+        self.interval_counts = np.zeros(0, dtype="int64")
+        self.malformed = 0
+
+    def add_clusters(self, info: pd.DataFrame):
+        """Count a block of cluster info from stream_cluster_info"""
+        if not len(info):
+            return
+        self.clusters += len(info)
+        self.seizures += int(info["number"].sum())
+        if self.first is None:
+            self.first = pd.Timestamp(info["start"].iloc[0]).value
+        self.last = pd.Timestamp(info["end"].iloc[-1]).value
+        self.last_sizes = (self.last_sizes + info["number"].tolist()[-2:])[-2:]
+
+    def add_intervals(self, intervals: pd.DataFrame):
+        """Count a block of intervals from stream_intervals"""
+        days = intervals["interval_days"].to_numpy()
+        if not len(days):
+            return
+        counts = np.bincount(days, minlength=len(self.interval_counts))
+        if len(counts) > len(self.interval_counts):
+            self.interval_counts = np.concatenate(
+                [
+                    self.interval_counts,
+                    np.zeros(len(counts) - len(self.interval_counts), dtype="int64"),
+                ]
+            )
+        self.interval_counts += counts
+
+    def _kept_counts(self) -> np.ndarray:
+        """The interval histogram without outliers, as _remove_outliers finds them"""
+        counts = self.interval_counts
+        n = counts.sum()
+        if not n:
+            return counts
+        values = np.arange(len(counts))
+        mean = (values * counts).sum() / n
+        sd = np.sqrt((counts * (values - mean) ** 2).sum() / n)
+        cumulative = np.cumsum(counts)
+        lower_middle = np.searchsorted(cumulative, (n - 1) // 2, "right")
+        upper_middle = np.searchsorted(cumulative, n // 2, "right")
+        median = (lower_middle + upper_middle) / 2
+        lower_bound = max(median - self.num_sd * sd, 0)
+        upper_bound = median + self.num_sd * sd
+        return np.where((values >= lower_bound) & (values <= upper_bound), counts, 0)
+
+    def likelihood(self, days_since: float) -> int:
+        """
+        Get the likelihood of a seizure, as a percentage, as LikelihoodModel.likelihood does
+
+        Parameters
+        ----------
+        days_since : float
+            The number of days since a seizure
+
+        Returns
+        -------
+        int
+            The percentage of intervals no longer than days_since
+        """
+        kept = self._kept_counts()
+        n_kept = max(int(kept.sum()), 1)
+        below = int(kept[: max(int(np.floor(days_since)) + 1, 0)].sum())
+        return int(np.int64(below / n_kept * 100))
+
+    def days_since(self) -> int:
+        """The number of days since the last seizure"""
+        return most_recent_seizure(times_to_df(np.array([self.last], dtype="int64")))
+
+    def next_cluster_size(self) -> str:
+        """The estimate of the next cluster's size, as the dashboard gives it"""
+        return estimate_cluster_size(
+            pd.DataFrame({"number": self.last_sizes}), self.days_since()
+        )
+
+
+def run(
+    df_url: str,
+    gap_days: float = 3,
+    chunk_bytes: int = CHUNK_BYTES,
+    clusters_out: Optional[IO[str]] = None,
+    intervals_out: Optional[IO[str]] = None,
+) -> StreamSummary:
+    """
+    Stream a csv through the pipeline, writing the clusters and intervals as they are found
+
+    Parameters
+    ----------
+    df_url : str
+        url (or local path) for the seizure csv, sorted by time
+    gap_days : float, optional
+        The number of days after a seizure that a cluster is considered over, by default 3
+    chunk_bytes : int, optional
+        The bytes of csv to read at a time, by default CHUNK_BYTES
+    clusters_out : Optional[IO[str]], optional
+        Where to write the cluster info as csv, by default it isn't written
+    intervals_out : Optional[IO[str]], optional
+        Where to write the intervals as csv, by default they aren't written
+
+    Returns
+    -------
+    StreamSummary
+        The summary of the whole csv
+    """
+    summary = StreamSummary()
+
+    def times() -> Iterator[np.ndarray]:
+        for chunk in read_chunks(df_url, chunk_bytes):
+            summary.malformed += len(chunk.malformed)
+            yield chunk.times
+
+    def cluster_info() -> Iterator[pd.DataFrame]:
+        header = True
+        for info in stream_cluster_info(stream_clusters(times(), gap_days)):
+            summary.add_clusters(info)
+            if clusters_out is not None:
+                info.to_csv(clusters_out, header=header)
+                header = False
+            yield info
+
+    header = True
+    for intervals in stream_intervals(cluster_info()):
+        summary.add_intervals(intervals)
+        if intervals_out is not None:
+            intervals.to_csv(intervals_out, header=header)
+            header = False
+    return summary
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Find the clusters and intervals of a long seizure csv in constant memory"
+    )
+    parser.add_argument("csv", help="url or path of a csv sorted by time")
+    parser.add_argument("--gap-days", type=float, default=3)
+    parser.add_argument("--chunk-bytes", type=int, default=CHUNK_BYTES)
+    parser.add_argument("--clusters", help="where to write the cluster info")
+    parser.add_argument("--intervals", help="where to write the intervals")
+    args = parser.parse_args(argv)
+
+    outputs = [
+        open(path, "w", newline="") if path else None
+        for path in (args.clusters, args.intervals)
+    ]
+    try:
+        summary = run(args.csv, args.gap_days, args.chunk_bytes, *outputs)
+    finally:
+        for output in outputs:
+            if output is not None:
+                output.close()
+    if summary.last is None:
+        print(f"No seizures in {args.csv}")
+        return 1
+    days_since = summary.days_since()
+    print(f"{summary.seizures} seizures in {summary.clusters} clusters")
+    print(f"{summary.malformed} malformed rows")
+    print(f"The last seizure was {days_since} days ago")
+    print(f"Likelihood of a seizure: {summary.likelihood(days_since)}%")
+    print(summary.next_cluster_size())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+import threading
+from typing import Dict, List, Union
+
+from trackerApp.constants import SUBJECTS
+from trackerApp.inout import DataSource, get_source
+from trackerApp.sources import MergedSource, get_merged_source
+
+_registry: Dict[str, Union[str, List[str]]] = dict(SUBJECTS)
+_registry_lock = threading.Lock()
+
+
+def register_subject(subject_id: str, df_url: Union[str, List[str]]):
+    """
+    Add a subject, or change the sheet of an existing one
+
+    Parameters
+    ----------
+    subject_id : str
+        The id used in urls for this subject
+    df_url : Union[str, List[str]]
+        url for the subject's seizure csv, or a list of csvs to merge
+    """
+    with _registry_lock:
+        _registry[subject_id] = df_url
+
+
+def subject_ids() -> List[str]:
+    """
+    Get the ids of every registered subject, the first being the default
+
+    Returns
+    -------
+    List[str]
+        The subject ids
+    """
+    with _registry_lock:
+        return list(_registry)
+
+
+def get_subject_url(subject_id: str) -> Union[str, List[str]]:
+    """
+    Get the seizure csv url for a subject
+
+    Parameters
+    ----------
+    subject_id : str
+        The subject's id
+
+    Returns
+    -------
+    Union[str, List[str]]
+        url for the seizure csv, or a list of csvs to merge
+
+    Raises
+    ------
+    KeyError
+        If the subject is not registered
+    """
+    with _registry_lock:
+        return _registry[subject_id]
+
+
+def get_subject_source(subject_id: str) -> Union[DataSource, MergedSource]:
+    """
+    Get the source of a subject's seizures, merging them if they're logged in several csvs
+
+    Parameters
+    ----------
+    subject_id : str
+        The subject's id
+
+    Returns
+    -------
+    Union[DataSource, MergedSource]
+        The shared source for the subject's csv or csvs
+
+    Raises
+    ------
+    KeyError
+        If the subject is not registered
+    """
+    df_url = get_subject_url(subject_id)
+    if isinstance(df_url, str):
+        return get_source(df_url)
+    return get_merged_source(df_url)
+
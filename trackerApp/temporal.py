@@ -0,0 +1,86 @@
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+from trackerApp.constants import DISPLAY_TZ, TEMPORAL_CUT_OFF
+from trackerApp.statistical_params import _index_to_ns
+
+HOURS_IN_DAY = 24
+DAYS_IN_WEEK = 7
+
+
+class TemporalPatterns:
+    """
+    Counts of seizures by hour of the day and day of the week, in a local timezone
+
+    The counts are kept as 168 bins, weekday * 24 + hour, so adding seizures is a single bincount and the
+    figures only need the bins rather than every seizure. Seizures before cut_off aren't counted.
+    """
+
+    def __init__(
+        self,
+        tz: str = DISPLAY_TZ,
+        cut_off: Union[str, pd.Timestamp] = TEMPORAL_CUT_OFF,
+    ):
+        """
+        Parameters
+        ----------
+        tz : str, optional
+            The timezone to find hours and weekdays in, by default DISPLAY_TZ
+        cut_off : Union[str, pd.Timestamp], optional
+            Only count seizures from this time, UTC if no timezone is given, by default TEMPORAL_CUT_OFF
+        """
+        self.tz = tz
+        cut_off = pd.Timestamp(cut_off)
+        if cut_off.tz is None:
+            cut_off = cut_off.tz_localize("UTC")
+        self.cut_off = cut_off
+        self.counts = np.zeros(DAYS_IN_WEEK * HOURS_IN_DAY, dtype="int64")
+
+    def add(self, times: np.ndarray):
+        """
+        Count more seizures
+
+        Parameters
+        ----------
+        times : np.ndarray
+            Epoch nanoseconds of the new seizures
+        """
+        times = np.asarray(times, dtype="int64")
+        times = times[times >= self.cut_off.value]
+        local = pd.DatetimeIndex(times.view("datetime64[ns]"))
+        local = local.tz_localize("UTC").tz_convert(self.tz)
+        bins = local.dayofweek.to_numpy() * HOURS_IN_DAY + local.hour.to_numpy()
+        self.counts += np.bincount(bins, minlength=len(self.counts))
+
+    @property
+    def weekday_hour(self) -> np.ndarray:
+        """The number of seizures in each hour of each day of the week, Monday first"""
+        return self.counts.reshape(DAYS_IN_WEEK, HOURS_IN_DAY)
+
+    @property
+    def hours(self) -> np.ndarray:
+        """The number of seizures in each hour of the day"""
+        return self.weekday_hour.sum(axis=0)
+
+    @classmethod
+    def from_df(cls, df: pd.DataFrame, **kwargs) -> "TemporalPatterns":
+        """
+        Count the seizures in a df
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            The seizure df from get_data
+        **kwargs
+            tz and cut_off, passed to TemporalPatterns
+
+        Returns
+        -------
+        TemporalPatterns
+            The counts for every seizure in df
+        """
+        patterns = cls(**kwargs)
+        patterns.add(_index_to_ns(df.index))
+        return patterns
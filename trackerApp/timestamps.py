@@ -0,0 +1,260 @@
+"""
+Strict parsing of the seizure csv's timestamps into sorted epoch nanoseconds
+
+The format is detected from a sample of the rows, then every row is parsed with it. When every row has
+the same width, as the published sheet's zero padded timestamps do, the digits are read straight out of
+the bytes with numpy rather than parsed row by row. Rows which don't match the format are reported
+rather than failing the whole parse.
+"""
+
+import datetime as dt
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from trackerApp.constants import NS_IN_DAY
+from trackerApp.metrics import timed
+
+# tried in order, so month first dates win when a sample is ambiguous, as pd.to_datetime does
+FORMATS = (
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%m/%d/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M:%S",
+    "%m/%d/%Y %H:%M",
+    "%d/%m/%Y %H:%M",
+)
+# the rows from each end of the csv used to detect the format
+SAMPLE_ROWS = 50
+_WIDTHS = {"Y": 4, "m": 2, "d": 2, "H": 2, "M": 2, "S": 2}
+_DAYS_IN_MONTH = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+
+class ParsedTimes(NamedTuple):
+    """
+    The timestamps parsed from a csv
+
+    malformed lists the line number, counting from 1, and text of each row which couldn't be parsed.
+    format is None when no format matched and pandas inferred one for each row.
+    """
+
+    times: np.ndarray
+    format: Optional[str]
+    malformed: List[Tuple[int, str]]
+
+
+def _layout(fmt: str) -> Optional[Tuple[Dict[str, int], Dict[int, int]]]:
+    """
+    Find where each field and separator is in a fixed width format
+
+    Returns the start of each field and the byte of each separator keyed by position, or None if the
+    format isn't fixed width.
+    """
+    fields, separators = {}, {}
+    position, i = 0, 0
+    while i < len(fmt):
+        if fmt[i] == "%":
+            directive = fmt[i + 1 : i + 2]
+            if directive not in _WIDTHS:
+                return None
+            fields[directive] = position
+            position += _WIDTHS[directive]
+            i += 2
+        else:
+            separators[position] = ord(fmt[i])
+            position += 1
+            i += 1
+    return fields, separators
+
+
+def _parse_fixed_width(rows: np.ndarray, fmt: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Read the digits of fixed width rows
+
+    Parameters
+    ----------
+    rows : np.ndarray
+        A uint8 array with a row of bytes per timestamp, as wide as fmt
+    fmt : str
+        The format of every row, from FORMATS
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        The epoch nanoseconds of each row, and whether each row was valid
+    """
+    fields, separators = _layout(fmt)
+    # bytes below "0" wrap around, so anything but a digit is above 9
+    digits = rows - np.uint8(ord("0"))
+    digit_columns = [
+        column for column in range(rows.shape[1]) if column not in separators
+    ]
+    valid = np.ones(len(rows), dtype="bool")
+    for column in digit_columns:
+        valid &= digits[:, column] <= 9
+    for column, byte in separators.items():
+        valid &= rows[:, column] == byte
+
+    # int32 is plenty for each field, and halves the memory of int64
+    def field(name: str) -> np.ndarray:
+        value = np.zeros(len(rows), dtype="int32")
+        if name not in fields:
+            return value
+        start = fields[name]
+        for column in range(start, start + _WIDTHS[name]):
+            value = value * 10 + digits[:, column]
+        return value
+
+    year, month, day = field("Y"), field("m"), field("d")
+    hour, minute, second = field("H"), field("M"), field("S")
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    month_ok = (month >= 1) & (month <= 12)
+    days_in_month = _DAYS_IN_MONTH[np.where(month_ok, month, 0)] + (leap & (month == 2))
+    valid &= month_ok & (day >= 1) & (day <= days_in_month)
+    valid &= (hour < 24) & (minute < 60) & (second < 60)
+
+    # days since the epoch from the civil date, shifting the year to start in March
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * ((month + 9) % 12) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    days = era * 146097 + day_of_era - 719468
+    seconds = (hour * 60 + minute) * 60 + second
+    return days.astype("int64") * NS_IN_DAY + seconds.astype("int64") * 10**9, valid
+
+
+def _fixed_width_rows(content: bytes) -> Optional[np.ndarray]:
+    """
+    View content as a uint8 array with a row per line, without the line endings
+
+    Returns None unless every line, including the last, has the same width.
+    """
+    if not content.endswith(b"\n"):
+        content += b"\n"
+    width = content.find(b"\n") + 1
+    if width < 2 or len(content) % width:
+        return None
+    rows = np.frombuffer(content, dtype="uint8").reshape(-1, width)
+    if not (rows[:, -1] == ord("\n")).all():
+        return None
+    if (rows[:, -2] == ord("\r")).all():
+        return rows[:, :-2]
+    return rows[:, :-1]
+
+
+def _split_rows(content: bytes) -> Tuple[List[int], List[str]]:
+    """The line number and first column of each non-empty line"""
+    numbers, texts = [], []
+    for number, line in enumerate(content.splitlines(), 1):
+        text = line.split(b",", 1)[0].strip().decode("utf-8", "replace")
+        if text:
+            numbers.append(number)
+            texts.append(text)
+    return numbers, texts
+
+
+def detect_format(texts: List[str]) -> Optional[str]:
+    """
+    Find the format of a sample of timestamps
+
+    Parameters
+    ----------
+    texts : List[str]
+        Sample timestamps
+
+    Returns
+    -------
+    Optional[str]
+        The first of FORMATS which parses the most of the sample, or None if none parse at least half
+    """
+    best, best_parsed = None, 0
+    for fmt in FORMATS:
+        parsed = 0
+        for text in texts:
+            try:
+                dt.datetime.strptime(text, fmt)
+                parsed += 1
+            except ValueError:
+                pass
+        if parsed > best_parsed:
+            best, best_parsed = fmt, parsed
+        if parsed == len(texts):
+            break
+    return best if best_parsed * 2 >= len(texts) and best_parsed else None
+
+
+def _sample(content: bytes) -> List[str]:
+    """The first column of rows from the start and end of content"""
+    lines = content[: 64 * SAMPLE_ROWS].splitlines()[:SAMPLE_ROWS]
+    if len(content) > 64 * SAMPLE_ROWS:
+        # skipping the first line of the end, which may be cut short
+        lines += content[-64 * SAMPLE_ROWS :].splitlines()[1:][-SAMPLE_ROWS:]
+    texts = [
+        line.split(b",", 1)[0].strip().decode("utf-8", "replace") for line in lines
+    ]
+    return [text for text in texts if text]
+
+
+@timed("parse_csv")
+def parse_timestamps(
+    content: bytes, fmt: Optional[str] = None, first_line: int = 1, sort: bool = True
+) -> ParsedTimes:
+    """
+    Parse the timestamps in the first column of a csv into sorted UTC epoch nanoseconds
+
+    Parameters
+    ----------
+    content : bytes
+        The raw csv, without a header
+    fmt : Optional[str], optional
+        The format of the timestamps, by default it is detected from a sample of the rows
+    first_line : int, optional
+        The line number of the first line of content, for reporting malformed rows, by default 1
+    sort : bool, optional
+        Sort the times, by default True, otherwise they are in the order of the rows
+
+    Returns
+    -------
+    ParsedTimes
+        The times, the format used, and any malformed rows
+
+    Raises
+    ------
+    ValueError
+        If content has rows but none of them could be parsed
+    """
+    if fmt is None:
+        fmt = detect_format(_sample(content))
+
+    rows = _fixed_width_rows(content) if fmt is not None else None
+    if (
+        rows is not None
+        and _layout(fmt) is not None
+        and rows.shape[1] == len(dt.datetime(2000, 1, 1).strftime(fmt))
+    ):
+        times, valid = _parse_fixed_width(rows, fmt)
+        malformed = [
+            (int(row) + first_line, bytes(rows[row]).decode("utf-8", "replace"))
+            for row in np.flatnonzero(~valid)
+        ]
+        times = times[valid]
+    else:
+        numbers, texts = _split_rows(content)
+        parsed = pd.to_datetime(
+            pd.Series(texts, dtype="object"), format=fmt, errors="coerce", utc=True
+        )
+        valid = parsed.notna().to_numpy()
+        malformed = [
+            (numbers[row] + first_line - 1, texts[row])
+            for row in np.flatnonzero(~valid)
+        ]
+        times = parsed[valid].values.view("int64")
+
+    if malformed and not len(times):
+        raise ValueError(f"None of the {len(malformed)} rows are timestamps")
+    if sort and len(times) > 1 and (np.diff(times) < 0).any():
+        times = np.sort(times)
+    return ParsedTimes(np.ascontiguousarray(times, dtype="int64"), fmt, malformed)